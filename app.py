@@ -1,7 +1,10 @@
 from flask import Flask
 from flask_cors import CORS
 from database import db
+from database.esquema import atualizar_esquema
 from routes import bp
+from services.public.BuscaService import BuscaService
+from utils.json_provider import escolher_json_provider
 import pymysql
 from dotenv import load_dotenv
 import os
@@ -12,6 +15,7 @@ load_dotenv()
 
 def create_app():
     app = Flask(__name__)
+    app.json = escolher_json_provider()(app)
 
     base_url = os.getenv("BASE_URL")
 
@@ -29,7 +33,7 @@ def create_app():
         app,
         resources={r"/*": {"origins": cors_origins}},
         supports_credentials=True,
-        allow_headers=["Content-Type", "Authorization"],
+        allow_headers=["Content-Type", "Authorization", "Idempotency-Key"],
         methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
         max_age=3600,
     )
@@ -62,6 +66,8 @@ def create_app():
 
     with app.app_context():
         db.create_all()
+        atualizar_esquema()
+        BuscaService.aquecer()
 
     app.register_blueprint(bp, url_prefix="/")
 
@@ -0,0 +1,309 @@
+"""
+Benchmark de criação de pedidos: popula um banco local com produtos e
+usuários e chama PedidoService.criar_pedido a partir de várias threads (e,
+opcionalmente, vários processos). Mostra latência p50/p95/p99, vazão e, por
+chamada, quantas queries foram feitas e onde o tempo foi gasto: SQL,
+commit (flush + COMMIT) e o restante (ORM/Python).
+
+O email do pedido entra na fila de notificações (só um INSERT) e o
+criar_pedido não chama serviços externos, então nada precisa ser simulado.
+
+Uso:
+    python -m benchmarks.criar_pedido [--pedidos 2000] [--threads 8]
+        [--processos 1] [--itens 3] [--produtos 500] [--usuarios 200]
+        [--database-url mysql+pymysql://...]
+
+Sem --database-url usa um SQLite temporário. Com MySQL (ex.: o container do
+docker-compose), use um banco vazio só para o benchmark: as tabelas são
+criadas e populadas nele.
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+from decimal import Decimal
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from flask import Flask
+from sqlalchemy import event
+
+from database import db
+from database.models import Endereco, Produto, Usuario
+from services.public.PedidosService import PedidoService
+from utils.json_provider import escolher_json_provider
+
+
+def criar_app(database_url):
+    app = Flask(__name__)
+    app.json = escolher_json_provider()(app)
+    app.config["SQLALCHEMY_DATABASE_URI"] = database_url
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+
+    if database_url.startswith("sqlite"):
+        # Várias threads escrevendo no mesmo arquivo: espera o lock em vez de falhar
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+            "connect_args": {"timeout": 60, "check_same_thread": False}
+        }
+
+    db.init_app(app)
+    return app
+
+
+def popular(app, produtos, usuarios):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+        if db.engine.dialect.name == "sqlite":
+            with db.engine.connect() as conexao:
+                conexao.exec_driver_sql("PRAGMA journal_mode=WAL")
+
+        db.session.add_all(
+            Produto(
+                nome=f"Faca Artesanal {i}",
+                descricao="Lâmina de aço carbono, cabo de madeira nobre",
+                categoria=("facas", "aventais", "estojos", "churrascos")[i % 4],
+                preco=Decimal("89.90") + i,
+                img=f"https://res.cloudinary.com/exemplo/image/upload/{i}.jpg",
+                # Estoque alto: o benchmark mede o caminho feliz
+                estoque=10_000_000,
+                peso=Decimal("0.35"),
+                altura=5,
+                largura=4,
+                comprimento=32,
+            )
+            for i in range(produtos)
+        )
+
+        for i in range(usuarios):
+            usuario = Usuario(
+                nome=f"Cliente {i}",
+                sobrenome="Benchmark",
+                email=f"cliente{i}@benchmark.local",
+                senha_hash="x",
+            )
+            db.session.add(usuario)
+            db.session.flush()
+            db.session.add(
+                Endereco(
+                    usuario_id=usuario.id,
+                    cep="90000000",
+                    logradouro="Rua do Benchmark",
+                    numero=str(i),
+                    bairro="Centro",
+                    cidade="Porto Alegre",
+                    estado="RS",
+                )
+            )
+        db.session.commit()
+
+        produto_ids = [p for (p,) in db.session.query(Produto.id)]
+        enderecos = db.session.query(Endereco.usuario_id, Endereco.id).all()
+        return produto_ids, [tuple(e) for e in enderecos]
+
+
+def gerar_requisicoes(quantidade, itens, produto_ids, enderecos, semente=42):
+    aleatorio = random.Random(semente)
+    requisicoes = []
+    for _ in range(quantidade):
+        usuario_id, endereco_id = aleatorio.choice(enderecos)
+        requisicoes.append(
+            {
+                "usuario_id": usuario_id,
+                "endereco_id": endereco_id,
+                "itens": [
+                    {"produto_id": produto_id, "quantidade": aleatorio.randint(1, 3)}
+                    for produto_id in aleatorio.sample(produto_ids, itens)
+                ],
+            }
+        )
+    return requisicoes
+
+
+class Medidor:
+    """Conta queries e tempo de SQL/commit da chamada em andamento em cada thread."""
+
+    def __init__(self, engine):
+        self._local = threading.local()
+        event.listen(engine, "before_cursor_execute", self._antes_sql)
+        event.listen(engine, "after_cursor_execute", self._depois_sql)
+        event.listen(db.session, "before_commit", self._antes_commit)
+        event.listen(db.session, "after_commit", self._depois_commit)
+
+    def iniciar(self):
+        self._local.queries = 0
+        self._local.sql = 0.0
+        self._local.commit = 0.0
+
+    def resultado(self):
+        return self._local.queries, self._local.sql, self._local.commit
+
+    def _antes_sql(self, conn, cursor, statement, parameters, context, executemany):
+        self._local.inicio_sql = time.perf_counter()
+
+    def _depois_sql(self, conn, cursor, statement, parameters, context, executemany):
+        if hasattr(self._local, "queries"):
+            self._local.queries += 1
+            self._local.sql += time.perf_counter() - self._local.inicio_sql
+
+    def _antes_commit(self, session):
+        self._local.inicio_commit = time.perf_counter()
+
+    def _depois_commit(self, session):
+        if hasattr(self._local, "commit"):
+            self._local.commit += time.perf_counter() - self._local.inicio_commit
+
+
+def executar_carga(database_url, requisicoes, threads):
+    # Roda as requisições com N threads; cada thread simula um worker
+    # (um app context e uma sessão por requisição)
+    app = criar_app(database_url)
+    with app.app_context():
+        medidor = Medidor(db.engine)
+
+    resultados = []
+    erros = []
+    fila = iter(requisicoes)
+    lock = threading.Lock()
+
+    def trabalhador():
+        while True:
+            with lock:
+                requisicao = next(fila, None)
+            if requisicao is None:
+                return
+
+            with app.app_context():
+                medidor.iniciar()
+                inicio = time.perf_counter()
+                try:
+                    PedidoService.criar_pedido(requisicao)
+                except Exception as e:
+                    db.session.rollback()
+                    with lock:
+                        erros.append(str(e))
+                    continue
+                finally:
+                    db.session.remove()
+                total = time.perf_counter() - inicio
+                queries, sql, commit = medidor.resultado()
+
+            with lock:
+                resultados.append((total, queries, sql, commit))
+
+    workers = [threading.Thread(target=trabalhador) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    return resultados, erros
+
+
+def _executar_carga_processo(argumentos):
+    return executar_carga(*argumentos)
+
+
+def percentil(ordenados, p):
+    if len(ordenados) == 1:
+        return ordenados[0]
+    return statistics.quantiles(ordenados, n=100, method="inclusive")[p - 1]
+
+
+def relatorio(resultados, erros, duracao, threads, processos):
+    print(
+        f"\n{len(resultados)} pedidos criados em {duracao:.2f} s "
+        f"({processos} processo(s) x {threads} thread(s)), {len(erros)} erros"
+    )
+    if erros:
+        print(f"  primeiro erro: {erros[0]}")
+    if not resultados:
+        return
+
+    latencias = sorted(r[0] * 1000 for r in resultados)
+    print(f"  vazão:   {len(resultados) / duracao:8.1f} pedidos/s")
+    print(
+        f"  latência p50 {percentil(latencias, 50):7.2f} ms   "
+        f"p95 {percentil(latencias, 95):7.2f} ms   "
+        f"p99 {percentil(latencias, 99):7.2f} ms   "
+        f"máx {latencias[-1]:7.2f} ms"
+    )
+
+    queries = [r[1] for r in resultados]
+    print(
+        f"  queries por pedido: média {statistics.mean(queries):.1f}  "
+        f"mín {min(queries)}  máx {max(queries)}"
+    )
+
+    total = sum(r[0] for r in resultados)
+    sql = sum(r[2] for r in resultados)
+    commit = sum(r[3] for r in resultados)
+    print("  onde o tempo foi gasto (soma de todas as chamadas):")
+    print(f"    SQL (execução das queries) {sql / total:6.1%}")
+    print(
+        f"    commit (flush + COMMIT)    {commit / total:6.1%}  (inclui parte do SQL)"
+    )
+    print(f"    ORM/Python (fora do SQL)   {(total - sql) / total:6.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de POST /pedidos")
+    parser.add_argument("--pedidos", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--processos", type=int, default=1)
+    parser.add_argument("--itens", type=int, default=3, help="produtos por pedido")
+    parser.add_argument("--produtos", type=int, default=500)
+    parser.add_argument("--usuarios", type=int, default=200)
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"))
+    args = parser.parse_args()
+
+    arquivo = None
+    database_url = args.database_url
+    if not database_url:
+        arquivo = tempfile.NamedTemporaryFile(suffix=".sqlite", delete=False).name
+        database_url = f"sqlite:///{arquivo}"
+
+    try:
+        print(f"Populando {args.produtos} produtos e {args.usuarios} usuários...")
+        app = criar_app(database_url)
+        produto_ids, enderecos = popular(app, args.produtos, args.usuarios)
+        requisicoes = gerar_requisicoes(
+            args.pedidos, min(args.itens, len(produto_ids)), produto_ids, enderecos
+        )
+
+        # Aquecimento: conexões do pool e compilação das queries
+        executar_carga(database_url, requisicoes[: args.threads], args.threads)
+
+        print(f"Criando {args.pedidos} pedidos com {args.itens} itens cada...")
+        inicio = time.perf_counter()
+        if args.processos == 1:
+            resultados, erros = executar_carga(database_url, requisicoes, args.threads)
+        else:
+            fatias = [
+                (database_url, requisicoes[i :: args.processos], args.threads)
+                for i in range(args.processos)
+            ]
+            with multiprocessing.get_context("spawn").Pool(args.processos) as pool:
+                partes = pool.map(_executar_carga_processo, fatias)
+            resultados = [r for parte, _ in partes for r in parte]
+            erros = [e for _, parte in partes for e in parte]
+        duracao = time.perf_counter() - inicio
+
+        relatorio(resultados, erros, duracao, args.threads, args.processos)
+    finally:
+        if arquivo:
+            for sufixo in ("", "-wal", "-shm"):
+                if os.path.exists(arquivo + sufixo):
+                    os.remove(arquivo + sufixo)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Stand-in local da API do Mercado Pago, para rodar a reconciliação, o
+processamento de webhooks e os benchmarks sem chamar o MP de verdade.
+Guarda os pagamentos em memória e responde às rotas que a API usa:
+
+    GET  /v1/payments/<id>
+    GET  /v1/payments/search?external_reference=<pedido_id>
+    POST /v1/payments/<id>/refunds
+    GET  /merchant_orders/<id>            (o id da ordem é o id do pedido)
+    POST /checkout/preferences
+
+Os pagamentos são criados ou alterados por POST /_local/pagamentos com
+{"external_reference": "<pedido_id>", "status": "approved", "id": opcional,
+"transaction_amount": opcional}; GET /_local/pagamentos lista todos.
+
+Uso:
+    python -m benchmarks.mercadopago_local [--host 127.0.0.1] [--porta 8090]
+        [--latencia-ms 50] [--taxa-erro 0.05]
+
+e, no processo da API ou do job:
+    MERCADOPAGO_API_URL=http://localhost:8090 python -m jobs.reconciliar_pagamentos
+"""
+
+import argparse
+import itertools
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+class EstadoLocal:
+    def __init__(self, latencia_ms=0, taxa_erro=0.0):
+        self.latencia_ms = latencia_ms
+        self.taxa_erro = taxa_erro
+        self.pagamentos = {}  # id -> pagamento
+        self.requisicoes = 0
+        self._ids = itertools.count(1_000_000_001)
+        self._lock = threading.Lock()
+
+    def salvar_pagamento(self, dados):
+        with self._lock:
+            pagamento_id = str(dados.get("id") or next(self._ids))
+            pagamento = self.pagamentos.setdefault(
+                pagamento_id,
+                {
+                    "id": int(pagamento_id),
+                    "status": "pending",
+                    "status_detail": "pending_waiting_payment",
+                    "transaction_amount": 0.0,
+                    "payment_method_id": "pix",
+                    "date_created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "date_approved": None,
+                },
+            )
+            pagamento.update({k: v for k, v in dados.items() if k != "id"})
+            if pagamento["status"] == "approved" and not pagamento["date_approved"]:
+                pagamento["date_approved"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+            pagamento.setdefault("status_detail", pagamento["status"])
+            return dict(pagamento)
+
+    def pagamentos_do_pedido(self, pedido_id):
+        with self._lock:
+            return sorted(
+                (
+                    dict(p)
+                    for p in self.pagamentos.values()
+                    if str(p.get("external_reference")) == str(pedido_id)
+                ),
+                key=lambda p: p["date_created"],
+                reverse=True,
+            )
+
+
+class ManipuladorMercadoPago(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, como a API real
+    estado = None
+
+    def log_message(self, formato, *args):
+        pass
+
+    def do_GET(self):
+        self._atender("GET")
+
+    def do_POST(self):
+        self._atender("POST")
+
+    def _atender(self, metodo):
+        estado = self.estado
+        with estado._lock:
+            estado.requisicoes += 1
+        if estado.latencia_ms:
+            time.sleep(estado.latencia_ms / 1000)
+
+        url = urlsplit(self.path)
+        partes = [p for p in url.path.split("/") if p]
+        corpo = self._ler_corpo()
+
+        if partes[:1] != ["_local"] and random.random() < estado.taxa_erro:
+            return self._responder(503, {"message": "erro simulado"})
+
+        if metodo == "POST" and partes == ["_local", "pagamentos"]:
+            return self._responder(201, estado.salvar_pagamento(corpo))
+        if metodo == "GET" and partes == ["_local", "pagamentos"]:
+            return self._responder(200, list(estado.pagamentos.values()))
+
+        if metodo == "GET" and partes == ["v1", "payments", "search"]:
+            filtros = parse_qs(url.query)
+            referencia = (filtros.get("external_reference") or [""])[0]
+            resultados = estado.pagamentos_do_pedido(referencia)
+            return self._responder(
+                200,
+                {
+                    "results": resultados,
+                    "paging": {"total": len(resultados), "offset": 0, "limit": 30},
+                },
+            )
+
+        if metodo == "GET" and len(partes) == 3 and partes[:2] == ["v1", "payments"]:
+            pagamento = estado.pagamentos.get(partes[2])
+            if pagamento is None:
+                return self._responder(404, {"message": "Payment not found"})
+            return self._responder(200, dict(pagamento))
+
+        if metodo == "POST" and len(partes) == 4 and partes[3] == "refunds":
+            pagamento = estado.pagamentos.get(partes[2])
+            if pagamento is None:
+                return self._responder(404, {"message": "Payment not found"})
+            valor = corpo.get("amount") or pagamento["transaction_amount"]
+            estado.salvar_pagamento({"id": partes[2], "status": "refunded"})
+            return self._responder(
+                201,
+                {
+                    "id": random.randint(1, 10**9),
+                    "payment_id": int(partes[2]),
+                    "amount": valor,
+                    "status": "approved",
+                },
+            )
+
+        if metodo == "GET" and len(partes) == 2 and partes[0] == "merchant_orders":
+            pagamentos = estado.pagamentos_do_pedido(partes[1])
+            return self._responder(
+                200,
+                {
+                    "id": partes[1],
+                    "external_reference": partes[1],
+                    "payments": [
+                        {"id": p["id"], "status": p["status"]} for p in pagamentos
+                    ],
+                },
+            )
+
+        if metodo == "POST" and partes == ["checkout", "preferences"]:
+            preferencia_id = f"local-{uuid.uuid4().hex[:12]}"
+            link = f"http://localhost/checkout/{preferencia_id}"
+            return self._responder(
+                201,
+                {
+                    "id": preferencia_id,
+                    "init_point": link,
+                    "sandbox_init_point": link,
+                    "external_reference": corpo.get("external_reference"),
+                },
+            )
+
+        self._responder(404, {"message": f"Rota não simulada: {metodo} {url.path}"})
+
+    def _ler_corpo(self):
+        tamanho = int(self.headers.get("Content-Length") or 0)
+        if not tamanho:
+            return {}
+        try:
+            return json.loads(self.rfile.read(tamanho) or b"{}")
+        except ValueError:
+            return {}
+
+    def _responder(self, status, conteudo):
+        dados = json.dumps(conteudo).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+
+def iniciar(porta=0, latencia_ms=0, taxa_erro=0.0, host="127.0.0.1"):
+    """Sobe o servidor numa thread e retorna (servidor, estado); porta 0 = livre."""
+    estado = EstadoLocal(latencia_ms=latencia_ms, taxa_erro=taxa_erro)
+    manipulador = type("Manipulador", (ManipuladorMercadoPago,), {"estado": estado})
+    servidor = ThreadingHTTPServer((host, porta), manipulador)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, estado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in local da API do MP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8090)
+    parser.add_argument("--latencia-ms", type=int, default=0)
+    parser.add_argument("--taxa-erro", type=float, default=0.0)
+    args = parser.parse_args()
+
+    servidor, _ = iniciar(args.porta, args.latencia_ms, args.taxa_erro, args.host)
+    print(f"Mercado Pago local em http://{args.host}:{servidor.server_port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        servidor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Micro-benchmark da serialização do catálogo: compara o caminho antigo
+(dict montado na rota + json da stdlib) com o formatter compilado usando o
+provider da stdlib e o provider orjson.
+
+Uso: python -m benchmarks.serializacao_produtos [quantidade] [repeticoes]
+"""
+
+import sys
+import timeit
+import uuid
+from datetime import datetime
+from decimal import Decimal
+from types import SimpleNamespace
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from flask import Flask
+
+from services.public.ProdutosServices import ProdutoService
+from services.public.PromocoesService import PromocaoService
+from utils.json_provider import JSONProvider, OrjsonJSONProvider, orjson
+
+
+def gerar_produtos(quantidade):
+    return [
+        SimpleNamespace(
+            id=str(uuid.uuid4()),
+            nome=f"Faca Artesanal {i}",
+            descricao="Lâmina de aço carbono, cabo de madeira nobre " * 3,
+            categoria="facas",
+            preco=Decimal("189.90") + i,
+            img=f"https://res.cloudinary.com/exemplo/image/upload/{i}.jpg",
+            estoque=i % 50,
+            peso=Decimal("0.35"),
+            altura=5,
+            largura=4,
+            comprimento=32,
+            criado_em=datetime.now(),
+            promocao=(
+                SimpleNamespace(desconto_percentual=10.0) if i % 5 == 0 else None
+            ),
+        )
+        for i in range(quantidade)
+    ]
+
+
+# Como as rotas faziam antes: um dict literal por rota, com os mesmos 13 campos
+# (inclusive os dois da promoção) que o formatter devolve
+def formatar_antigo(produtos):
+    calcular = PromocaoService.calcular_preco_com_desconto
+    return [
+        {
+            "id": p.id,
+            "nome": p.nome,
+            "descricao": p.descricao,
+            "categoria": p.categoria,
+            "preco": float(p.preco),
+            "img": p.img,
+            "estoque": p.estoque,
+            "peso": float(p.peso),
+            "altura": p.altura,
+            "largura": p.largura,
+            "comprimento": p.comprimento,
+            "desconto_percentual": (
+                p.promocao.desconto_percentual if p.promocao else None
+            ),
+            "preco_com_desconto": (
+                round(float(calcular(p.preco, p.promocao.desconto_percentual)), 2)
+                if p.promocao
+                else float(p.preco)
+            ),
+        }
+        for p in produtos
+    ]
+
+
+def medir(nome, funcao, repeticoes):
+    tempos = timeit.repeat(funcao, number=1, repeat=repeticoes)
+    melhor = min(tempos) * 1000
+    media = sum(tempos) / len(tempos) * 1000
+    print(f"{nome:<42} melhor {melhor:8.2f} ms   média {media:8.2f} ms")
+    return melhor
+
+
+def main():
+    quantidade = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    repeticoes = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    app = Flask(__name__)
+    stdlib = JSONProvider(app)
+    produtos = gerar_produtos(quantidade)
+
+    print(f"Serializando {quantidade} produtos ({repeticoes} repetições)\n")
+
+    base = medir(
+        "antigo: dict na rota + stdlib",
+        lambda: stdlib.dumps_bytes(formatar_antigo(produtos)),
+        repeticoes,
+    )
+    medir(
+        "formatter compilado (só dicts)",
+        lambda: ProdutoService.formatar_lista(produtos),
+        repeticoes,
+    )
+    formatter = medir(
+        "formatter + stdlib",
+        lambda: stdlib.dumps_bytes(ProdutoService.formatar_lista(produtos)),
+        repeticoes,
+    )
+
+    # Mesmo provider (stdlib) dos dois lados: mede só a troca de formatter
+    print(f"\nformatter vs caminho antigo (stdlib): {base / formatter:.2f}x")
+
+    if orjson is None:
+        print("orjson não instalado; caminho orjson não medido")
+        return
+
+    rapido = OrjsonJSONProvider(app)
+    melhor = medir(
+        "formatter + orjson",
+        lambda: rapido.dumps_bytes(ProdutoService.formatar_lista(produtos)),
+        repeticoes,
+    )
+    print(f"formatter + orjson vs caminho antigo: {base / melhor:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
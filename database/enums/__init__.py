@@ -1,2 +1,4 @@
 from .status_pedido_enum import StatusPedidoEnum
 from .status_pagamento_enum import StatusPagamentoEnum
+from .status_notificacao_enum import StatusNotificacaoEnum
+from .status_webhook_enum import StatusWebhookEnum
@@ -0,0 +1,8 @@
+from enum import Enum
+
+
+class StatusNotificacaoEnum(Enum):
+    PENDENTE = "PENDENTE"
+    ENVIADO = "ENVIADO"
+    DESCARTADO = "DESCARTADO"  # duplicado ou pedido removido
+    FALHOU = "FALHOU"  # esgotou as tentativas
@@ -0,0 +1,8 @@
+from enum import Enum
+
+
+class StatusWebhookEnum(Enum):
+    PENDENTE = "PENDENTE"
+    PROCESSADO = "PROCESSADO"
+    IGNORADO = "IGNORADO"  # notificação sem efeito (ex.: ordem ainda sem pagamento)
+    DUPLICADO = "DUPLICADO"  # repetição de um evento já aplicado ou já na fila
@@ -0,0 +1,91 @@
+import logging
+
+from sqlalchemy import String, Text, func, inspect, select, text
+from sqlalchemy.schema import CreateColumn
+
+from database import db
+
+logger = logging.getLogger(__name__)
+
+# Colunas que mudaram de tipo em tabelas que já existiam: (tabela, coluna)
+# produto.categoria era TEXT; VARCHAR(50) entra no índice (categoria, preco)
+_TIPOS_ALTERADOS = (("produto", "categoria"),)
+
+
+# Confere se os valores já gravados cabem no novo tamanho da coluna: o MODIFY
+# falharia no modo estrito do MySQL (derrubando a subida) ou cortaria os
+# valores sem aviso. Se não couberem, a coluna fica como está e o erro é
+# registrado para a correção ser feita à mão.
+def _cabe_no_tamanho(engine, coluna):
+    with engine.connect() as conexao:
+        maior = conexao.execute(select(func.max(func.char_length(coluna)))).scalar()
+
+    if maior is not None and maior > coluna.type.length:
+        logger.error(
+            f"{coluna.table.name}.{coluna.name} tem valores com até {maior} "
+            f"caracteres e não foi alterada para {coluna.type}; corrija os "
+            f"valores e reinicie"
+        )
+        return False
+    return True
+
+
+def atualizar_esquema():
+    """
+    Leva tabelas já existentes ao esquema dos models, depois do create_all
+    (que só cria tabelas novas): adiciona colunas e índices que faltam e
+    corrige os tipos de _TIPOS_ALTERADOS (só no MySQL; o SQLite não altera
+    tipos e não precisa), se os valores gravados couberem no tipo novo. Confere o banco antes de cada alteração, então
+    pode rodar a cada inicialização; uma alteração que falha (ex.: outro
+    worker criou o mesmo índice ao mesmo tempo) é registrada e as demais
+    seguem.
+    """
+    engine = db.engine
+    inspetor = inspect(engine)
+    tabelas = set(inspetor.get_table_names())
+    preparador = engine.dialect.identifier_preparer
+
+    alteracoes = []
+    for tabela in db.metadata.sorted_tables:
+        if tabela.name not in tabelas:
+            continue
+        nome = preparador.format_table(tabela)
+        colunas = {c["name"]: c for c in inspetor.get_columns(tabela.name)}
+
+        for coluna in tabela.columns:
+            if coluna.name not in colunas:
+                ddl = CreateColumn(coluna).compile(dialect=engine.dialect)
+                alteracoes.append(f"ALTER TABLE {nome} ADD COLUMN {ddl}")
+            elif (
+                engine.dialect.name == "mysql"
+                and (tabela.name, coluna.name) in _TIPOS_ALTERADOS
+                and isinstance(colunas[coluna.name]["type"], Text)
+                and isinstance(coluna.type, String)
+                and not isinstance(coluna.type, Text)
+                and _cabe_no_tamanho(engine, coluna)
+            ):
+                ddl = CreateColumn(coluna).compile(dialect=engine.dialect)
+                alteracoes.append(f"ALTER TABLE {nome} MODIFY COLUMN {ddl}")
+
+    # Índices por último: podem depender das colunas e tipos acima
+    indices = []
+    for tabela in db.metadata.sorted_tables:
+        if tabela.name not in tabelas:
+            continue
+        existentes = {i["name"] for i in inspetor.get_indexes(tabela.name)}
+        indices += [i for i in tabela.indexes if i.name not in existentes]
+
+    for ddl in alteracoes:
+        try:
+            with engine.begin() as conexao:
+                conexao.execute(text(ddl))
+            logger.info(f"Esquema atualizado: {ddl}")
+        except Exception as e:
+            logger.error(f"Erro ao atualizar o esquema ({ddl}): {e}")
+
+    for indice in indices:
+        try:
+            indice.create(bind=engine)
+            logger.info(f"Índice {indice.name} criado em {indice.table.name}")
+        except Exception as e:
+            logger.error(f"Erro ao criar o índice {indice.name}: {e}")
@@ -6,4 +6,15 @@ from .item_pedido import ItemPedido
 from .transacao import TransacaoPagamento
 from .produto import Produto
 from .promocao import Promocao
-from ..enums import StatusPedidoEnum, StatusPagamentoEnum
+from .reserva_estoque import ReservaEstoque
+from .chave_idempotencia import ChaveIdempotencia
+from .notificacao_email import NotificacaoEmail
+from .notificacao_webhook import NotificacaoWebhook
+from .notificacao_webhook_falha import NotificacaoWebhookFalha
+from .evento_webhook import EventoWebhook
+from ..enums import (
+    StatusPedidoEnum,
+    StatusPagamentoEnum,
+    StatusNotificacaoEnum,
+    StatusWebhookEnum,
+)
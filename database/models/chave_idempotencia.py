@@ -0,0 +1,24 @@
+from database import db
+from utils.date_time import agora_brasil
+
+
+class ChaveIdempotencia(db.Model):
+    __tablename__ = "chave_idempotencia"
+    __table_args__ = (
+        # Limpeza das chaves vencidas
+        db.Index("ix_chave_idempotencia_expira_em", "expira_em"),
+    )
+
+    # hash de usuário + método + rota + Idempotency-Key
+    id = db.Column(db.String(64), primary_key=True)
+    usuario_id = db.Column(db.String(36), nullable=False)
+    rota = db.Column(db.String(255), nullable=False)
+    # hash do corpo da requisição: a mesma chave com outro corpo é recusada
+    hash_requisicao = db.Column(db.String(64), nullable=False)
+    # identifica a requisição que está com a chave (trocado se ela for abandonada)
+    dono = db.Column(db.String(36), nullable=False)
+    # vazio enquanto a primeira requisição ainda está sendo processada
+    status_code = db.Column(db.Integer, nullable=True)
+    resposta = db.Column(db.Text, nullable=True)
+    criado_em = db.Column(db.DateTime, default=agora_brasil, nullable=False)
+    expira_em = db.Column(db.DateTime, nullable=False)
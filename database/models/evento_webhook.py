@@ -0,0 +1,22 @@
+from database import db
+from utils.date_time import agora_brasil
+
+
+# Eventos do Mercado Pago já aplicados: um por (tópico, recurso, status).
+# Notificações repetidas do mesmo evento são descartadas sem efeito.
+class EventoWebhook(db.Model):
+    __tablename__ = "evento_webhook"
+    __table_args__ = (
+        db.UniqueConstraint(
+            "topico", "recurso_id", "status", name="uq_evento_webhook_recurso_status"
+        ),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    topico = db.Column(db.String(50), nullable=False)
+    recurso_id = db.Column(db.String(100), nullable=False)
+    status = db.Column(db.String(30), nullable=False)  # status do MP (approved...)
+    pedido_id = db.Column(
+        db.String(36), db.ForeignKey("pedidos.id", ondelete="CASCADE"), nullable=True
+    )
+    criado_em = db.Column(db.DateTime, default=agora_brasil, nullable=False)
@@ -0,0 +1,34 @@
+import uuid
+from database import db
+from database.enums.status_notificacao_enum import StatusNotificacaoEnum
+from utils.date_time import agora_brasil
+
+
+class NotificacaoEmail(db.Model):
+    __tablename__ = "notificacao_email"
+    __table_args__ = (
+        # Fila: próximas notificações pendentes a enviar
+        db.Index(
+            "ix_notificacao_email_status_proxima", "status", "proxima_tentativa_em"
+        ),
+        db.Index("ix_notificacao_email_chave", "chave"),
+    )
+
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    pedido_id = db.Column(
+        db.String(36), db.ForeignKey("pedidos.id", ondelete="CASCADE"), nullable=False
+    )
+    tipo = db.Column(db.String(50), nullable=False)  # ex.: "pedido_criado"
+    dados = db.Column(db.Text, nullable=True)  # JSON com parâmetros extras do email
+    # tipo + pedido: o mesmo email não sai duas vezes para o mesmo pedido
+    chave = db.Column(db.String(100), nullable=False)
+    status = db.Column(
+        db.Enum(StatusNotificacaoEnum),
+        nullable=False,
+        default=StatusNotificacaoEnum.PENDENTE,
+    )
+    tentativas = db.Column(db.Integer, nullable=False, default=0)
+    proxima_tentativa_em = db.Column(db.DateTime, default=agora_brasil, nullable=False)
+    ultimo_erro = db.Column(db.Text, nullable=True)
+    criado_em = db.Column(db.DateTime, default=agora_brasil, nullable=False)
+    enviado_em = db.Column(db.DateTime, nullable=True)
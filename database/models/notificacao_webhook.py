@@ -0,0 +1,34 @@
+import uuid
+from database import db
+from database.enums.status_webhook_enum import StatusWebhookEnum
+from utils.date_time import agora_brasil
+
+
+class NotificacaoWebhook(db.Model):
+    __tablename__ = "notificacao_webhook"
+    __table_args__ = (
+        # Fila: próximas notificações pendentes a processar
+        db.Index(
+            "ix_notificacao_webhook_status_proxima", "status", "proxima_tentativa_em"
+        ),
+        # Notificação do mesmo recurso ainda na fila (deduplicação na chegada)
+        db.Index("ix_notificacao_webhook_recurso", "topico", "recurso_id", "status"),
+        # Estatísticas da fila por período
+        db.Index("ix_notificacao_webhook_criado_em", "criado_em"),
+    )
+
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    origem = db.Column(db.String(30), nullable=False, default="mercadopago")
+    topico = db.Column(db.String(50), nullable=False)  # payment, merchant_order
+    recurso_id = db.Column(db.String(100), nullable=True)
+    payload = db.Column(db.Text, nullable=False)  # corpo recebido, em JSON
+    status = db.Column(
+        db.Enum(StatusWebhookEnum),
+        nullable=False,
+        default=StatusWebhookEnum.PENDENTE,
+    )
+    tentativas = db.Column(db.Integer, nullable=False, default=0)
+    proxima_tentativa_em = db.Column(db.DateTime, default=agora_brasil, nullable=False)
+    ultimo_erro = db.Column(db.Text, nullable=True)
+    criado_em = db.Column(db.DateTime, default=agora_brasil, nullable=False)
+    processado_em = db.Column(db.DateTime, nullable=True)
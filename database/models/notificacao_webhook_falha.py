@@ -0,0 +1,19 @@
+import uuid
+from database import db
+from utils.date_time import agora_brasil
+
+
+# Dead letter: notificações que esgotaram as tentativas de processamento
+class NotificacaoWebhookFalha(db.Model):
+    __tablename__ = "notificacao_webhook_falha"
+
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    notificacao_id = db.Column(db.String(36), nullable=False)
+    origem = db.Column(db.String(30), nullable=False)
+    topico = db.Column(db.String(50), nullable=False)
+    recurso_id = db.Column(db.String(100), nullable=True)
+    payload = db.Column(db.Text, nullable=False)
+    tentativas = db.Column(db.Integer, nullable=False)
+    ultimo_erro = db.Column(db.Text, nullable=True)
+    recebido_em = db.Column(db.DateTime, nullable=False)
+    falhou_em = db.Column(db.DateTime, default=agora_brasil, nullable=False)
@@ -8,6 +8,12 @@ from utils.date_time import agora_brasil
 
 class Pedido(db.Model):
     __tablename__ = "pedidos"
+    __table_args__ = (
+        # Histórico do usuário paginado por (criado_em, id)
+        db.Index("ix_pedidos_usuario_criado_em", "usuario_id", "criado_em"),
+        # Listagem do painel paginada por (criado_em, id)
+        db.Index("ix_pedidos_criado_em_id", "criado_em", "id"),
+    )
 
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     usuario_id = db.Column(
@@ -37,6 +43,8 @@ class Pedido(db.Model):
     melhor_envio_protocolo = db.Column(db.String(100), nullable=True)
     melhor_envio_rastreio = db.Column(db.String(100), nullable=True)
     etiqueta_url = db.Column(db.Text, nullable=True)
+    # Pendência para o admin resolver (ex.: "pago_sem_estoque"); None = nenhuma
+    revisao_motivo = db.Column(db.String(50), nullable=True)
 
     usuario = db.relationship(
         "Usuario",
@@ -6,10 +6,18 @@ from utils.date_time import agora_brasil
 
 
 class Produto(db.Model):
+    __table_args__ = (
+        # Índice da paginação keyset (criado_em DESC, id DESC)
+        db.Index("ix_produto_criado_em_id", "criado_em", "id"),
+        # Filtros do catálogo: categoria + faixa de preço, e só faixa de preço
+        db.Index("ix_produto_categoria_preco", "categoria", "preco"),
+        db.Index("ix_produto_preco", "preco"),
+    )
+
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     nome = db.Column(db.String(100), nullable=False)
     descricao = db.Column(db.Text, nullable=True)
-    categoria = db.Column(db.Text, nullable=True)
+    categoria = db.Column(db.String(50), nullable=True)
     preco = db.Column(db.Numeric(10, 2), nullable=False)
     img = db.Column(db.Text, nullable=True)
     estoque = db.Column(db.Integer, nullable=False, default=0)
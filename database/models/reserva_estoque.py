@@ -0,0 +1,25 @@
+import uuid
+from database import db
+from utils.date_time import agora_brasil
+
+
+class ReservaEstoque(db.Model):
+    __tablename__ = "reserva_estoque"
+    __table_args__ = (
+        # Varredura de reservas vencidas
+        db.Index("ix_reserva_estoque_expira_em", "expira_em"),
+    )
+
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    pedido_id = db.Column(
+        db.String(36), db.ForeignKey("pedidos.id", ondelete="CASCADE"), nullable=False
+    )
+    produto_id = db.Column(db.String(36), db.ForeignKey("produto.id"), nullable=False)
+    quantidade = db.Column(db.Integer, nullable=False)
+    expira_em = db.Column(db.DateTime, nullable=False)
+    criado_em = db.Column(db.DateTime, default=agora_brasil, nullable=False)
+
+    pedido = db.relationship(
+        "Pedido",
+        backref=db.backref("reservas", lazy=True, cascade="all, delete-orphan"),
+    )
@@ -7,6 +7,12 @@ from utils.date_time import agora_brasil
 
 class TransacaoPagamento(db.Model):
     __tablename__ = "transacao_pagamento"
+    __table_args__ = (
+        # Busca da preferência em aberto do pedido
+        db.Index("ix_transacao_pagamento_pedido_status", "pedido_id", "status"),
+        # Varredura das transações pendentes na reconciliação
+        db.Index("ix_transacao_pagamento_status_criado_em", "status", "criado_em"),
+    )
 
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     pedido_id = db.Column(
@@ -23,6 +29,12 @@ class TransacaoPagamento(db.Model):
         db.String(100), nullable=True
     )  # ID do pagamento no Mercado Pago
     mp_preference_id = db.Column(db.String(100), nullable=True)  # ID da preferência
+    # Links do checkout, para devolver a mesma preferência sem chamar o MP
+    mp_checkout_url = db.Column(db.Text, nullable=True)
+    mp_sandbox_checkout_url = db.Column(db.Text, nullable=True)
+    # Hash dos itens/frete enviados na preferência e até quando ela é reaproveitada
+    hash_preferencia = db.Column(db.String(64), nullable=True)
+    preferencia_expira_em = db.Column(db.DateTime, nullable=True)
     criado_em = db.Column(db.DateTime, default=agora_brasil, nullable=False)
     atualizado_em = db.Column(
         db.DateTime,
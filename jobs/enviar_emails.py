@@ -0,0 +1,43 @@
+import argparse
+import logging
+import os
+import time
+
+from app import app
+from database import db
+from services.public.NotificacaoEmailService import NotificacaoEmailService
+
+logger = logging.getLogger(__name__)
+
+EMAIL_FILA_INTERVALO = int(os.getenv("EMAIL_FILA_INTERVALO", 10))
+
+
+# rode python -m jobs.enviar_emails para esvaziar a fila uma vez, ou com --loop para
+# ficar enviando a cada EMAIL_FILA_INTERVALO segundos
+def main():
+    parser = argparse.ArgumentParser(
+        description="Envia os emails pendentes da fila de notificações"
+    )
+    parser.add_argument("--loop", action="store_true")
+    args = parser.parse_args()
+
+    with app.app_context():
+        while True:
+            try:
+                # Segue pegando lotes enquanto houver emails saindo
+                while NotificacaoEmailService.processar_pendentes():
+                    db.session.remove()
+            except Exception as e:
+                logger.error(f"Erro ao processar fila de emails: {e}")
+                db.session.rollback()
+            finally:
+                db.session.remove()
+
+            if not args.loop:
+                break
+            time.sleep(EMAIL_FILA_INTERVALO)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
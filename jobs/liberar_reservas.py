@@ -0,0 +1,42 @@
+import argparse
+import logging
+import os
+import time
+
+from app import app
+from database import db
+from services.public.ReservaEstoqueService import ReservaEstoqueService
+
+logger = logging.getLogger(__name__)
+
+RESERVA_ESTOQUE_INTERVALO = int(os.getenv("RESERVA_ESTOQUE_INTERVALO", 60))
+
+
+# rode python -m jobs.liberar_reservas para uma varredura, ou com --loop para
+# ficar varrendo a cada RESERVA_ESTOQUE_INTERVALO segundos
+def main():
+    parser = argparse.ArgumentParser(
+        description="Cancela pedidos com reserva de estoque vencida"
+    )
+    parser.add_argument("--loop", action="store_true")
+    args = parser.parse_args()
+
+    with app.app_context():
+        while True:
+            try:
+                cancelados = ReservaEstoqueService.liberar_expiradas()
+                logger.info(f"Varredura de reservas: {cancelados} pedidos cancelados")
+            except Exception as e:
+                logger.error(f"Erro na varredura de reservas: {e}")
+                db.session.rollback()
+            finally:
+                db.session.remove()
+
+            if not args.loop:
+                break
+            time.sleep(RESERVA_ESTOQUE_INTERVALO)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
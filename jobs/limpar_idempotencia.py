@@ -0,0 +1,40 @@
+import argparse
+import logging
+import os
+import time
+
+from app import app
+from database import db
+from services.public.IdempotenciaService import IdempotenciaService
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCIA_LIMPEZA_INTERVALO = int(os.getenv("IDEMPOTENCIA_LIMPEZA_INTERVALO", 3600))
+
+
+# rode python -m jobs.limpar_idempotencia para uma limpeza, ou com --loop para
+# limpar a cada IDEMPOTENCIA_LIMPEZA_INTERVALO segundos
+def main():
+    parser = argparse.ArgumentParser(description="Apaga as Idempotency-Keys vencidas")
+    parser.add_argument("--loop", action="store_true")
+    args = parser.parse_args()
+
+    with app.app_context():
+        while True:
+            try:
+                removidas = IdempotenciaService.limpar_expiradas()
+                logger.info(f"Limpeza de idempotência: {removidas} chaves removidas")
+            except Exception as e:
+                logger.error(f"Erro na limpeza de idempotência: {e}")
+                db.session.rollback()
+            finally:
+                db.session.remove()
+
+            if not args.loop:
+                break
+            time.sleep(IDEMPOTENCIA_LIMPEZA_INTERVALO)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
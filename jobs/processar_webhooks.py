@@ -0,0 +1,51 @@
+import argparse
+import logging
+import os
+import time
+
+from app import app
+from database import db
+from services.public.WebhookService import WEBHOOK_WORKERS, WebhookService
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_FILA_INTERVALO = int(os.getenv("WEBHOOK_FILA_INTERVALO", 2))
+
+
+# rode python -m jobs.processar_webhooks para processar a fila uma vez, ou com
+# --loop para ficar processando a cada WEBHOOK_FILA_INTERVALO segundos.
+# --reprocessar-falhas devolve para a fila as notificações que esgotaram as tentativas.
+def main():
+    parser = argparse.ArgumentParser(
+        description="Processa a fila de webhooks do Mercado Pago"
+    )
+    parser.add_argument("--loop", action="store_true")
+    parser.add_argument("--workers", type=int, default=WEBHOOK_WORKERS)
+    parser.add_argument("--reprocessar-falhas", action="store_true")
+    args = parser.parse_args()
+
+    with app.app_context():
+        if args.reprocessar_falhas:
+            reenfileiradas = WebhookService.reenfileirar_falhas()
+            logger.info(f"{reenfileiradas} notificações devolvidas para a fila")
+            db.session.remove()
+
+        while True:
+            try:
+                # Segue pegando lotes enquanto a fila tiver notificações prontas
+                while WebhookService.processar_pendentes(workers=args.workers):
+                    db.session.remove()
+            except Exception as e:
+                logger.error(f"Erro ao processar fila de webhooks: {e}")
+                db.session.rollback()
+            finally:
+                db.session.remove()
+
+            if not args.loop:
+                break
+            time.sleep(WEBHOOK_FILA_INTERVALO)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
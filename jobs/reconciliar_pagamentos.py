@@ -0,0 +1,49 @@
+import argparse
+import logging
+import os
+import time
+
+from app import app
+from database import db
+from services.public.ReconciliacaoService import (
+    RECONCILIACAO_LOTE,
+    RECONCILIACAO_WORKERS,
+    ReconciliacaoService,
+)
+
+logger = logging.getLogger(__name__)
+
+RECONCILIACAO_INTERVALO = int(os.getenv("RECONCILIACAO_INTERVALO", 300))
+
+
+# rode python -m jobs.reconciliar_pagamentos para conferir uma vez as transações
+# pendentes com o Mercado Pago, ou com --loop para repetir a cada
+# RECONCILIACAO_INTERVALO segundos. Para testar localmente, suba
+# python -m benchmarks.mercadopago_local e defina MERCADOPAGO_API_URL.
+def main():
+    parser = argparse.ArgumentParser(
+        description="Reconcilia as transações pendentes com o Mercado Pago"
+    )
+    parser.add_argument("--loop", action="store_true")
+    parser.add_argument("--lote", type=int, default=RECONCILIACAO_LOTE)
+    parser.add_argument("--workers", type=int, default=RECONCILIACAO_WORKERS)
+    args = parser.parse_args()
+
+    with app.app_context():
+        while True:
+            try:
+                ReconciliacaoService.reconciliar(lote=args.lote, workers=args.workers)
+            except Exception as e:
+                logger.error(f"Erro na reconciliação de pagamentos: {e}")
+                db.session.rollback()
+            finally:
+                db.session.remove()
+
+            if not args.loop:
+                break
+            time.sleep(RECONCILIACAO_INTERVALO)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -10,6 +10,10 @@ from services.admin.AdminService import (
 )
 from datetime import datetime
 from utils.middlewares.auth import admin_required
+from utils.cache import catalogo_cache
+from services.public.MercadoPagoService import consultas_mercadopago
+from utils.mercadopago_client import estatisticas_http
+from services.public.WebhookService import WebhookService
 
 admin_routes = Blueprint("admin", __name__, url_prefix="/admin")
 
@@ -119,3 +123,42 @@ def remover_promocao_route(produto_id):
         return jsonify({"mensagem": "Promoção removida com sucesso"}), 200
     except (ValueError, PermissionError) as e:
         return jsonify({"erro": str(e)}), 400 if isinstance(e, ValueError) else 403
+
+
+# CACHE
+
+
+# Estatísticas dos caches deste worker: catálogo (hits, misses, descartes) e
+# consultas ao Mercado Pago (requisições feitas e compartilhadas)
+@admin_routes.route("/cache/estatisticas", methods=["GET"])
+@admin_required
+def estatisticas_cache_route():
+    return (
+        jsonify(
+            {
+                "catalogo": catalogo_cache.estatisticas(),
+                "mercadopago": consultas_mercadopago.estatisticas(),
+            }
+        ),
+        200,
+    )
+
+
+# WEBHOOKS
+
+
+# Notificações recebidas, descartadas como repetidas e situação da fila
+@admin_routes.route("/webhooks/estatisticas", methods=["GET"])
+@admin_required
+def estatisticas_webhooks_route():
+    return jsonify(WebhookService.estatisticas()), 200
+
+
+# MERCADO PAGO
+
+
+# Latência das chamadas à API do Mercado Pago feitas por este worker, por rota
+@admin_routes.route("/mercadopago/estatisticas", methods=["GET"])
+@admin_required
+def estatisticas_mercadopago_route():
+    return jsonify(estatisticas_http()), 200
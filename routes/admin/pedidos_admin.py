@@ -1,21 +1,37 @@
-from flask import Blueprint, request, jsonify
+import logging
+from flask import (
+    Blueprint,
+    Response,
+    current_app,
+    jsonify,
+    request,
+    stream_with_context,
+)
 from services.admin.AdminPedidosService import (
     listar_pedidos as listar_pedidos_service,
+    iterar_pedidos as iterar_pedidos_service,
     atualizar_pedido as atualizar_pedido_service,
+    atualizar_status_em_lote as atualizar_status_em_lote_service,
     deletar_pedido as deletar_pedido_service,
     atualizar_item as atualizar_item_service,
     deletar_item as deletar_item_service,
     atualizar_transacao as atualizar_transacao_service,
 )
+from database import db
 from datetime import timedelta
 from utils.middlewares.auth import admin_required
+from utils.paginacao import decodificar_cursor, ler_limite
+
+logger = logging.getLogger(__name__)
 
 admin_pedidos_routes = Blueprint("admin_pedidos", __name__, url_prefix="/admin_pedidos")
 
 # PEDIDOS
 
 
-# Listar todos os pedidos cadastrados
+# Listar os pedidos cadastrados, do mais recente para o mais antigo
+# ?limite=50&cursor=... pagina por (criado_em, id) e responde {pedidos, proximo_cursor};
+# sem eles, envia todos os pedidos do filtro em streaming (JSON em blocos)
 @admin_pedidos_routes.route("/pedidos", methods=["GET"])
 @admin_required
 def listar_pedidos():
@@ -35,18 +51,56 @@ def listar_pedidos():
         if categoria_id:
             categoria_id = int(categoria_id)
 
-        pedidos = listar_pedidos_service(
-            data_inicial=data_inicial, data_final=data_final, categoria_id=categoria_id
+        filtros = {
+            "data_inicial": data_inicial,
+            "data_final": data_final,
+            "categoria_id": categoria_id,
+        }
+
+        if "limite" in request.args or "cursor" in request.args:
+            pedidos, proximo_cursor = listar_pedidos_service(
+                cursor=decodificar_cursor(request.args.get("cursor")),
+                limite=ler_limite(request.args.get("limite")),
+                **filtros,
+            )
+            return jsonify({"pedidos": pedidos, "proximo_cursor": proximo_cursor}), 200
+
+        blocos = iterar_pedidos_service(**filtros)
+        return Response(
+            stream_with_context(_array_json_em_blocos(blocos)),
+            mimetype="application/json",
         )
 
-        return jsonify(pedidos), 200
-
     except ValueError as e:
         return jsonify({"erro": str(e)}), 400
     except Exception as e:
         return jsonify({"erro": "Erro ao listar pedidos", "detalhes": str(e)}), 500
 
 
+# Monta um array JSON a partir de blocos de itens, um pedaço da resposta por bloco.
+# O 200 já saiu quando um erro acontece no meio da leitura: o erro é registrado
+# e o array é fechado com um último item {"erro": ...}, para o cliente receber
+# JSON válido e saber que a lista veio incompleta.
+def _array_json_em_blocos(blocos):
+    yield b"["
+    primeiro = True
+    try:
+        for bloco in blocos:
+            # Serializa o bloco como lista e tira os colchetes
+            itens = current_app.json.dumps_bytes(bloco)[1:-1]
+            yield itens if primeiro else b"," + itens
+            primeiro = False
+    except Exception as e:
+        logger.exception("Erro ao enviar a listagem de pedidos em streaming")
+        erro = current_app.json.dumps_bytes(
+            {"erro": "Listagem interrompida", "detalhes": str(e)}
+        )
+        yield erro if primeiro else b"," + erro
+    finally:
+        db.session.rollback()
+    yield b"]"
+
+
 # Atualizar informações de um pedido específico
 @admin_pedidos_routes.route("/pedidos/<pedido_id>", methods=["PUT"])
 @admin_required
@@ -61,6 +115,24 @@ def atualizar_pedido(pedido_id):
         return jsonify({"erro": str(e)}), 400
 
 
+# Atualizar o status de vários pedidos de uma vez
+# Body: {"status": "ENVIADO", "pedidos": ["id1", {"pedido_id": "id2", "codigo_rastreio": "BR123"}]}
+# (cada item pode trazer o próprio "status"). Responde com o resultado de cada pedido.
+@admin_pedidos_routes.route("/pedidos/status", methods=["POST"])
+@admin_required
+def atualizar_status_em_lote():
+    try:
+        data = request.get_json() or {}
+        pedidos = data.get("pedidos")
+        if not isinstance(pedidos, list):
+            return jsonify({"erro": "Informe a lista 'pedidos'"}), 400
+
+        resultado = atualizar_status_em_lote_service(pedidos, data.get("status"))
+        return jsonify(resultado), 200
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+
+
 # Deletar um pedido específico
 @admin_pedidos_routes.route("/pedidos/<pedido_id>", methods=["DELETE"])
 @admin_required
@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify
 from services.public.PagamentosService import PagamentoService
+from services.public.WebhookService import WebhookService
 from utils.middlewares.auth import token_required
+from utils.middlewares.idempotencia import idempotente
 
 pagamentos_routes = Blueprint("pagamentos", __name__)
 
@@ -8,6 +10,7 @@ pagamentos_routes = Blueprint("pagamentos", __name__)
 # CRIAR PREFERÊNCIA DE PAGAMENTO (Checkout Mercado Pago)
 @pagamentos_routes.route("/pedidos/<pedido_id>/pagamento/preferencia", methods=["POST"])
 @token_required
+@idempotente
 def criar_preferencia(payload, pedido_id):
     try:
         resultado = PagamentoService.criar_preferencia_pagamento(pedido_id)
@@ -21,20 +24,23 @@ def criar_preferencia(payload, pedido_id):
 def webhook_mercadopago():
 
     # Recebe notificações do Mercado Pago sobre mudanças de status.
+    # Só grava a notificação e responde na hora; o processamento (consulta ao
+    # MP, status do pedido, envio) é feito pela fila em jobs.processar_webhooks.
 
     try:
-        data = request.json or request.form.to_dict()
+        data = request.get_json(silent=True) or request.form.to_dict()
 
-        resultado = PagamentoService.processar_webhook_mercadopago(data)
+        notificacao_id = WebhookService.receber(data)
 
-        if resultado:
-            return jsonify({"status": "processado", "resultado": resultado}), 200
+        if notificacao_id:
+            return jsonify({"status": "recebido", "id": notificacao_id}), 200
 
         return jsonify({"status": "ignorado"}), 200
 
     except Exception as e:
-        print(f"Erro ao processar webhook: {str(e)}")
-        return jsonify({"erro": str(e)}), 400
+        # Sem gravar a notificação, deixa o Mercado Pago tentar de novo
+        print(f"Erro ao receber webhook: {str(e)}")
+        return jsonify({"erro": str(e)}), 500
 
 
 # ESTORNAR PAGAMENTO
@@ -62,30 +68,14 @@ def estornar_pagamento(payload, transacao_id):
 @pagamentos_routes.route("/transacoes/<transacao_id>", methods=["GET"])
 @token_required
 def consultar_transacao(payload, transacao_id):
-    # Consulta detalhes de uma transação
+    # Consulta detalhes de uma transação, com o status atual no Mercado Pago.
+    # A consulta não altera o pedido: se o MP já tem um status novo, ele vem em
+    # "status" com "atualizacao_pendente": true até a fila dos webhooks aplicar
+    # a transição (pedido, estoque, email, envio).
     try:
-        from database.models import TransacaoPagamento
-
-        transacao = TransacaoPagamento.query.get(transacao_id)
-        if not transacao:
-            return jsonify({"erro": "Transação não encontrada"}), 404
-
-        return (
-            jsonify(
-                {
-                    "transacao_id": transacao.id,
-                    "pedido_id": transacao.pedido_id,
-                    "valor": float(transacao.valor),
-                    "status": transacao.status.value,
-                    "metodo_pagamento": transacao.metodo_pagamento,
-                    "mp_payment_id": transacao.mp_payment_id,
-                    "criado_em": (
-                        transacao.criado_em.isoformat() if transacao.criado_em else None
-                    ),
-                }
-            ),
-            200,
-        )
+        return jsonify(PagamentoService.consultar_transacao(transacao_id)), 200
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 404
     except Exception as e:
         return jsonify({"erro": str(e)}), 400
 
@@ -5,6 +5,9 @@ from database.models.produto import Produto
 from database.models.endereco import Endereco
 from services.public.MelhorEnvioService import calcular_frete_pedido
 from utils.middlewares.auth import token_required
+from utils.middlewares.idempotencia import idempotente
+from utils.http_cache import resposta_condicional
+from utils.paginacao import codificar_cursor, decodificar_cursor, ler_limite
 import os
 
 public_routes_pedidos = Blueprint("pedidos_public", __name__)
@@ -114,6 +117,7 @@ def cotacao_frete_carrinho(payload):
 # CRIAR UM NOVO PEDIDO (com frete já selecionado)
 @public_routes_pedidos.route("/pedidos", methods=["POST"])
 @token_required
+@idempotente
 def criar_pedido(payload):
     try:
         data = request.json
@@ -163,37 +167,61 @@ def resumo_frete(payload, pedido_id):
 @public_routes_pedidos.route("/pedidos/<pedido_id>", methods=["GET"])
 @token_required
 def obter_pedido(payload, pedido_id):
-    pedido = PedidoService.obter_pedido(pedido_id)
-    if not pedido:
+    entrada = PedidoService.obter_documento_pedido(pedido_id)
+    if not entrada:
         return jsonify({"erro": "Pedido não encontrado"}), 404
 
-    return jsonify(pedido), 200
+    return resposta_condicional(entrada, privado=True)
 
 
 # PEDIDOS POR USUÁRIO
+# ?limite=20&cursor=... pagina por (criado_em, id); sem eles, retorna a lista completa
 @public_routes_pedidos.route("/usuarios/<usuario_id>/pedidos", methods=["GET"])
 @token_required
 def pedidos_usuario(payload, usuario_id):
-    pedidos_objs = PedidoService.listar_pedidos_usuario(usuario_id)
+    try:
+        paginar = "limite" in request.args or "cursor" in request.args
+        limite = ler_limite(request.args.get("limite")) if paginar else None
+        cursor = decodificar_cursor(request.args.get("cursor"))
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+
+    pedidos_objs, tem_mais = PedidoService.listar_pedidos_usuario(
+        usuario_id, cursor=cursor, limite=limite
+    )
+
+    # Nome do usuário carregado uma vez só (é o mesmo em todos os pedidos)
+    usuario = PedidoService.obter_nome_usuario(usuario_id) if pedidos_objs else None
+    nome_usuario = usuario.nome if usuario else None
+    sobrenome_usuario = usuario.sobrenome if usuario else None
 
     # Converter cada objeto para dicionário
     pedidos = [
         {
             "pedido_id": p.id,
-            "nome_usuario": p.usuario.nome if p.usuario else None,
-            "sobrenome_usuario": p.usuario.sobrenome if p.usuario else None,
+            "nome_usuario": nome_usuario,
+            "sobrenome_usuario": sobrenome_usuario,
             "valor_total": float(p.valor_total),
             "status": p.status.value,
             "frete_valor": float(p.frete_valor) if p.frete_valor else None,
-            "criado_em": (
-                p.criado_em.isoformat()
-                if hasattr(p, "criado_em") and p.criado_em
-                else None
-            ),
-            "tem_rastreio": hasattr(p, "melhor_envio_id")
-            and p.melhor_envio_id is not None,
+            "criado_em": p.criado_em.isoformat() if p.criado_em else None,
+            "tem_rastreio": p.melhor_envio_id is not None,
         }
         for p in pedidos_objs
     ]
 
-    return jsonify(pedidos), 200
+    if not paginar:
+        return jsonify(pedidos), 200
+
+    ultimo = pedidos_objs[-1] if pedidos_objs else None
+    return (
+        jsonify(
+            {
+                "pedidos": pedidos,
+                "proximo_cursor": (
+                    codificar_cursor(ultimo.criado_em, ultimo.id) if tem_mais else None
+                ),
+            }
+        ),
+        200,
+    )
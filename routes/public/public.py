@@ -1,7 +1,19 @@
-from flask import Blueprint, request, jsonify
+from decimal import Decimal, InvalidOperation
+from flask import Blueprint, current_app, request, jsonify
 from services.public.ProdutosServices import ProdutoService
 from services.public.PromocoesService import PromocaoService
+from services.public.BuscaService import BuscaService
+from services.public.VitrineService import VitrineService
 from utils.middlewares.auth import token_required
+from utils.formatters.produto_formatter import CAMPOS_PRODUTO
+from utils.cache import catalogo_cache, tag_produto
+from utils.http_cache import preparar_json, resposta_condicional
+from utils.paginacao import (
+    LIMITE_MAXIMO,
+    codificar_cursor,
+    decodificar_cursor,
+    ler_limite,
+)
 
 
 public_routes = Blueprint("public", __name__)
@@ -16,131 +28,286 @@ def health():
 # PRODUTOS
 
 
-# Lista todos os produtos disponíveis
+# Ids dos produtos de uma resposta do catálogo (lista, {"produtos": [...]} ou
+# um produto só)
+def _ids_produtos(dados):
+    if isinstance(dados, dict):
+        dados = dados.get("produtos", [dados])
+    return [p["id"] for p in dados if isinstance(p, dict) and "id" in p]
+
+
+# Busca no cache a resposta já serializada (corpo + ETag) ou monta e guarda.
+# Se carregar() retornar None, nada é guardado e o retorno é None.
+# Entradas de produtos ganham também a tag de cada produto que mostram, para
+# que pedidos descartem só o que mudou; listas que dependem do estoque de
+# produtos que não estão nelas (em_estoque, facetas) esperam o TTL.
+def _entrada_catalogo(chave, carregar, tags=("produtos",)):
+    entrada = catalogo_cache.obter(chave)
+    if entrada is None:
+        dados = carregar()
+        if dados is None:
+            return None
+        entrada = preparar_json(dados)
+        if "produtos" in tags:
+            tags = (*tags, *(tag_produto(i) for i in _ids_produtos(dados)))
+        catalogo_cache.definir(chave, entrada, tags=tags)
+    return entrada
+
+
+# Lê o parâmetro ?fields=id,nome,preco,img
+def _ler_campos(valor):
+    if not valor:
+        return CAMPOS_PRODUTO
+
+    campos = [c.strip() for c in valor.split(",") if c.strip()]
+    invalidos = [c for c in campos if c not in CAMPOS_PRODUTO]
+    if invalidos:
+        raise ValueError(
+            f"Campos inválidos: {', '.join(invalidos)}. "
+            f"Campos aceitos: {', '.join(CAMPOS_PRODUTO)}"
+        )
+
+    # id sempre volta na resposta
+    return tuple(dict.fromkeys(["id", *campos]))
+
+
+# Lê um parâmetro booleano (?em_estoque=true / 1 / false / 0)
+def _ler_booleano(valor, nome):
+    if valor is None or valor == "":
+        return None
+    if valor.lower() in ("true", "1", "sim"):
+        return True
+    if valor.lower() in ("false", "0", "nao", "não"):
+        return False
+    raise ValueError(f"Valor inválido para {nome}: use true ou false")
+
+
+# Lê um parâmetro de preço (?preco_min=50 / ?preco_max=199.90)
+def _ler_preco(valor, nome):
+    if valor is None or valor == "":
+        return None
+    try:
+        preco = Decimal(valor.replace(",", "."))
+    except InvalidOperation:
+        raise ValueError(f"Valor inválido para {nome}")
+    if preco < 0:
+        raise ValueError(f"{nome} não pode ser negativo")
+    return preco
+
+
+# Lê os filtros do catálogo (categoria, preco_min, preco_max, em_estoque, em_promocao)
+def _ler_filtros(args):
+    filtros = {
+        "categoria": args.get("categoria", "").strip().lower() or None,
+        "preco_min": _ler_preco(args.get("preco_min"), "preco_min"),
+        "preco_max": _ler_preco(args.get("preco_max"), "preco_max"),
+        "em_estoque": _ler_booleano(args.get("em_estoque"), "em_estoque"),
+        "em_promocao": _ler_booleano(args.get("em_promocao"), "em_promocao"),
+    }
+    return {chave: valor for chave, valor in filtros.items() if valor is not None}
+
+
+# Lista os produtos disponíveis
+# ?fields=id,nome,preco,img limita as colunas carregadas e retornadas
+# ?categoria=&preco_min=&preco_max=&em_estoque=&em_promocao= filtram no banco
+# ?limite=20&cursor=... pagina por (criado_em, id); sem eles, retorna a lista completa
 @public_routes.route("/produtos", methods=["GET"])
 def listar_produtos():
-    produtos = ProdutoService.listar_todos()
-    return jsonify(
-        [
-            {
-                "id": p.id,
-                "nome": p.nome,
-                "descricao": p.descricao,
-                "categoria": p.categoria,
-                "preco": float(p.preco),
-                "img": p.img,
-                "estoque": p.estoque,
-                "peso": float(p.peso),
-                "altura": p.altura,
-                "largura": p.largura,
-                "comprimento": p.comprimento,
-            }
-            for p in produtos
-        ]
+    try:
+        campos = _ler_campos(request.args.get("fields"))
+        filtros = _ler_filtros(request.args)
+        paginar = "limite" in request.args or "cursor" in request.args
+        limite = ler_limite(request.args.get("limite"))
+        cursor = decodificar_cursor(request.args.get("cursor"))
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+
+    projecao = campos if campos != CAMPOS_PRODUTO else None
+
+    def carregar():
+        if not paginar:
+            produtos, _ = ProdutoService.listar_pagina(
+                limite=None, campos=projecao, filtros=filtros
+            )
+            return ProdutoService.formatar_lista(produtos, campos)
+
+        produtos, tem_mais = ProdutoService.listar_pagina(
+            cursor=cursor, limite=limite, campos=projecao, filtros=filtros
+        )
+        ultimo = produtos[-1] if produtos else None
+
+        return {
+            "produtos": ProdutoService.formatar_lista(produtos, campos),
+            "proximo_cursor": (
+                codificar_cursor(ultimo.criado_em, ultimo.id) if tem_mais else None
+            ),
+        }
+
+    chave = (
+        "produtos",
+        campos,
+        tuple(sorted(filtros.items())),
+        paginar,
+        limite,
+        request.args.get("cursor"),
     )
+    return resposta_condicional(_entrada_catalogo(chave, carregar))
+
+
+# Contagem de produtos por categoria, respeitando os demais filtros
+@public_routes.route("/produtos/facetas", methods=["GET"])
+def facetas_produtos():
+    try:
+        filtros = _ler_filtros(request.args)
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+
+    def carregar():
+        categorias = ProdutoService.contar_por_categoria(filtros)
+        return {"categorias": categorias, "total": sum(categorias.values())}
+
+    chave = ("produtos:facetas", tuple(sorted(filtros.items())))
+    return resposta_condicional(_entrada_catalogo(chave, carregar))
+
+
+# Campos padrão da consulta em lote: o que o carrinho precisa para se atualizar
+CAMPOS_LOTE = (
+    "id",
+    "nome",
+    "img",
+    "preco",
+    "estoque",
+    "desconto_percentual",
+    "preco_com_desconto",
+)
+
+
+# Consulta vários produtos de uma vez (reidratação do carrinho)
+# GET /produtos/lote?ids=a,b,c  ou  POST /produtos/lote {"ids": ["a", "b", "c"]}
+# A resposta fica no cache do catálogo: o 304 sai sem consultar o banco
+@public_routes.route("/produtos/lote", methods=["GET", "POST"])
+def buscar_produtos_em_lote():
+    try:
+        if request.method == "POST":
+            ids = (request.get_json(silent=True) or {}).get("ids") or []
+            if not isinstance(ids, list):
+                raise ValueError("ids deve ser uma lista")
+        else:
+            ids = request.args.get("ids", "").split(",")
+
+        ids = list(dict.fromkeys(str(i).strip() for i in ids if str(i).strip()))
+        if not ids:
+            raise ValueError("Informe ao menos um id")
+        if len(ids) > LIMITE_MAXIMO:
+            raise ValueError(f"Máximo de {LIMITE_MAXIMO} ids por consulta")
+
+        campos = (
+            _ler_campos(request.args.get("fields"))
+            if request.args.get("fields")
+            else CAMPOS_LOTE
+        )
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+
+    def carregar():
+        produtos = ProdutoService.buscar_por_ids(ids, campos)
+        encontrados = {p.id for p in produtos}
+        return {
+            "produtos": ProdutoService.formatar_lista(produtos, campos),
+            "nao_encontrados": [i for i in ids if i not in encontrados],
+        }
+
+    entrada = _entrada_catalogo(("produtos:lote", tuple(ids), campos), carregar)
+
+    # 304 só vale para GET; o POST sempre devolve o corpo
+    if request.method == "POST":
+        return current_app.response_class(entrada[0], mimetype="application/json")
+    return resposta_condicional(entrada)
 
 
 # Busca um produto específico pelo ID
 @public_routes.route("/produtos/<string:id>", methods=["GET"])
 def buscar_produto_por_id(id):
-    produto = ProdutoService.buscar_por_id(id)
-    if not produto:
+    def carregar():
+        produto = ProdutoService.buscar_por_id(id)
+        if not produto:
+            return None
+
+        return ProdutoService.formatar(produto)
+
+    # IDs inexistentes não entram no cache, para não expulsar entradas úteis
+    entrada = _entrada_catalogo(("produto", id), carregar)
+    if entrada is None:
         return jsonify({"erro": "Produto não encontrado"}), 404
 
-    return jsonify(
-        {
-            "id": produto.id,
-            "nome": produto.nome,
-            "descricao": produto.descricao,
-            "categoria": produto.categoria,
-            "preco": float(produto.preco),
-            "img": produto.img,
-            "estoque": int(produto.estoque),
-            "peso": float(produto.peso),
-            "altura": produto.altura,
-            "largura": produto.largura,
-            "comprimento": produto.comprimento,
-        }
-    )
+    return resposta_condicional(entrada)
 
 
-# Lista os 5 produtos com maior estoque (para a página inicial)
+# Lista os produtos com maior estoque (para a página inicial), já pré-montados
 @public_routes.route("/produtos/home", methods=["GET"])
 def listar_top_estoque():
-    produtos = ProdutoService.listar_top_estoque()
-    return jsonify(
-        [
-            {
-                "id": p.id,
-                "nome": p.nome,
-                "descricao": p.descricao,
-                "categoria": p.categoria,
-                "preco": float(p.preco),
-                "img": p.img,
-                "estoque": p.estoque,
-                "peso": float(p.peso),
-                "altura": p.altura,
-                "largura": p.largura,
-                "comprimento": p.comprimento,
-            }
-            for p in produtos
-        ]
-    )
+    entrada = VitrineService.obter("home")
+    if entrada is None:
+        return jsonify([])
+
+    return resposta_condicional(entrada)
 
 
-# Lista os 5 últimos produtos adicionados
+# Lista os últimos produtos adicionados, já pré-montados
 @public_routes.route("/produtos/novidades", methods=["GET"])
 def listar_ultimos_produtos_adicionados():
-    produtos = ProdutoService.listar_ultimos_adicionados()
-    if not produtos:
+    entrada = VitrineService.obter("novidades")
+    if entrada is None:
         return jsonify({"mensagem": "Nenhum produto encontrado"}), 404
 
-    return jsonify(
-        [
-            {
-                "id": p.id,
-                "nome": p.nome,
-                "descricao": p.descricao,
-                "categoria": p.categoria,
-                "preco": float(p.preco),
-                "img": p.img,
-                "estoque": p.estoque,
-                "peso": float(p.peso),
-                "altura": p.altura,
-                "largura": p.largura,
-                "comprimento": p.comprimento,
-            }
-            for p in produtos
-        ]
-    )
+    return resposta_condicional(entrada)
 
 
-# Busca produtos pelo nome (usando query param ?nome=)
+# Busca produtos por nome, categoria e descrição (usando query param ?nome=),
+# em ordem de relevância. Sem ?limite= retorna a lista com todos os encontrados;
+# com ?limite=20 retorna {produtos, total}, os `limite` mais relevantes e quantos
+# produtos foram encontrados ao todo
 @public_routes.route("/produtos/busca", methods=["GET"])
 def buscar_produtos_por_nome():
     termo = request.args.get("nome", "").strip()
     if not termo:
         return jsonify({"erro": "Informe um termo para busca"}), 400
 
-    produtos = ProdutoService.buscar_por_nome(termo)
-    return jsonify(
-        [
-            {
-                "id": p.id,
-                "nome": p.nome,
-                "descricao": p.descricao,
-                "categoria": p.categoria,
-                "preco": float(p.preco),
-                "img": p.img,
-                "estoque": p.estoque,
-                "peso": float(p.peso),
-                "altura": p.altura,
-                "largura": p.largura,
-                "comprimento": p.comprimento,
-            }
-            for p in produtos
-        ]
-    )
+    try:
+        limite = (
+            ler_limite(request.args.get("limite")) if "limite" in request.args else None
+        )
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+
+    def carregar():
+        produtos, total = ProdutoService.buscar_por_nome(termo, limite)
+        if limite is None:
+            return ProdutoService.formatar_lista(produtos)
+        return {"produtos": ProdutoService.formatar_lista(produtos), "total": total}
+
+    chave = ("produtos:busca", termo.lower(), limite)
+    return resposta_condicional(_entrada_catalogo(chave, carregar))
+
+
+# Sugestões para a caixa de busca (usando query param ?q=), sem ir ao banco;
+# a resposta fica no cache do catálogo e o 304 sai sem consultar o índice
+@public_routes.route("/produtos/autocomplete", methods=["GET"])
+def autocomplete_produtos():
+    prefixo = request.args.get("q", "").strip()
+    if not prefixo:
+        return jsonify({"sugestoes": []})
+
+    try:
+        limite = ler_limite(request.args.get("limite"), padrao=8, maximo=20)
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+
+    def carregar():
+        return {"sugestoes": BuscaService.sugerir(prefixo, limite)}
+
+    chave = ("produtos:autocomplete", " ".join(prefixo.lower().split()), limite)
+    return resposta_condicional(_entrada_catalogo(chave, carregar))
 
 
 # PROMOÇÕES
@@ -149,24 +316,20 @@ def buscar_produtos_por_nome():
 # Lista promoções ativas (com preço já calculado com desconto)
 @public_routes.route("/promocoes", methods=["GET"])
 def listar_promocoes():
-    promocoes = PromocaoService.listar()
-    return jsonify(
-        [
+    def carregar():
+        promocoes = PromocaoService.listar()
+        return [
             {
                 "id": p.id,
                 "produto_id": p.produto_id,
-                "produto_nome": p.produto.nome,
-                "preco_original": float(p.produto.preco),
+                "produto_nome": p.produto_nome,
+                "preco_original": float(p.preco_original),
                 "desconto_percentual": p.desconto_percentual,
-                "preco_com_desconto": round(
-                    float(
-                        PromocaoService.calcular_preco_com_desconto(
-                            p.produto.preco, p.desconto_percentual
-                        )
-                    ),
-                    2,
-                ),
+                "preco_com_desconto": float(p.preco_com_desconto),
             }
             for p in promocoes
         ]
+
+    return resposta_condicional(
+        _entrada_catalogo("promocoes", carregar, tags=("promocoes",))
     )
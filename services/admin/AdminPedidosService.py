@@ -1,12 +1,54 @@
 from database import db
 from database.models import Pedido, ItemPedido, TransacaoPagamento, Produto, pedido
+from database.models import Usuario
 from database.models import StatusPedidoEnum, StatusPagamentoEnum
+from services.public.NotificacaoEmailService import NotificacaoEmailService
+from services.public.PagamentosService import PagamentoService
+from services.public.PedidosService import PedidoService
+from services.public.ReservaEstoqueService import ReservaEstoqueService
+from services.public.VitrineService import VitrineService
+from sqlalchemy import select, update
+from sqlalchemy.orm import joinedload, load_only, selectinload
+from utils.date_time import agora_brasil_sem_fuso
+from utils.paginacao import codificar_cursor, filtro_keyset_desc
+import os
 
 CATEGORIAS_MAP = {1: "facas", 2: "aventais", 3: "estojos", 4: "churrascos"}
 
-
-# Listar todos os pedidos
-def listar_pedidos(data_inicial=None, data_final=None, categoria_id=None):
+# Transições de status permitidas para o admin (status atual -> próximos)
+TRANSICOES_STATUS = {
+    StatusPedidoEnum.PENDENTE: {StatusPedidoEnum.PAGO, StatusPedidoEnum.CANCELADO},
+    StatusPedidoEnum.PAGO: {
+        StatusPedidoEnum.EM_SEPARACAO,
+        StatusPedidoEnum.ENVIADO,
+        StatusPedidoEnum.CANCELADO,
+    },
+    StatusPedidoEnum.EM_SEPARACAO: {
+        StatusPedidoEnum.ENVIADO,
+        StatusPedidoEnum.CANCELADO,
+    },
+    StatusPedidoEnum.ENVIADO: {StatusPedidoEnum.ENTREGUE},
+    StatusPedidoEnum.ENTREGUE: set(),
+    StatusPedidoEnum.CANCELADO: set(),
+}
+
+# Email enviado ao cliente quando o pedido entra no status
+EMAIL_POR_STATUS = {
+    StatusPedidoEnum.EM_SEPARACAO: "pedido_em_separacao",
+    StatusPedidoEnum.ENVIADO: "pedido_enviado",
+    StatusPedidoEnum.ENTREGUE: "pedido_entregue",
+}
+
+# Máximo de pedidos por chamada de atualização em lote
+STATUS_LOTE_MAXIMO = int(os.getenv("ADMIN_STATUS_LOTE_MAXIMO", 500))
+
+# Pedidos lidos do banco e enviados por bloco na listagem em streaming
+STREAM_LOTE = int(os.getenv("ADMIN_PEDIDOS_STREAM_LOTE", 500))
+
+
+# Consulta dos pedidos do painel, do mais recente para o mais antigo.
+# Carrega só as colunas da listagem e o nome do usuário no mesmo SELECT.
+def _consultar_pedidos(data_inicial=None, data_final=None, categoria_id=None):
     categoria = None
     if categoria_id is not None:
         categoria = CATEGORIAS_MAP.get(categoria_id)
@@ -15,7 +57,17 @@ def listar_pedidos(data_inicial=None, data_final=None, categoria_id=None):
                 f"Categoria ID inválida. IDs aceitos: {list(CATEGORIAS_MAP.keys())}"
             )
 
-    query = Pedido.query
+    query = Pedido.query.options(
+        load_only(
+            Pedido.id,
+            Pedido.usuario_id,
+            Pedido.valor_total,
+            Pedido.status,
+            Pedido.revisao_motivo,
+            Pedido.criado_em,
+        ),
+        joinedload(Pedido.usuario).load_only(Usuario.nome),
+    )
 
     filtros = []
 
@@ -26,32 +78,80 @@ def listar_pedidos(data_inicial=None, data_final=None, categoria_id=None):
         filtros.append(Pedido.criado_em <= data_final)
 
     if categoria:
-        query = (
-            query.join(ItemPedido).join(Produto).filter(Produto.categoria == categoria)
+        # EXISTS em vez de JOIN + DISTINCT: para no primeiro item da categoria
+        filtros.append(
+            select(ItemPedido.id)
+            .join(Produto, ItemPedido.produto_id == Produto.id)
+            .where(ItemPedido.pedido_id == Pedido.id, Produto.categoria == categoria)
+            .exists()
         )
 
     if filtros:
         query = query.filter(*filtros)
 
-    if categoria:
-        query = query.distinct()
-
-    pedidos = query.all()
-
-    resultado = []
-    for p in pedidos:
-        resultado.append(
-            {
-                "id": p.id,
-                "usuario_id": p.usuario_id,
-                "valor_total": float(p.valor_total),
-                "nome": p.usuario.nome if p.usuario else None,
-                "status": p.status.name,
-                "criado_em": p.criado_em.isoformat() if p.criado_em else None,
-            }
-        )
+    return query.order_by(Pedido.criado_em.desc(), Pedido.id.desc())
+
+
+def _formatar_pedido(p):
+    return {
+        "id": p.id,
+        "usuario_id": p.usuario_id,
+        "valor_total": float(p.valor_total),
+        "nome": p.usuario.nome if p.usuario else None,
+        "status": p.status.name,
+        "revisao_motivo": p.revisao_motivo,
+        "criado_em": p.criado_em.isoformat() if p.criado_em else None,
+    }
+
+
+# Listar uma página de pedidos (keyset por criado_em, id).
+# Retorna (pedidos, proximo_cursor); proximo_cursor é None na última página.
+def listar_pedidos(
+    data_inicial=None, data_final=None, categoria_id=None, cursor=None, limite=20
+):
+    query = _consultar_pedidos(data_inicial, data_final, categoria_id)
+
+    if cursor:
+        query = query.filter(filtro_keyset_desc(Pedido.criado_em, Pedido.id, cursor))
 
-    return resultado
+    # Busca um item a mais para saber se existe próxima página
+    pedidos = query.limit(limite + 1).all()
+    tem_mais = len(pedidos) > limite
+    pedidos = pedidos[:limite]
+
+    proximo_cursor = None
+    if tem_mais:
+        proximo_cursor = codificar_cursor(pedidos[-1].criado_em, pedidos[-1].id)
+
+    return [_formatar_pedido(p) for p in pedidos], proximo_cursor
+
+
+# Todos os pedidos do filtro, em blocos de `lote` dicts, lidos do banco aos
+# poucos (yield_per) para não montar o resultado inteiro em memória.
+# Os filtros são validados já na chamada; a leitura acontece ao iterar.
+def iterar_pedidos(
+    data_inicial=None, data_final=None, categoria_id=None, lote=STREAM_LOTE
+):
+    query = _consultar_pedidos(data_inicial, data_final, categoria_id)
+
+    def blocos():
+        # Roda na sessão de quem itera: no streaming a da requisição já foi
+        # encerrada quando o corpo começa a ser enviado
+        linhas = iter(query.with_session(db.session()).yield_per(lote))
+        try:
+            bloco = []
+            for p in linhas:
+                bloco.append(_formatar_pedido(p))
+                if len(bloco) >= lote:
+                    yield bloco
+                    bloco = []
+            if bloco:
+                yield bloco
+        finally:
+            # Erro no meio ou cliente que desconectou: fecha o cursor aberto
+            linhas.close()
+
+    return blocos()
 
 
 # Atualizar pedido
@@ -76,9 +176,140 @@ def atualizar_pedido(pedido_id, data):
         pedido.frete_tipo = frete_tipo  # Atualiza tipo de frete
 
     db.session.commit()
+    PedidoService.invalidar_pedido(pedido_id)
     return pedido
 
 
+# Atualizar o status de vários pedidos de uma vez.
+# entradas: ids de pedido ou {"pedido_id", "status", "codigo_rastreio"}; o status
+# de cada entrada cai para status_padrao se não vier.
+# Aplica um UPDATE por status de destino, enfileira os emails e faz um único
+# commit. Retorna o resultado de cada pedido.
+def atualizar_status_em_lote(entradas, status_padrao=None):
+    if not entradas:
+        raise ValueError("Nenhum pedido informado")
+    if len(entradas) > STATUS_LOTE_MAXIMO:
+        raise ValueError(f"Máximo de {STATUS_LOTE_MAXIMO} pedidos por chamada")
+
+    resultados = []
+    solicitados = {}  # pedido_id -> (novo status, codigo_rastreio)
+
+    for entrada in entradas:
+        if isinstance(entrada, dict):
+            pedido_id = entrada.get("pedido_id")
+            status = entrada.get("status") or status_padrao
+            codigo_rastreio = entrada.get("codigo_rastreio")
+        else:
+            pedido_id, status, codigo_rastreio = entrada, status_padrao, None
+
+        resultado = {"pedido_id": pedido_id}
+        resultados.append(resultado)
+
+        if not pedido_id or not isinstance(pedido_id, str):
+            resultado.update(resultado="invalido", erro="pedido_id inválido")
+            continue
+        if pedido_id in solicitados:
+            resultado.update(resultado="duplicado", erro="Pedido repetido na lista")
+            continue
+
+        try:
+            novo_status = StatusPedidoEnum[str(status).upper()]
+        except KeyError:
+            resultado.update(resultado="invalido", erro="Status inválido")
+            continue
+
+        solicitados[pedido_id] = (novo_status, codigo_rastreio)
+
+    # Trava os pedidos (ordem por id evita deadlock entre lotes simultâneos)
+    atuais = dict(
+        db.session.query(Pedido.id, Pedido.status)
+        .filter(Pedido.id.in_(solicitados))
+        .order_by(Pedido.id)
+        .with_for_update()
+        .all()
+    )
+
+    por_destino = {}  # novo status -> [pedido_id]
+    for resultado in resultados:
+        if "resultado" in resultado:
+            continue
+
+        pedido_id = resultado["pedido_id"]
+        novo_status, _ = solicitados[pedido_id]
+        status_atual = atuais.get(pedido_id)
+
+        if status_atual is None:
+            resultado.update(resultado="nao_encontrado", erro="Pedido não encontrado")
+            continue
+
+        resultado.update(
+            status_anterior=status_atual.value, status_novo=novo_status.value
+        )
+
+        if status_atual == novo_status:
+            resultado["resultado"] = "inalterado"
+        elif novo_status in TRANSICOES_STATUS[status_atual]:
+            resultado["resultado"] = "atualizado"
+            por_destino.setdefault(novo_status, []).append(pedido_id)
+        else:
+            resultado.update(
+                resultado="transicao_invalida",
+                erro=f"Transição {status_atual.value} → {novo_status.value} não permitida",
+            )
+
+    agora = agora_brasil_sem_fuso()
+    tabela = Pedido.__table__
+    produtos_alterados = set()
+    for novo_status, pedido_ids in por_destino.items():
+        db.session.execute(
+            update(tabela)
+            .where(tabela.c.id.in_(pedido_ids))
+            .values(status=novo_status, atualizado_em=agora)
+        )
+
+        # Cancelados antes do pagamento devolvem o estoque reservado; os já
+        # pagos não têm mais reserva e devolvem o estoque dos itens. O estorno
+        # do pagamento continua sendo feito por transação (POST
+        # /transacoes/<id>/estornar), que não devolve o estoque de novo.
+        if novo_status == StatusPedidoEnum.CANCELADO:
+            pendentes = [
+                p for p in pedido_ids if atuais[p] == StatusPedidoEnum.PENDENTE
+            ]
+            produtos_alterados.update(ReservaEstoqueService.liberar_pedidos(pendentes))
+
+            pagos = [p for p in pedido_ids if atuais[p] != StatusPedidoEnum.PENDENTE]
+            for pedido in Pedido.query.options(selectinload(Pedido.itens)).filter(
+                Pedido.id.in_(pagos)
+            ):
+                produtos_alterados.update(PagamentoService._reverter_estoque(pedido))
+            for resultado in resultados:
+                if resultado["pedido_id"] in pagos:
+                    resultado["aviso"] = "Pedido pago: estorne o pagamento"
+
+        tipo_email = EMAIL_POR_STATUS.get(novo_status)
+        if tipo_email:
+            for pedido_id in pedido_ids:
+                codigo_rastreio = solicitados[pedido_id][1]
+                if codigo_rastreio:
+                    NotificacaoEmailService.enfileirar(
+                        pedido_id, tipo_email, codigo_rastreio=codigo_rastreio
+                    )
+                else:
+                    NotificacaoEmailService.enfileirar(pedido_id, tipo_email)
+
+    db.session.commit()
+
+    atualizados = [p for pedido_ids in por_destino.values() for p in pedido_ids]
+    PedidoService.invalidar_pedido(*atualizados)
+    VitrineService.estoque_alterado(produtos_alterados)
+
+    resumo = {}
+    for resultado in resultados:
+        resumo[resultado["resultado"]] = resumo.get(resultado["resultado"], 0) + 1
+
+    return {"resultados": resultados, "resumo": resumo}
+
+
 # Deletar pedido
 def deletar_pedido(pedido_id):
     pedido = Pedido.query.get(pedido_id)
@@ -90,6 +321,7 @@ def deletar_pedido(pedido_id):
 
     db.session.delete(pedido)
     db.session.commit()
+    PedidoService.invalidar_pedido(pedido_id)
     return pedido
 
 
@@ -105,6 +337,7 @@ def atualizar_item(item_id, data):
         item.preco_unitario = data["preco_unitario"]
 
     db.session.commit()
+    PedidoService.invalidar_pedido(item.pedido_id)
     return item
 
 
@@ -116,6 +349,7 @@ def deletar_item(item_id):
 
     db.session.delete(item)
     db.session.commit()
+    PedidoService.invalidar_pedido(item.pedido_id)
     return item
 
 
@@ -133,4 +367,5 @@ def atualizar_transacao(transacao_id, data):
             raise ValueError("Status inválido")
 
     db.session.commit()
+    PedidoService.invalidar_pedido(transacao.pedido_id)
     return transacao
@@ -4,10 +4,28 @@ from sqlalchemy import func
 import uuid
 import cloudinary.uploader
 from cloudinary.utils import cloudinary_url
+from services.public.BuscaService import BuscaService
+from services.public.VitrineService import VitrineService
+from utils.cache import catalogo_cache
 
 CATEGORIAS_VALIDAS = ["facas", "aventais", "estojos", "churrascos"]
 
 
+# Invalida o cache do catálogo público e regera as vitrines após uma escrita do admin
+def _catalogo_alterado(*tags):
+    catalogo_cache.invalidar(*(tags or ("produtos", "promocoes")))
+    VitrineService.atualizar()
+
+
+# Mantém o índice de busca em dia com a escrita do admin
+def _produto_alterado(produto=None, removido_id=None):
+    _catalogo_alterado()
+    if removido_id:
+        BuscaService.remover(removido_id)
+    if produto is not None:
+        BuscaService.indexar(produto)
+
+
 # PRODUTOS
 
 
@@ -56,6 +74,7 @@ def adicionar_produto(data, file=None):
     )
     db.session.add(produto)
     db.session.commit()
+    _produto_alterado(produto)
     return produto
 
 
@@ -66,6 +85,7 @@ def deletar_produto(produto_id):
         raise ValueError("Produto não encontrado")
     db.session.delete(produto)
     db.session.commit()
+    _produto_alterado(removido_id=produto_id)
     return produto
 
 
@@ -97,6 +117,7 @@ def atualizar_produto(produto_id, data):
             setattr(produto, campo, data[campo])
 
     db.session.commit()
+    _produto_alterado(produto)
     return produto
 
 
@@ -111,6 +132,7 @@ def atualizar_estoque(produto_id, novo_estoque):
 
     produto.estoque = novo_estoque
     db.session.commit()
+    _catalogo_alterado()
     return produto
 
 
@@ -131,6 +153,7 @@ def criar_promocao(produto_id, desconto):
     promocao = Promocao(produto_id=produto_id, desconto_percentual=desconto)
     db.session.add(promocao)
     db.session.commit()
+    _catalogo_alterado()
     return promocao
 
 
@@ -141,4 +164,5 @@ def remover_promocao(produto_id):
         raise ValueError("Promoção não encontrada")
     db.session.delete(promocao)
     db.session.commit()
+    _catalogo_alterado()
     return promocao
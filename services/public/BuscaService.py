@@ -0,0 +1,319 @@
+import logging
+import math
+import os
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import Counter
+
+from sqlalchemy.orm import load_only
+
+from database.models import Produto
+from utils.texto import normalizar, tokenizar
+
+logger = logging.getLogger(__name__)
+
+# Peso de cada campo na frequência do termo (nome conta mais que descrição)
+PESOS_CAMPOS = {"nome": 3, "categoria": 2, "descricao": 1}
+
+# Intervalo para reconstruir o índice do zero (cobre escritas feitas em outros workers)
+BUSCA_INDICE_TTL = int(os.getenv("BUSCA_INDICE_TTL", 300))
+
+
+class IndiceInvertido:
+    """
+    Índice invertido em memória com ranqueamento BM25.
+    Cada documento é um produto; os termos vêm de nome, categoria e descrição.
+    """
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings = {}  # termo -> {produto_id: frequência}
+        self._termos_doc = {}  # produto_id -> Counter(termo -> frequência)
+        self._tamanhos = {}  # produto_id -> tamanho do documento
+        self._total_tamanhos = 0
+        self._vocabulario = []  # termos ordenados, para expansão por prefixo
+        self._vocabulario_sujo = False
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._tamanhos)
+
+    @staticmethod
+    def _termos(produto):
+        termos = Counter()
+        for campo, peso in PESOS_CAMPOS.items():
+            for termo in tokenizar(getattr(produto, campo, None)):
+                termos[termo] += peso
+        return termos
+
+    def adicionar(self, produto):
+        termos = self._termos(produto)
+        with self._lock:
+            self._remover(produto.id)
+            if not termos:
+                return
+
+            for termo, freq in termos.items():
+                if termo not in self._postings:
+                    self._postings[termo] = {}
+                    self._vocabulario_sujo = True
+                self._postings[termo][produto.id] = freq
+
+            tamanho = sum(termos.values())
+            self._termos_doc[produto.id] = termos
+            self._tamanhos[produto.id] = tamanho
+            self._total_tamanhos += tamanho
+
+    def remover(self, produto_id):
+        with self._lock:
+            self._remover(produto_id)
+
+    def _remover(self, produto_id):
+        termos = self._termos_doc.pop(produto_id, None)
+        if termos is None:
+            return
+
+        for termo in termos:
+            docs = self._postings.get(termo)
+            if docs is not None:
+                docs.pop(produto_id, None)
+                if not docs:
+                    del self._postings[termo]
+                    self._vocabulario_sujo = True
+
+        self._total_tamanhos -= self._tamanhos.pop(produto_id)
+
+    def _expandir(self, termo):
+        # Termo exato, ou todos os termos que começam com ele ("lamin" -> "lamina")
+        if termo in self._postings:
+            return [termo]
+
+        if self._vocabulario_sujo:
+            self._vocabulario = sorted(self._postings)
+            self._vocabulario_sujo = False
+
+        expandidos = []
+        i = bisect_left(self._vocabulario, termo)
+        while i < len(self._vocabulario) and self._vocabulario[i].startswith(termo):
+            expandidos.append(self._vocabulario[i])
+            i += 1
+        return expandidos
+
+    def buscar(self, consulta, limite=20):
+        # Retorna [(produto_id, score)] ordenado pelo BM25 (limite=None: todos)
+        termos_consulta = set(tokenizar(consulta))
+        if not termos_consulta:
+            return []
+
+        with self._lock:
+            total_docs = len(self._tamanhos)
+            if not total_docs:
+                return []
+
+            media_tamanho = self._total_tamanhos / total_docs
+            scores = Counter()
+
+            for termo_consulta in termos_consulta:
+                for termo in self._expandir(termo_consulta):
+                    docs = self._postings[termo]
+                    idf = math.log(
+                        1 + (total_docs - len(docs) + 0.5) / (len(docs) + 0.5)
+                    )
+
+                    for produto_id, freq in docs.items():
+                        norma = self.k1 * (
+                            1
+                            - self.b
+                            + self.b * self._tamanhos[produto_id] / media_tamanho
+                        )
+                        scores[produto_id] += (
+                            idf * freq * (self.k1 + 1) / (freq + norma)
+                        )
+
+        return scores.most_common(limite)
+
+
+class IndicePrefixos:
+    """
+    Autocomplete em memória: lista ordenada de (chave normalizada, ...) consultada
+    com bisect. Cada nome entra uma vez inteiro e uma vez a partir de cada
+    palavra, para que "acoug" sugira "Faca Açougueiro".
+    """
+
+    def __init__(self):
+        self._entradas = []  # (chave, prioridade, texto, tipo, produto_id), ordenada
+        self._por_produto = {}  # produto_id -> [entradas]
+        self._categorias = Counter()  # categoria -> quantidade de produtos
+        self._categoria_produto = {}  # produto_id -> categoria
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._por_produto)
+
+    @staticmethod
+    def _chaves(texto):
+        palavras = normalizar(texto).split()
+        # Prioridade 0 para o nome inteiro, 1 para sufixos a partir de cada palavra
+        return [
+            (" ".join(palavras[i:]), 0 if i == 0 else 1) for i in range(len(palavras))
+        ]
+
+    def adicionar(self, produto):
+        with self._lock:
+            self._remover(produto.id)
+
+            entradas = [
+                (chave, prioridade, produto.nome, "produto", produto.id)
+                for chave, prioridade in self._chaves(produto.nome)
+            ]
+            for entrada in entradas:
+                insort(self._entradas, entrada)
+            self._por_produto[produto.id] = entradas
+
+            if produto.categoria:
+                self._categoria_produto[produto.id] = produto.categoria
+                if self._categorias[produto.categoria] == 0:
+                    insort(
+                        self._entradas,
+                        (
+                            normalizar(produto.categoria),
+                            0,
+                            produto.categoria,
+                            "categoria",
+                            "",
+                        ),
+                    )
+                self._categorias[produto.categoria] += 1
+
+    def remover(self, produto_id):
+        with self._lock:
+            self._remover(produto_id)
+
+    def _remover(self, produto_id):
+        for entrada in self._por_produto.pop(produto_id, ()):
+            self._descartar(entrada)
+
+        categoria = self._categoria_produto.pop(produto_id, None)
+        if categoria:
+            self._categorias[categoria] -= 1
+            if self._categorias[categoria] <= 0:
+                del self._categorias[categoria]
+                self._descartar((normalizar(categoria), 0, categoria, "categoria", ""))
+
+    def _descartar(self, entrada):
+        i = bisect_left(self._entradas, entrada)
+        if i < len(self._entradas) and self._entradas[i] == entrada:
+            del self._entradas[i]
+
+    def sugerir(self, prefixo, limite=8):
+        chave = " ".join(normalizar(prefixo).split())
+        if not chave:
+            return []
+
+        with self._lock:
+            candidatos = []
+            i = bisect_left(self._entradas, (chave,))
+            # Olha só uma janela limitada de entradas a partir do prefixo
+            while (
+                i < len(self._entradas)
+                and len(candidatos) < limite * 4
+                and self._entradas[i][0].startswith(chave)
+            ):
+                candidatos.append(self._entradas[i])
+                i += 1
+
+        # Nomes que começam com o prefixo vêm antes dos que só contêm a palavra
+        candidatos.sort(key=lambda e: (e[1], e[0]))
+
+        sugestoes = []
+        vistos = set()
+        for _, _, texto, tipo, produto_id in candidatos:
+            if (tipo, produto_id or texto) in vistos:
+                continue
+            vistos.add((tipo, produto_id or texto))
+            sugestao = {"texto": texto, "tipo": tipo}
+            if produto_id:
+                sugestao["produto_id"] = produto_id
+            sugestoes.append(sugestao)
+            if len(sugestoes) >= limite:
+                break
+
+        return sugestoes
+
+
+class BuscaService:
+    _indice = None
+    _prefixos = None
+    _construido_em = 0.0
+    _lock = threading.Lock()
+
+    # Reconstrói o índice a partir da tabela de produtos
+    @staticmethod
+    def construir():
+        produtos = Produto.query.options(
+            load_only(Produto.id, Produto.nome, Produto.descricao, Produto.categoria)
+        ).all()
+
+        indice = IndiceInvertido()
+        prefixos = IndicePrefixos()
+        for produto in produtos:
+            indice.adicionar(produto)
+            prefixos.adicionar(produto)
+
+        BuscaService._indice = indice
+        BuscaService._prefixos = prefixos
+        BuscaService._construido_em = time.monotonic()
+        logger.info(f"Índice de busca construído com {len(indice)} produtos")
+        return indice
+
+    # Constrói os índices na subida do worker, para a primeira busca não pagar o custo
+    @staticmethod
+    def aquecer():
+        try:
+            BuscaService.construir()
+        except Exception as e:
+            logger.warning(f"Não foi possível construir o índice de busca: {e}")
+
+    @staticmethod
+    def _obter_indice():
+        indice = BuscaService._indice
+        if (
+            indice is None
+            or time.monotonic() - BuscaService._construido_em > BUSCA_INDICE_TTL
+        ):
+            with BuscaService._lock:
+                if BuscaService._indice is indice:
+                    indice = BuscaService.construir()
+                else:
+                    indice = BuscaService._indice
+        return indice
+
+    # Retorna os IDs dos produtos mais relevantes para o termo (limite=None: todos)
+    @staticmethod
+    def buscar(termo, limite=20):
+        return [
+            produto_id
+            for produto_id, _ in BuscaService._obter_indice().buscar(termo, limite)
+        ]
+
+    # Sugestões de autocomplete (nomes de produtos e categorias) para o prefixo
+    @staticmethod
+    def sugerir(prefixo, limite=8):
+        BuscaService._obter_indice()
+        return BuscaService._prefixos.sugerir(prefixo, limite)
+
+    # Atualiza (ou inclui) um produto nos índices após escrita do admin
+    @staticmethod
+    def indexar(produto):
+        if BuscaService._indice is not None:
+            BuscaService._indice.adicionar(produto)
+            BuscaService._prefixos.adicionar(produto)
+
+    # Retira um produto dos índices
+    @staticmethod
+    def remover(produto_id):
+        if BuscaService._indice is not None:
+            BuscaService._indice.remover(produto_id)
+            BuscaService._prefixos.remover(produto_id)
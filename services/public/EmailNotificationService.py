@@ -4,13 +4,13 @@ from email.mime.multipart import MIMEMultipart
 import os
 from datetime import datetime
 import logging
-from utils.email import enviar_email
 
 logger = logging.getLogger(__name__)
 
 
 class EmailNotificationService:
-    # Serviço para envio de notificações por email sobre pedidos
+    # Monta os emails de notificação dos pedidos. O envio fica com a fila de
+    # notificações (NotificacaoEmailService)
 
     @staticmethod
     def _formatar_moeda(valor):
@@ -88,8 +88,8 @@ class EmailNotificationService:
         """
 
     @staticmethod
-    def notificar_pedido_criado(pedido):
-        # Envia email quando o pedido é criado
+    def renderizar_pedido_criado(pedido):
+        # Email de quando o pedido é criado: (destinatário, assunto, corpo)
         usuario = pedido.usuario
 
         assunto = f"Pedido recebido - Aguardando Pagamento"
@@ -161,11 +161,11 @@ class EmailNotificationService:
         </html>
         """
 
-        return enviar_email(usuario.email, assunto, corpo)
+        return usuario.email, assunto, corpo
 
     @staticmethod
-    def notificar_pagamento_aprovado(pedido):
-        # Envia email quando o pagamento é aprovado
+    def renderizar_pagamento_aprovado(pedido):
+        # Email de quando o pagamento é aprovado: (destinatário, assunto, corpo)
         usuario = pedido.usuario
 
         assunto = f"Pagamento Confirmado"
@@ -223,11 +223,11 @@ class EmailNotificationService:
         </html>
         """
 
-        return enviar_email(usuario.email, assunto, corpo)
+        return usuario.email, assunto, corpo
 
     @staticmethod
-    def notificar_pedido_em_separacao(pedido):
-        # Envia email quando o pedido está em separação
+    def renderizar_pedido_em_separacao(pedido):
+        # Email de quando o pedido está em separação: (destinatário, assunto, corpo)
         usuario = pedido.usuario
 
         assunto = f"Seu pedido está sendo preparado"
@@ -272,11 +272,11 @@ class EmailNotificationService:
         </html>
         """
 
-        return enviar_email(usuario.email, assunto, corpo)
+        return usuario.email, assunto, corpo
 
     @staticmethod
-    def notificar_pedido_enviado(pedido, codigo_rastreio=None):
-        # Envia email quando o pedido é enviado
+    def renderizar_pedido_enviado(pedido, codigo_rastreio=None):
+        # Email de quando o pedido é enviado: (destinatário, assunto, corpo)
         usuario = pedido.usuario
 
         assunto = f"Pedido enviado! "
@@ -329,11 +329,11 @@ class EmailNotificationService:
         </html>
         """
 
-        return enviar_email(usuario.email, assunto, corpo)
+        return usuario.email, assunto, corpo
 
     @staticmethod
-    def notificar_pedido_entregue(pedido):
-        # Envia email quando o pedido é entregue
+    def renderizar_pedido_entregue(pedido):
+        # Email de quando o pedido é entregue: (destinatário, assunto, corpo)
         usuario = pedido.usuario
 
         assunto = f"Pedido entregue! "
@@ -380,4 +380,14 @@ class EmailNotificationService:
         </html>
         """
 
-        return enviar_email(usuario.email, assunto, corpo)
+        return usuario.email, assunto, corpo
+
+
+# Tipo da notificação -> função que monta o email a partir do pedido
+RENDERIZADORES = {
+    "pedido_criado": EmailNotificationService.renderizar_pedido_criado,
+    "pagamento_aprovado": EmailNotificationService.renderizar_pagamento_aprovado,
+    "pedido_em_separacao": EmailNotificationService.renderizar_pedido_em_separacao,
+    "pedido_enviado": EmailNotificationService.renderizar_pedido_enviado,
+    "pedido_entregue": EmailNotificationService.renderizar_pedido_entregue,
+}
@@ -0,0 +1,168 @@
+import hashlib
+import logging
+import os
+import uuid
+from datetime import timedelta
+
+from sqlalchemy.exc import IntegrityError
+
+from database import db
+from database.models import ChaveIdempotencia
+from utils.cache import idempotencia_cache
+from utils.date_time import agora_brasil_sem_fuso
+
+logger = logging.getLogger(__name__)
+
+# Por quanto tempo uma Idempotency-Key devolve a resposta guardada
+IDEMPOTENCIA_TTL = int(os.getenv("IDEMPOTENCIA_TTL", 24 * 60 * 60))
+# Depois desse tempo sem resposta, a primeira requisição é tida como perdida
+# (worker reiniciado no meio) e a chave pode ser usada de novo
+IDEMPOTENCIA_TRAVA_SEGUNDOS = int(os.getenv("IDEMPOTENCIA_TRAVA_SEGUNDOS", 120))
+# Chaves vencidas apagadas por DELETE na limpeza
+IDEMPOTENCIA_LOTE_LIMPEZA = int(os.getenv("IDEMPOTENCIA_LOTE_LIMPEZA", 1000))
+
+# Estados devolvidos por IdempotenciaService.iniciar
+NOVA = "nova"
+EM_ANDAMENTO = "em_andamento"
+CONCLUIDA = "concluida"
+DIVERGENTE = "divergente"
+
+
+class IdempotenciaService:
+    """
+    Guarda a resposta da primeira requisição feita com uma Idempotency-Key e
+    a devolve nas repetições. A linha é criada antes de executar a requisição,
+    então a chave primária também barra duplicatas simultâneas.
+    """
+
+    # Identificador da chave: a mesma Idempotency-Key de outro usuário ou em
+    # outra rota é outra chave
+    @staticmethod
+    def gerar_id(usuario_id, rota, chave):
+        return hashlib.sha256(f"{usuario_id}\n{rota}\n{chave}".encode()).hexdigest()
+
+    # Reserva a chave para esta requisição. Retorna (estado, dados):
+    #   NOVA         -> dados = dono, para passar a concluir/descartar
+    #   CONCLUIDA    -> dados = (status_code, corpo) da resposta guardada
+    #   EM_ANDAMENTO -> a primeira requisição ainda não terminou
+    #   DIVERGENTE   -> a chave já foi usada com outro corpo
+    @staticmethod
+    def iniciar(id_chave, usuario_id, rota, hash_requisicao):
+        guardada = idempotencia_cache.obter(id_chave)
+        if guardada is not None:
+            return IdempotenciaService._comparar(guardada, hash_requisicao)
+
+        # Duas tentativas: a segunda só acontece se a linha existente estava
+        # vencida ou abandonada e foi apagada
+        for _ in range(2):
+            agora = agora_brasil_sem_fuso()
+            dono = str(uuid.uuid4())
+            db.session.add(
+                ChaveIdempotencia(
+                    id=id_chave,
+                    usuario_id=usuario_id,
+                    rota=rota,
+                    hash_requisicao=hash_requisicao,
+                    dono=dono,
+                    criado_em=agora,
+                    expira_em=agora + timedelta(seconds=IDEMPOTENCIA_TTL),
+                )
+            )
+            try:
+                db.session.commit()
+                return NOVA, dono
+            except IntegrityError:
+                db.session.rollback()
+
+            registro = ChaveIdempotencia.query.get(id_chave)
+            if registro is None:
+                continue
+
+            abandonada = registro.status_code is None and registro.criado_em <= (
+                agora - timedelta(seconds=IDEMPOTENCIA_TRAVA_SEGUNDOS)
+            )
+            if registro.expira_em <= agora or abandonada:
+                # Apaga só se ninguém tomou a chave nesse meio tempo
+                ChaveIdempotencia.query.filter_by(
+                    id=id_chave, dono=registro.dono
+                ).delete(synchronize_session=False)
+                db.session.commit()
+                continue
+
+            if registro.status_code is None:
+                if registro.hash_requisicao != hash_requisicao:
+                    return DIVERGENTE, None
+                return EM_ANDAMENTO, None
+
+            guardada = (
+                registro.hash_requisicao,
+                registro.status_code,
+                registro.resposta,
+            )
+            IdempotenciaService._guardar_em_memoria(id_chave, guardada)
+            return IdempotenciaService._comparar(guardada, hash_requisicao)
+
+        return EM_ANDAMENTO, None
+
+    @staticmethod
+    def _comparar(guardada, hash_requisicao):
+        hash_guardado, status_code, resposta = guardada
+        if hash_guardado != hash_requisicao:
+            return DIVERGENTE, None
+        return CONCLUIDA, (status_code, resposta)
+
+    # Guarda a resposta da requisição que ficou com a chave
+    @staticmethod
+    def concluir(id_chave, dono, hash_requisicao, status_code, resposta):
+        atualizadas = ChaveIdempotencia.query.filter_by(id=id_chave, dono=dono).update(
+            {"status_code": status_code, "resposta": resposta},
+            synchronize_session=False,
+        )
+        db.session.commit()
+
+        if atualizadas:
+            IdempotenciaService._guardar_em_memoria(
+                id_chave, (hash_requisicao, status_code, resposta)
+            )
+
+    @staticmethod
+    def _guardar_em_memoria(id_chave, guardada):
+        # Em memória nunca por mais tempo do que a chave vale no banco
+        idempotencia_cache.definir(
+            id_chave, guardada, ttl=min(IDEMPOTENCIA_TTL, idempotencia_cache.ttl)
+        )
+
+    # Libera a chave quando a requisição falhou, para o cliente poder tentar de novo
+    @staticmethod
+    def descartar(id_chave, dono):
+        db.session.rollback()
+        ChaveIdempotencia.query.filter_by(id=id_chave, dono=dono).delete(
+            synchronize_session=False
+        )
+        db.session.commit()
+
+    # Apaga as chaves vencidas em lotes. Retorna quantas foram removidas.
+    @staticmethod
+    def limpar_expiradas(lote=IDEMPOTENCIA_LOTE_LIMPEZA):
+        total = 0
+        while True:
+            ids = [
+                id_chave
+                for (id_chave,) in db.session.query(ChaveIdempotencia.id)
+                .filter(ChaveIdempotencia.expira_em <= agora_brasil_sem_fuso())
+                .limit(lote)
+                .all()
+            ]
+            if not ids:
+                break
+
+            ChaveIdempotencia.query.filter(ChaveIdempotencia.id.in_(ids)).delete(
+                synchronize_session=False
+            )
+            db.session.commit()
+            total += len(ids)
+
+            if len(ids) < lote:
+                break
+
+        return total
@@ -1,21 +1,29 @@
 import os
-import mercadopago
 
-MERCADOPAGO_ACCESS_TOKEN = os.getenv("MERCADOPAGO_ACCESS_TOKEN")
+from utils.cache import mercadopago_cache
+from utils.date_time import BRASIL_TZ
+from utils.mercadopago_client import obter_sdk
+from utils.singleflight import SingleFlight
+
 API_BASE_URL = os.getenv("API_BASE_URL")
 BASE_URL = os.environ.get("BASE_URL")
 
+# Consultas de pagamentos e ordens: threads que pedem o mesmo recurso ao
+# mesmo tempo dividem uma requisição, e o resultado vale por alguns segundos
+consultas_mercadopago = SingleFlight(cache=mercadopago_cache)
+
 
 class MercadoPagoService:
 
     def __init__(self):
-        if not MERCADOPAGO_ACCESS_TOKEN:
-            raise ValueError("MERCADOPAGO_ACCESS_TOKEN não configurado")
-        self.sdk = mercadopago.SDK(MERCADOPAGO_ACCESS_TOKEN)
+        # SDK e pool de conexões compartilhados pelo processo (barato de criar)
+        self.sdk = obter_sdk()
 
-    def criar_preferencia_pagamento(self, pedido, itens):
+    def criar_preferencia_pagamento(self, pedido, itens, expira_em=None):
         """
         Cria uma preferência de pagamento.
+        expira_em (horário de Brasília, sem fuso): a partir daí o link e os
+        pagamentos em aberto (PIX, boleto) não são mais aceitos pelo MP.
         O cliente será redirecionado para o Mercado Pago onde poderá escolher:
         - Cartão de crédito/débito
         - PIX
@@ -94,6 +102,14 @@ class MercadoPagoService:
             },
         }
 
+        if expira_em is not None:
+            expiracao = expira_em.replace(tzinfo=BRASIL_TZ).isoformat(
+                timespec="milliseconds"
+            )
+            preference_data["expires"] = True
+            preference_data["expiration_date_to"] = expiracao
+            preference_data["date_of_expiration"] = expiracao
+
         # Criar preferência no Mercado Pago
         preference_response = self.sdk.preference().create(preference_data)
 
@@ -111,14 +127,33 @@ class MercadoPagoService:
             "sandbox_init_point": preference.get("sandbox_init_point"),
         }
 
-    def consultar_pagamento(self, payment_id):
-        # Consulta detalhes de um pagamento específico
-        payment_response = self.sdk.payment().get(payment_id)
+    def _buscar_pagamento(self, payment_id, desde=None):
+        # Corpo do pagamento no MP (compartilhado: não alterar o dict retornado)
+        def buscar():
+            pagamento = self.sdk.payment().get(payment_id)
+            if not pagamento or pagamento.get("status") != 200:
+                raise ValueError(f"Pagamento {payment_id} não encontrado")
+            return pagamento["response"]
 
-        if payment_response.get("status") != 200:
-            raise ValueError(f"Pagamento {payment_id} não encontrado")
+        return consultas_mercadopago.executar(
+            ("payment", str(payment_id)), buscar, desde=desde
+        )
 
-        payment = payment_response["response"]
+    def _buscar_merchant_order(self, order_id, desde=None):
+        # Corpo da ordem no MP (compartilhado: não alterar o dict retornado)
+        def buscar():
+            ordem = self.sdk.merchant_order().get(order_id)
+            if not ordem or ordem.get("status") != 200:
+                raise ValueError(f"Ordem {order_id} não encontrada")
+            return ordem["response"]
+
+        return consultas_mercadopago.executar(
+            ("merchant_order", str(order_id)), buscar, desde=desde
+        )
+
+    def consultar_pagamento(self, payment_id):
+        # Consulta detalhes de um pagamento específico
+        payment = self._buscar_pagamento(payment_id)
 
         return {
             "id": payment["id"],
@@ -130,17 +165,61 @@ class MercadoPagoService:
             "payment_method_id": payment["payment_method_id"],
         }
 
-    def processar_webhook(self, data):
+    def buscar_pagamento_do_pedido(self, pedido_id):
+        # Pagamento do pedido (external_reference) quando o payment_id ainda não
+        # é conhecido: o aprovado, se houver, senão o mais recente. None se o
+        # cliente não chegou a pagar.
+        resposta = self.sdk.payment().search(
+            {
+                "external_reference": str(pedido_id),
+                "sort": "date_created",
+                "criteria": "desc",
+            }
+        )
+        if not resposta or resposta.get("status") != 200:
+            raise ValueError(f"Erro ao buscar pagamentos do pedido {pedido_id}")
+
+        pagamentos = (resposta.get("response") or {}).get("results") or []
+        if not pagamentos:
+            return None
+
+        aprovados = [p for p in pagamentos if p.get("status") == "approved"]
+        pagamento = (aprovados or pagamentos)[0]
+        return {"id": str(pagamento["id"]), "status": pagamento["status"]}
+
+    @staticmethod
+    def extrair_recurso(data):
+        # Tópico e ID do recurso (pagamento ou ordem) da notificação, sem chamar a API
+        topic = data.get("topic") or data.get("type")
+
+        if topic == "merchant_order":
+            recurso = data.get("resource", "")
+        else:
+            dados = data.get("data")
+            recurso = (
+                (dados.get("id") if isinstance(dados, dict) else None)
+                or data.get("resource")
+                or data.get("id")
+            )
+
+        if isinstance(recurso, str) and "http" in recurso:
+            recurso = recurso.rstrip("/").split("/")[-1]
 
-        # Processa notificações de webhook do Mercado Pago.
+        return topic, str(recurso) if recurso else None
+
+    def processar_webhook(self, data, desde=None):
+
+        # Processa notificações de webhook do Mercado Pago. desde (time.time()):
+        # só aceita consultas ao MP iniciadas depois desse instante, para não
+        # reaproveitar um status anterior à notificação
         try:
             topic = data.get("topic") or data.get("type")
             print(f"[MercadoPago] Webhook tipo: {topic}")
 
             if topic == "merchant_order":
-                return self._processar_merchant_order(data)
+                return self._processar_merchant_order(data, desde)
             elif topic == "payment":
-                return self._processar_payment(data)
+                return self._processar_payment(data, desde)
             else:
                 raise ValueError(f"Tipo de webhook não suportado: {topic}")
 
@@ -148,24 +227,16 @@ class MercadoPagoService:
             print(f"Erro ao processar webhook: {e}")
             raise
 
-    def _processar_merchant_order(self, data):
+    def _processar_merchant_order(self, data, desde=None):
         # Processa webhook de merchant_order
-        resource = data.get("resource", "")
-        order_id = (
-            resource.rstrip("/").split("/")[-1] if "http" in str(resource) else resource
-        )
+        _, order_id = MercadoPagoService.extrair_recurso(data)
 
         if not order_id:
             raise ValueError(f"ID da ordem não encontrado: {data}")
 
         print(f"[MercadoPago] Buscando merchant_order: {order_id}")
 
-        ordem = self.sdk.merchant_order().get(order_id)
-
-        if not ordem or ordem.get("status") != 200:
-            raise ValueError(f"Ordem {order_id} não encontrada")
-
-        body = ordem["response"]
+        body = self._buscar_merchant_order(order_id, desde)
         payments = body.get("payments", [])
 
         if not payments:
@@ -193,26 +264,16 @@ class MercadoPagoService:
             "pedido_id": body.get("external_reference"),
         }
 
-    def _processar_payment(self, data):
+    def _processar_payment(self, data, desde=None):
         # Processa webhook de payment
-        payment_id = (
-            data.get("data", {}).get("id") or data.get("resource") or data.get("id")
-        )
-
-        if isinstance(payment_id, str) and "http" in payment_id:
-            payment_id = payment_id.rstrip("/").split("/")[-1]
+        _, payment_id = MercadoPagoService.extrair_recurso(data)
 
         if not payment_id:
             raise ValueError(f"ID do pagamento não encontrado: {data}")
 
         print(f"[MercadoPago] Buscando pagamento: {payment_id}")
 
-        pagamento = self.sdk.payment().get(payment_id)
-
-        if not pagamento or pagamento.get("status") != 200:
-            raise ValueError(f"Pagamento {payment_id} não encontrado")
-
-        body = pagamento["response"]
+        body = self._buscar_pagamento(payment_id, desde)
         print(f"[MercadoPago] Status: {body.get('status')}")
 
         return {
@@ -235,6 +296,7 @@ class MercadoPagoService:
             raise ValueError(f"Erro ao estornar: {refund_response}")
 
         refund = refund_response["response"]
+        consultas_mercadopago.esquecer(("payment", str(payment_id)))
 
         return {
             "refund_id": refund["id"],
@@ -0,0 +1,158 @@
+import json
+import logging
+import os
+from datetime import timedelta
+
+from sqlalchemy.orm import joinedload, selectinload
+
+from database import db
+from database.models import (
+    ItemPedido,
+    NotificacaoEmail,
+    Pedido,
+    StatusNotificacaoEnum,
+)
+from services.public.EmailNotificationService import RENDERIZADORES
+from utils.date_time import agora_brasil_sem_fuso
+from utils.email import enviar_emails
+
+logger = logging.getLogger(__name__)
+
+# Notificações tratadas por rodada da fila (uma conexão SMTP por lote)
+EMAIL_FILA_LOTE = int(os.getenv("EMAIL_FILA_LOTE", 50))
+# Tentativas antes de desistir de um email
+EMAIL_MAX_TENTATIVAS = int(os.getenv("EMAIL_MAX_TENTATIVAS", 6))
+# Enquanto um lote é enviado, as notificações ficam reservadas para o processo
+# que as pegou; se ele morrer, voltam para a fila depois desse tempo
+EMAIL_RESERVA_SEGUNDOS = int(os.getenv("EMAIL_RESERVA_SEGUNDOS", 300))
+
+
+# Espera antes da próxima tentativa: 1, 2, 4, 8... minutos (até 1 hora)
+def _espera(tentativas):
+    return timedelta(minutes=min(2 ** max(tentativas - 1, 0), 60))
+
+
+class NotificacaoEmailService:
+    """
+    Fila de emails dos pedidos (outbox): a notificação é gravada na mesma
+    transação da mudança no pedido e enviada depois por
+    python -m jobs.enviar_emails, com novas tentativas e sem duplicar envios.
+    """
+
+    # Enfileira o email (sem commit: vai junto com a alteração do pedido)
+    @staticmethod
+    def enfileirar(pedido_id, tipo, **dados):
+        if tipo not in RENDERIZADORES:
+            raise ValueError(f"Tipo de notificação inválido: {tipo}")
+
+        db.session.add(
+            NotificacaoEmail(
+                pedido_id=pedido_id,
+                tipo=tipo,
+                dados=json.dumps(dados) if dados else None,
+                chave=f"{tipo}:{pedido_id}",
+                proxima_tentativa_em=agora_brasil_sem_fuso(),
+            )
+        )
+
+    # Envia um lote de notificações pendentes. Retorna quantas foram enviadas.
+    @staticmethod
+    def processar_pendentes(lote=EMAIL_FILA_LOTE):
+        agora = agora_brasil_sem_fuso()
+
+        # Reserva o lote; SKIP LOCKED deixa outros processos pegarem outras linhas
+        notificacoes = (
+            NotificacaoEmail.query.filter(
+                NotificacaoEmail.status == StatusNotificacaoEnum.PENDENTE,
+                NotificacaoEmail.proxima_tentativa_em <= agora,
+            )
+            .order_by(NotificacaoEmail.proxima_tentativa_em)
+            .limit(lote)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        if not notificacoes:
+            db.session.commit()
+            return 0
+
+        for notificacao in notificacoes:
+            notificacao.tentativas += 1
+            notificacao.proxima_tentativa_em = agora + timedelta(
+                seconds=EMAIL_RESERVA_SEGUNDOS
+            )
+        db.session.commit()
+
+        # Emails já enviados com a mesma chave (ex.: status repetido pelo admin)
+        chaves = {n.chave for n in notificacoes}
+        enviadas = {
+            chave
+            for (chave,) in db.session.query(NotificacaoEmail.chave).filter(
+                NotificacaoEmail.chave.in_(chaves),
+                NotificacaoEmail.status == StatusNotificacaoEnum.ENVIADO,
+            )
+        }
+
+        # Todos os pedidos do lote, com usuário, endereço e itens, de uma vez
+        pedidos = {
+            pedido.id: pedido
+            for pedido in Pedido.query.options(
+                joinedload(Pedido.usuario),
+                joinedload(Pedido.endereco),
+                selectinload(Pedido.itens).joinedload(ItemPedido.produto),
+            ).filter(Pedido.id.in_({n.pedido_id for n in notificacoes}))
+        }
+
+        a_enviar = []
+        for notificacao in notificacoes:
+            pedido = pedidos.get(notificacao.pedido_id)
+            if notificacao.chave in enviadas or pedido is None:
+                notificacao.status = StatusNotificacaoEnum.DESCARTADO
+                continue
+            enviadas.add(notificacao.chave)
+
+            try:
+                mensagem = RENDERIZADORES[notificacao.tipo](
+                    pedido, **json.loads(notificacao.dados or "{}")
+                )
+            except Exception as e:
+                NotificacaoEmailService._registrar_falha(notificacao, e, agora)
+                continue
+            a_enviar.append((notificacao, mensagem))
+
+        try:
+            resultados = enviar_emails([mensagem for _, mensagem in a_enviar])
+        except RuntimeError as e:
+            # SMTP não configurado: todas voltam para a fila
+            resultados = [e] * len(a_enviar)
+
+        enviados = 0
+        for (notificacao, _), erro in zip(a_enviar, resultados):
+            if erro is None:
+                notificacao.status = StatusNotificacaoEnum.ENVIADO
+                notificacao.enviado_em = agora_brasil_sem_fuso()
+                notificacao.ultimo_erro = None
+                enviados += 1
+            else:
+                NotificacaoEmailService._registrar_falha(notificacao, erro, agora)
+
+        db.session.commit()
+        logger.info(
+            f"Fila de emails: {enviados} enviados de {len(notificacoes)} notificações"
+        )
+        return enviados
+
+    @staticmethod
+    def _registrar_falha(notificacao, erro, agora):
+        notificacao.ultimo_erro = str(erro)[:1000]
+        if notificacao.tentativas >= EMAIL_MAX_TENTATIVAS:
+            notificacao.status = StatusNotificacaoEnum.FALHOU
+            logger.error(
+                f"Email {notificacao.tipo} do pedido #{notificacao.pedido_id} "
+                f"descartado após {notificacao.tentativas} tentativas: {erro}"
+            )
+        else:
+            notificacao.proxima_tentativa_em = agora + _espera(notificacao.tentativas)
+            logger.warning(
+                f"Falha ao enviar email {notificacao.tipo} do pedido "
+                f"#{notificacao.pedido_id} (tentativa {notificacao.tentativas}): {erro}"
+            )
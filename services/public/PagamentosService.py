@@ -1,5 +1,16 @@
+import hashlib
+import json
+import os
+from datetime import timedelta
+
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
+
 from database import db
 from database.models import (
+    EventoWebhook,
+    ItemPedido,
     Pedido,
     TransacaoPagamento,
     StatusPagamentoEnum,
@@ -14,19 +25,46 @@ from services.public.MelhorEnvioService import (
 )
 from decimal import Decimal
 import logging
-from services.public.EmailNotificationService import EmailNotificationService
+from services.public.NotificacaoEmailService import NotificacaoEmailService
+from services.public.PedidosService import PedidoService
+from services.public.ReservaEstoqueService import (
+    REVISAO_PAGO_SEM_ESTOQUE,
+    ReservaEstoqueService,
+)
+from services.public.VitrineService import VitrineService
+from utils.date_time import agora_brasil_sem_fuso
 
 logger = logging.getLogger(__name__)
 
+# Status do pagamento no Mercado Pago -> status da transação
+STATUS_MERCADOPAGO = {
+    "approved": StatusPagamentoEnum.APROVADO,
+    "pending": StatusPagamentoEnum.PENDENTE,
+    "in_process": StatusPagamentoEnum.PENDENTE,
+    "rejected": StatusPagamentoEnum.REJEITADO,
+    "cancelled": StatusPagamentoEnum.CANCELADO,
+    "refunded": StatusPagamentoEnum.REEMBOLSADO,
+    "charged_back": StatusPagamentoEnum.REEMBOLSADO,
+}
+
+# Por quanto tempo uma preferência em aberto é devolvida de novo em vez de criar outra
+PREFERENCIA_VALIDADE_MINUTOS = int(os.getenv("PREFERENCIA_VALIDADE_MINUTOS", 30))
+
 
 class PagamentoService:
 
     @staticmethod
     def criar_preferencia_pagamento(pedido_id):
-        # Cria preferência de pagamento no Mercado Pago (Checkout Pro)
-        pedido = Pedido.query.get(pedido_id)
+        # Cria preferência de pagamento no Mercado Pago (Checkout Pro), ou
+        # devolve a que já está em aberto se itens e frete não mudaram
+        pedido = Pedido.query.options(
+            selectinload(Pedido.itens).joinedload(ItemPedido.produto)
+        ).get(pedido_id)
         if not pedido:
             raise ValueError("Pedido não encontrado")
+        # Pedido pago ou cancelado não recebe link de pagamento novo
+        if pedido.status != StatusPedidoEnum.PENDENTE:
+            raise ValueError("O pedido não está aguardando pagamento")
 
         # Preparar itens com informações dos produtos
         itens = []
@@ -43,37 +81,89 @@ class PagamentoService:
                 }
             )
 
-        # Criar preferência no Mercado Pago
-        mp_service = MercadoPagoService()
-        preferencia = mp_service.criar_preferencia_pagamento(pedido, itens)
-
-        # Criar transação pendente
-        transacao = TransacaoPagamento(
-            pedido_id=pedido.id,
-            valor=pedido.valor_total,
-            metodo_pagamento="mercadopago",
-            status=StatusPagamentoEnum.PENDENTE,
-            mp_preference_id=preferencia["preference_id"],
+        hash_preferencia = PagamentoService._hash_preferencia(pedido, itens)
+        agora = agora_brasil_sem_fuso()
+
+        # O link de pagamento vence junto com a reserva de estoque, no máximo:
+        # pagar depois disso aprovaria um pedido já cancelado pela varredura.
+        # Sem reserva o pedido não segura estoque: conta como vencida.
+        reserva_expira_em = ReservaEstoqueService.expiracao(pedido.id)
+        if reserva_expira_em is None or reserva_expira_em <= agora:
+            raise ValueError("A reserva de estoque do pedido expirou")
+        expira_em = min(
+            agora + timedelta(minutes=PREFERENCIA_VALIDADE_MINUTOS), reserva_expira_em
+        )
+
+        transacao = (
+            TransacaoPagamento.query.filter(
+                TransacaoPagamento.pedido_id == pedido.id,
+                TransacaoPagamento.status == StatusPagamentoEnum.PENDENTE,
+                TransacaoPagamento.mp_payment_id.is_(None),
+                TransacaoPagamento.hash_preferencia == hash_preferencia,
+                TransacaoPagamento.preferencia_expira_em > agora,
+            )
+            .order_by(TransacaoPagamento.criado_em.desc())
+            .first()
         )
-        db.session.add(transacao)
-        db.session.commit()
+
+        if transacao:
+            logger.info(
+                f"Pedido #{pedido.id}: reaproveitando preferência "
+                f"{transacao.mp_preference_id}"
+            )
+        else:
+            # Criar preferência no Mercado Pago
+            mp_service = MercadoPagoService()
+            preferencia = mp_service.criar_preferencia_pagamento(
+                pedido, itens, expira_em
+            )
+
+            # Criar transação pendente
+            transacao = TransacaoPagamento(
+                pedido_id=pedido.id,
+                valor=pedido.valor_total,
+                metodo_pagamento="mercadopago",
+                status=StatusPagamentoEnum.PENDENTE,
+                mp_preference_id=preferencia["preference_id"],
+                mp_checkout_url=preferencia["init_point"],
+                mp_sandbox_checkout_url=preferencia["sandbox_init_point"],
+                hash_preferencia=hash_preferencia,
+                preferencia_expira_em=expira_em,
+            )
+            db.session.add(transacao)
+            db.session.commit()
 
         return {
             "transacao_id": transacao.id,
             "pedido_id": pedido.id,
-            "preference_id": preferencia["preference_id"],
-            "checkout_url": preferencia["init_point"],
-            "sandbox_checkout_url": preferencia["sandbox_init_point"],
+            "preference_id": transacao.mp_preference_id,
+            "checkout_url": transacao.mp_checkout_url,
+            "sandbox_checkout_url": transacao.mp_sandbox_checkout_url,
+        }
+
+    @staticmethod
+    def _hash_preferencia(pedido, itens):
+        # Tudo o que vai para a preferência: itens, frete e total
+        conteudo = {
+            "itens": sorted(itens, key=lambda i: i["produto_id"]),
+            "valor_total": pedido.valor_total,
+            "frete_valor": pedido.frete_valor,
+            "frete_tipo": pedido.frete_tipo,
+            "frete_servico_nome": pedido.frete_servico_nome,
+            "endereco_id": pedido.endereco_id,
         }
+        serializado = json.dumps(conteudo, sort_keys=True, default=str)
+        return hashlib.sha256(serializado.encode()).hexdigest()
 
     @staticmethod
-    def processar_webhook_mercadopago(data):
+    def processar_webhook_mercadopago(data, desde=None):
         """
         Processa notificações do webhook do Mercado Pago.
         Atualiza status e cria envio automaticamente quando aprovado.
+        desde: instante (time.time()) a partir do qual a consulta ao MP vale
         """
         mp_service = MercadoPagoService()
-        webhook_info = mp_service.processar_webhook(data)
+        webhook_info = mp_service.processar_webhook(data, desde)
 
         if not webhook_info:
             return None
@@ -89,6 +179,7 @@ class PagamentoService:
             mp_payment_id=str(payment_id)
         ).first()
 
+        encontrada_pelo_pedido = False
         if not transacao:
             # Buscar pelo pedido_id
             pedido_id = webhook_info.get("pedido_id")
@@ -98,36 +189,81 @@ class PagamentoService:
                     .order_by(TransacaoPagamento.criado_em.desc())
                     .first()
                 )
-                if transacao:
-                    transacao.mp_payment_id = str(payment_id)
+                encontrada_pelo_pedido = transacao is not None
 
         if not transacao:
             raise ValueError("Transação não encontrada")
 
-        # Mapear status
-        status_map = {
-            "approved": StatusPagamentoEnum.APROVADO,
-            "pending": StatusPagamentoEnum.PENDENTE,
-            "in_process": StatusPagamentoEnum.PENDENTE,
-            "rejected": StatusPagamentoEnum.REJEITADO,
-            "cancelled": StatusPagamentoEnum.CANCELADO,
-            "refunded": StatusPagamentoEnum.REEMBOLSADO,
-            "charged_back": StatusPagamentoEnum.REEMBOLSADO,
-        }
+        return PagamentoService.aplicar_status_pagamento(
+            transacao,
+            payment_id,
+            webhook_info["status"],
+            atualizar_payment_id=encontrada_pelo_pedido,
+        )
 
-        status_anterior = transacao.status
-        novo_status = status_map.get(
-            webhook_info["status"], StatusPagamentoEnum.PENDENTE
+    @staticmethod
+    def aplicar_status_pagamento(
+        transacao, payment_id, status_mp, atualizar_payment_id=False
+    ):
+        """
+        Aplica o status de um pagamento do MP (approved, rejected...) à
+        transação e ao pedido, com os efeitos de cada status (estoque, email),
+        e faz o commit; na aprovação, o envio é comprado depois do commit
+        (criar_envio). Usado pelo webhook e pela reconciliação.
+        """
+        # Trava o pedido até o commit: notificações do mesmo pedido (payment e
+        # merchant_order) processadas em paralelo esperam umas pelas outras e
+        # enxergam o status gravado pela anterior
+        pedido = (
+            Pedido.query.filter_by(id=transacao.pedido_id)
+            .with_for_update()
+            .populate_existing()
+            .one()
         )
+        db.session.refresh(transacao)
+
+        # Registra o evento (pagamento, status). Se já foi aplicado (reenvio do
+        # MP ou payment + merchant_order do mesmo evento), a chave única recusa
+        # o INSERT e a notificação é descartada antes de qualquer alteração.
+        # O INSERT vê as linhas já confirmadas por outras transações, então
+        # funciona mesmo quando duas notificações esperaram a mesma trava.
+        status_mp = str(status_mp)
+        try:
+            with db.session.begin_nested():
+                db.session.add(
+                    EventoWebhook(
+                        topico="payment",
+                        recurso_id=str(payment_id),
+                        status=status_mp,
+                        pedido_id=pedido.id,
+                    )
+                )
+        except IntegrityError:
+            logger.info(
+                f"Evento payment {payment_id} ({status_mp}) já aplicado, "
+                f"ignorando webhook duplicado"
+            )
+            # Libera a trava do pedido
+            db.session.commit()
+            return {
+                "transacao_id": transacao.id,
+                "pedido_id": pedido.id,
+                "status_novo": transacao.status.value,
+                "pedido_status": pedido.status.value,
+                "duplicado": True,
+            }
+
+        if atualizar_payment_id:
+            transacao.mp_payment_id = str(payment_id)
+
+        status_anterior = transacao.status
+        novo_status = STATUS_MERCADOPAGO.get(status_mp, StatusPagamentoEnum.PENDENTE)
 
         # Atualizar transação
         transacao.status = novo_status
         if not transacao.mp_payment_id:
             transacao.mp_payment_id = str(payment_id)
 
-        # Obter pedido
-        pedido = transacao.pedido
-
         # Evitar processar webhook duplicado
         if (
             pedido.status == StatusPedidoEnum.EM_SEPARACAO
@@ -136,6 +272,8 @@ class PagamentoService:
             logger.info(
                 f"Pedido #{pedido.id} já processado, ignorando webhook duplicado"
             )
+            db.session.commit()
+            PedidoService.invalidar_pedido(pedido.id)
             return {
                 "transacao_id": transacao.id,
                 "pedido_id": pedido.id,
@@ -147,89 +285,42 @@ class PagamentoService:
 
         # Processar de acordo com o status
         if novo_status == StatusPagamentoEnum.APROVADO:
-            pedido.status = StatusPedidoEnum.PAGO
-            logger.info(
-                f"Pedido #{pedido.id} aprovado - R$ {float(pedido.valor_total):.2f}"
-            )
-
-            try:
-                EmailNotificationService.notificar_pagamento_aprovado(pedido)
-            except Exception as e:
-                logger.error(f"Erro ao enviar email de pagamento aprovado: {e}")
-
-            # Criar envio no Melhor Envio
-            try:
-                logger.info(f"Processando envio do pedido #{pedido.id}")
-
-                # 1. Criar pedido no Melhor Envio
-                resultado_me = criar_pedido_melhor_envio(pedido)
-                pedido.melhor_envio_id = resultado_me.get("melhor_envio_id")
-                pedido.melhor_envio_protocolo = resultado_me.get("protocol")
-
-                # 2. Verificar e atualizar serviço se mudou
-                servico_usado = resultado_me.get("service_name", pedido.frete_tipo)
-                if servico_usado and servico_usado != pedido.frete_tipo:
-                    logger.warning(
-                        f"Serviço alterado: {pedido.frete_tipo} → {servico_usado}"
-                    )
-                    pedido.frete_servico_nome = servico_usado
-
-                # 3. Verificar e atualizar preço se mudou
-                preco_real = resultado_me.get("price")
-                if preco_real:
-                    preco_cotado = Decimal(str(pedido.frete_valor))
-                    preco_real_decimal = Decimal(str(preco_real))
-                    diferenca = preco_real_decimal - preco_cotado
-
-                    # Se diferença maior que R$ 0.10, atualizar
-                    if abs(diferenca) > Decimal("0.10"):
-                        logger.warning(
-                            f"Preço frete atualizado: "
-                            f"R$ {float(preco_cotado):.2f} → R$ {float(preco_real_decimal):.2f} "
-                            f"(diferença: R$ {float(abs(diferenca)):.2f})"
-                        )
-
-                        # Atualizar valores (tudo em Decimal)
-                        pedido.frete_valor = preco_real_decimal
-                        pedido.valor_total = pedido.valor_total + diferenca
-
-                # 4. Comprar o frete
-                comprar_envio(pedido.melhor_envio_id)
-
-                # 5. Gerar etiqueta
-                gerar_etiqueta(pedido.melhor_envio_id)
-
-                # 6. Obter link da etiqueta
-                etiqueta_url = imprimir_etiqueta(pedido.melhor_envio_id)
-                pedido.etiqueta_url = etiqueta_url
-
-                # 7. Atualizar status para EM_SEPARACAO
-                pedido.status = StatusPedidoEnum.EM_SEPARACAO
-
+            # Reserva de estoque vira baixa definitiva; com a reserva vencida
+            # (pedido já cancelado) o estoque é baixado de novo ou, sem
+            # estoque, o pedido fica cancelado e marcado
+            if ReservaEstoqueService.confirmar(pedido):
+                pedido.status = StatusPedidoEnum.PAGO
                 logger.info(
-                    f"Envio processado: {pedido.melhor_envio_protocolo} | "
-                    f"Etiqueta: {etiqueta_url}"
+                    f"Pedido #{pedido.id} aprovado - R$ {float(pedido.valor_total):.2f}"
                 )
 
-            except Exception as e:
-                logger.error(
-                    f"Erro ao processar envio do pedido #{pedido.id}: {str(e)}"
-                )
-                # Não falha o pagamento por causa do envio
-                # Pedido fica PAGO e pode ser enviado manualmente depois
+                # Email vai para a fila e sai junto com o commit do webhook
+                NotificacaoEmailService.enfileirar(pedido.id, "pagamento_aprovado")
 
         elif novo_status == StatusPagamentoEnum.REJEITADO:
             pedido.status = StatusPedidoEnum.CANCELADO
-            logger.warning(f"Pedido #{pedido.id} rejeitado")
+            ReservaEstoqueService.liberar(pedido)
+            logger.warning(f"Pedido #{pedido.id} rejeitado e estoque liberado")
 
         elif novo_status == StatusPagamentoEnum.REEMBOLSADO:
+            # Pedido já cancelado (ex.: pelo admin) já devolveu o estoque
+            PagamentoService._devolver_estoque(pedido)
             pedido.status = StatusPedidoEnum.CANCELADO
-            PagamentoService._reverter_estoque(pedido)
             logger.info(f"Pedido #{pedido.id} estornado e estoque revertido")
 
+        # Pedido pago ou cancelado: as outras transações em aberto não valem
+        # mais e saem da reconciliação
+        if pedido.status != StatusPedidoEnum.PENDENTE:
+            PagamentoService.encerrar_transacoes_pendentes(
+                [pedido.id], exceto_ids=[transacao.id]
+            )
+
+        # Roda na fila de webhooks (job): o catálogo em cache da API mostra o
+        # estoque alterado aqui quando as entradas vencem
         db.session.commit()
+        PedidoService.invalidar_pedido(pedido.id)
 
-        return {
+        resultado = {
             "transacao_id": transacao.id,
             "pedido_id": pedido.id,
             "status_anterior": status_anterior.value,
@@ -237,16 +328,173 @@ class PagamentoService:
             "pedido_status": pedido.status.value,
         }
 
+        # Frete comprado depois do commit, já sem a trava do pedido
+        # O pagamento já foi gravado: uma falha aqui não deve reprocessá-lo
+        if novo_status == StatusPagamentoEnum.APROVADO:
+            try:
+                if PagamentoService.criar_envio(pedido.id):
+                    resultado["pedido_status"] = StatusPedidoEnum.EM_SEPARACAO.value
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Erro ao gravar envio do pedido #{pedido.id}: {e}")
+
+        return resultado
+
+    # Cancela as transações PENDENTE dos pedidos (tentativas de pagamento que
+    # perderam para outra), com um UPDATE só (sem commit). Retorna quantas.
+    @staticmethod
+    def encerrar_transacoes_pendentes(pedido_ids, exceto_ids=()):
+        if not pedido_ids:
+            return 0
+
+        tabela = TransacaoPagamento.__table__
+        condicoes = [
+            tabela.c.pedido_id.in_(pedido_ids),
+            tabela.c.status == StatusPagamentoEnum.PENDENTE,
+        ]
+        if exceto_ids:
+            condicoes.append(tabela.c.id.notin_(exceto_ids))
+        return db.session.execute(
+            update(tabela)
+            .where(*condicoes)
+            .values(
+                status=StatusPagamentoEnum.CANCELADO,
+                atualizado_em=agora_brasil_sem_fuso(),
+            )
+        ).rowcount
+
+    @staticmethod
+    def criar_envio(pedido_id):
+        """
+        Cria e compra o envio no Melhor Envio de um pedido PAGO e gera a
+        etiqueta. Roda fora da trava do pedido (são até 4 chamadas de 20 s);
+        só grava o resultado com o pedido travado, no final. Se o envio
+        falhar, o pedido fica PAGO e pode ser enviado manualmente depois.
+        Retorna True se o pedido foi para EM_SEPARACAO.
+        """
+        pedido = Pedido.query.get(pedido_id)
+        if (
+            pedido is None
+            or pedido.status != StatusPedidoEnum.PAGO
+            or pedido.melhor_envio_id
+        ):
+            return False
+
+        frete_tipo = pedido.frete_tipo
+        preco_cotado = Decimal(str(pedido.frete_valor or 0))
+        envio = {}
+        try:
+            logger.info(f"Processando envio do pedido #{pedido_id}")
+
+            # 1. Criar pedido no Melhor Envio
+            resultado_me = criar_pedido_melhor_envio(pedido)
+            envio["melhor_envio_id"] = resultado_me.get("melhor_envio_id")
+            envio["melhor_envio_protocolo"] = resultado_me.get("protocol")
+            envio["servico"] = resultado_me.get("service_name", frete_tipo)
+            envio["preco"] = resultado_me.get("price")
+
+            # 2. Comprar o frete
+            comprar_envio(envio["melhor_envio_id"])
+
+            # 3. Gerar etiqueta
+            gerar_etiqueta(envio["melhor_envio_id"])
+
+            # 4. Obter link da etiqueta
+            envio["etiqueta_url"] = imprimir_etiqueta(envio["melhor_envio_id"])
+
+        except Exception as e:
+            logger.error(f"Erro ao processar envio do pedido #{pedido_id}: {str(e)}")
+        finally:
+            # Encerra a leitura antes de travar o pedido para gravar
+            db.session.rollback()
+
+        if not envio.get("melhor_envio_id"):
+            return False
+
+        pedido = (
+            Pedido.query.filter_by(id=pedido_id)
+            .with_for_update()
+            .populate_existing()
+            .one()
+        )
+        if pedido.melhor_envio_id:
+            logger.error(
+                f"Pedido #{pedido_id} já tinha envio {pedido.melhor_envio_id}; "
+                f"envio {envio['melhor_envio_id']} precisa ser cancelado manualmente"
+            )
+            db.session.commit()
+            return False
+
+        pedido.melhor_envio_id = envio["melhor_envio_id"]
+        pedido.melhor_envio_protocolo = envio["melhor_envio_protocolo"]
+
+        # Verificar e atualizar serviço se mudou
+        servico_usado = envio["servico"]
+        if servico_usado and servico_usado != frete_tipo:
+            logger.warning(f"Serviço alterado: {frete_tipo} → {servico_usado}")
+            pedido.frete_servico_nome = servico_usado
+
+        # Verificar e atualizar preço se mudou
+        if envio["preco"]:
+            preco_real_decimal = Decimal(str(envio["preco"]))
+            diferenca = preco_real_decimal - preco_cotado
+
+            # Se diferença maior que R$ 0.10, atualizar
+            if abs(diferenca) > Decimal("0.10"):
+                logger.warning(
+                    f"Preço frete atualizado: "
+                    f"R$ {float(preco_cotado):.2f} → R$ {float(preco_real_decimal):.2f} "
+                    f"(diferença: R$ {float(abs(diferenca)):.2f})"
+                )
+
+                # Atualizar valores (tudo em Decimal)
+                pedido.frete_valor = preco_real_decimal
+                pedido.valor_total = pedido.valor_total + diferenca
+
+        em_separacao = False
+        if envio.get("etiqueta_url"):
+            pedido.etiqueta_url = envio["etiqueta_url"]
+            # Só avança se o pagamento não foi estornado enquanto isso
+            if pedido.status == StatusPedidoEnum.PAGO:
+                pedido.status = StatusPedidoEnum.EM_SEPARACAO
+                em_separacao = True
+            logger.info(
+                f"Envio processado: {pedido.melhor_envio_protocolo} | "
+                f"Etiqueta: {pedido.etiqueta_url}"
+            )
+
+        db.session.commit()
+        PedidoService.invalidar_pedido(pedido_id)
+        return em_separacao
+
     @staticmethod
     def _reverter_estoque(pedido):
-        # Reverte o estoque dos produtos do pedido
+        # Reverte o estoque dos produtos do pedido. Retorna os ids dos produtos.
         from database.models.produto import Produto
 
+        # Pago sem estoque: nada foi baixado, nada a devolver
+        if pedido.revisao_motivo == REVISAO_PAGO_SEM_ESTOQUE:
+            return []
+
+        revertidos = []
         for item in pedido.itens:
             produto = Produto.query.get(item.produto_id)
             if produto:
                 produto.estoque += item.quantidade
+                revertidos.append(produto.id)
                 logger.debug(f"Estoque revertido: {produto.nome} +{item.quantidade}")
+        return revertidos
+
+    @staticmethod
+    def _devolver_estoque(pedido):
+        # Estoque de um pedido que vai ser cancelado pelo estorno: o PENDENTE
+        # libera a reserva, o pago reverte os itens e o já cancelado não
+        # devolve nada (devolveu ao ser cancelado). Retorna os ids dos produtos.
+        if pedido.status == StatusPedidoEnum.PENDENTE:
+            return list(ReservaEstoqueService.liberar(pedido))
+        if pedido.status == StatusPedidoEnum.CANCELADO:
+            return []
+        return PagamentoService._reverter_estoque(pedido)
 
     @staticmethod
     def estornar_pagamento(transacao_id, valor=None):
@@ -261,14 +509,31 @@ class PagamentoService:
         mp_service = MercadoPagoService()
         resultado = mp_service.estornar_pagamento(transacao.mp_payment_id, valor)
 
+        # Registra o evento do estorno, como o webhook: a notificação
+        # "refunded" que o MP manda depois é descartada como repetida
+        try:
+            with db.session.begin_nested():
+                db.session.add(
+                    EventoWebhook(
+                        topico="payment",
+                        recurso_id=str(transacao.mp_payment_id),
+                        status="refunded",
+                        pedido_id=transacao.pedido_id,
+                    )
+                )
+        except IntegrityError:
+            pass  # a notificação do MP chegou antes
+
+        # Reverter estoque (se o pedido ainda não tinha sido cancelado)
+        revertidos = PagamentoService._devolver_estoque(transacao.pedido)
+
         # Atualizar status
         transacao.status = StatusPagamentoEnum.REEMBOLSADO
         transacao.pedido.status = StatusPedidoEnum.CANCELADO
 
-        # Reverter estoque
-        PagamentoService._reverter_estoque(transacao.pedido)
-
         db.session.commit()
+        PedidoService.invalidar_pedido(transacao.pedido_id)
+        VitrineService.estoque_alterado(revertidos)
 
         logger.info(
             f"Estorno processado: Pedido #{transacao.pedido.id} - "
@@ -292,34 +557,51 @@ class PagamentoService:
 
     @staticmethod
     def consultar_transacao(transacao_id):
-        # Consulta detalhes de uma transação específica
+        # Consulta detalhes de uma transação específica. O status devolvido é
+        # o do MP (quando há pagamento); se ele ainda não foi aplicado aqui,
+        # atualizacao_pendente indica que pedido, estoque e email estão na fila
         transacao = TransacaoPagamento.query.get(transacao_id)
         if not transacao:
             raise ValueError("Transação não encontrada")
 
+        status = transacao.status
+        atualizacao_pendente = False
+
         # Se tiver payment_id, consultar status atualizado no MP
         if transacao.mp_payment_id:
             try:
                 mp_service = MercadoPagoService()
                 pagamento_mp = mp_service.consultar_pagamento(transacao.mp_payment_id)
 
-                # Mapear status
-                status_map = {
-                    "approved": StatusPagamentoEnum.APROVADO,
-                    "pending": StatusPagamentoEnum.PENDENTE,
-                    "in_process": StatusPagamentoEnum.PENDENTE,
-                    "rejected": StatusPagamentoEnum.REJEITADO,
-                    "cancelled": StatusPagamentoEnum.CANCELADO,
-                    "refunded": StatusPagamentoEnum.REEMBOLSADO,
-                    "charged_back": StatusPagamentoEnum.REEMBOLSADO,
-                }
-
-                novo_status = status_map.get(pagamento_mp["status"])
+                # Status mudou no MP: a consulta não altera nada; põe o
+                # pagamento na fila e o worker dos webhooks aplica a transição
+                # (pedido, estoque, email, envio)
+                novo_status = STATUS_MERCADOPAGO.get(pagamento_mp["status"])
                 if novo_status and novo_status != transacao.status:
-                    transacao.status = novo_status
-                    db.session.commit()
+                    from services.public.WebhookService import WebhookService
+
+                    WebhookService.enfileirar(
+                        "payment",
+                        str(transacao.mp_payment_id),
+                        {"type": "payment", "data": {"id": transacao.mp_payment_id}},
+                        origem="consulta",
+                    )
+                    status = novo_status
+                    atualizacao_pendente = True
 
             except Exception as e:
+                db.session.rollback()
                 logger.error(f"Erro ao consultar MP: {e}")
 
-        return transacao
+        return {
+            "transacao_id": transacao.id,
+            "pedido_id": transacao.pedido_id,
+            "valor": float(transacao.valor),
+            "status": status.value,
+            "atualizacao_pendente": atualizacao_pendente,
+            "metodo_pagamento": transacao.metodo_pagamento,
+            "mp_payment_id": transacao.mp_payment_id,
+            "criado_em": (
+                transacao.criado_em.isoformat() if transacao.criado_em else None
+            ),
+        }
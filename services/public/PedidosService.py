@@ -1,4 +1,4 @@
-from venv import logger
+import logging
 from database.enums.status_pedido_enum import StatusPedidoEnum
 from database.models import pedido
 from database.models.pedido import Pedido
@@ -8,7 +8,15 @@ from database.models.usuario import Usuario
 from database.models.endereco import Endereco
 from database import db
 from decimal import Decimal
-from services.public.EmailNotificationService import EmailNotificationService
+from sqlalchemy.orm import joinedload, load_only
+from services.public.NotificacaoEmailService import NotificacaoEmailService
+from services.public.ReservaEstoqueService import ReservaEstoqueService
+from services.public.VitrineService import VitrineService
+from utils.cache import pedidos_cache
+from utils.http_cache import preparar_json
+from utils.paginacao import filtro_keyset_desc
+
+logger = logging.getLogger(__name__)
 
 
 class PedidoService:
@@ -63,6 +71,49 @@ class PedidoService:
             if not frete_servico_id:
                 raise ValueError("ID do serviço de frete não informado")
 
+        # Agrupar quantidades por produto (o mesmo produto pode vir em mais de um item)
+        quantidades = {}
+        for item in itens:
+            produto_id = item.get("produto_id")
+            if not produto_id:
+                raise ValueError("Produto não informado em um dos itens")
+
+            quantidade = item.get("quantidade", 1)
+            if (
+                isinstance(quantidade, bool)
+                or not isinstance(quantidade, int)
+                or quantidade < 1
+            ):
+                raise ValueError(f"Quantidade inválida para o produto {produto_id}")
+
+            quantidades[produto_id] = quantidades.get(produto_id, 0) + quantidade
+
+        # Buscar todos os produtos em uma única consulta, travando as linhas
+        # (SELECT ... FOR UPDATE) até o commit. A ordem por id evita deadlock
+        # entre checkouts simultâneos com os mesmos produtos.
+        produtos = {
+            p.id: p
+            for p in Produto.query.filter(Produto.id.in_(quantidades))
+            .order_by(Produto.id)
+            .with_for_update()
+            .populate_existing()
+            .all()
+        }
+
+        for produto_id, quantidade in quantidades.items():
+            produto = produtos.get(produto_id)
+            if not produto:
+                db.session.rollback()
+                raise ValueError(f"Produto {produto_id} não encontrado")
+
+            # Verificar estoque (linha travada: nenhum outro pedido altera no meio)
+            if produto.estoque < quantidade:
+                db.session.rollback()
+                raise ValueError(
+                    f"Estoque insuficiente para o produto {produto.nome}. "
+                    f"Disponível: {produto.estoque}, Solicitado: {quantidade}"
+                )
+
         # Criar o pedido
         pedido = Pedido(
             usuario_id=usuario_id,
@@ -79,26 +130,9 @@ class PedidoService:
         # Adicionar itens
         total_produtos = Decimal("0")
         for item in itens:
-            produto_id = item.get("produto_id")
-            if not produto_id:
-                db.session.rollback()
-                raise ValueError("Produto não informado em um dos itens")
-
-            produto = Produto.query.get(produto_id)
-            if not produto:
-                db.session.rollback()
-                raise ValueError(f"Produto {produto_id} não encontrado")
-
+            produto = produtos[item.get("produto_id")]
             quantidade = item.get("quantidade", 1)
 
-            # Verificar estoque
-            if produto.estoque < quantidade:
-                db.session.rollback()
-                raise ValueError(
-                    f"Estoque insuficiente para o produto {produto.nome}. "
-                    f"Disponível: {produto.estoque}, Solicitado: {quantidade}"
-                )
-
             subtotal = produto.preco * quantidade
             total_produtos += subtotal
 
@@ -115,17 +149,20 @@ class PedidoService:
                 )
             )
 
-            # Atualizar estoque
-            produto.estoque -= quantidade
+        # Atualizar estoque (um UPDATE por produto, com as linhas já travadas).
+        # A baixa fica reservada até o pagamento; se o pedido não for pago a
+        # tempo, a varredura de reservas devolve o estoque.
+        for produto_id, quantidade in quantidades.items():
+            produtos[produto_id].estoque -= quantidade
+        ReservaEstoqueService.reservar(pedido.id, quantidades)
 
         # Valor total = produtos + frete
         pedido.valor_total = total_produtos + frete_valor
-        db.session.commit()
 
-        try:
-            EmailNotificationService.notificar_pedido_criado(pedido)
-        except Exception as e:
-            logger.error(f"Erro ao enviar email de pedido criado: {e}")
+        # Email vai para a fila na mesma transação; o envio é feito fora da requisição
+        NotificacaoEmailService.enfileirar(pedido.id, "pedido_criado")
+        db.session.commit()
+        VitrineService.estoque_alterado(quantidades)
 
         return {
             "pedido_id": pedido.id,
@@ -136,24 +173,18 @@ class PedidoService:
             "frete_servico": frete_servico_nome,
         }
 
-    # Retorna pedido pelo ID
+    # Retorna pedido pelo ID: pedido, usuário, itens e produtos em um único SELECT
     @staticmethod
     def obter_pedido(pedido_id):
-        pedido_obj = Pedido.query.get(pedido_id)
+        pedido_obj = Pedido.query.options(
+            joinedload(Pedido.usuario).load_only(Usuario.nome, Usuario.sobrenome),
+            joinedload(Pedido.itens)
+            .joinedload(ItemPedido.produto)
+            .load_only(Produto.nome, Produto.img),
+        ).get(pedido_id)
         if not pedido_obj:
             return None
 
-        itens = (
-            db.session.query(
-                ItemPedido,
-                Produto.nome.label("produto_nome"),
-                Produto.img.label("produto_img"),
-            )
-            .join(Produto, ItemPedido.produto_id == Produto.id)
-            .filter(ItemPedido.pedido_id == pedido_id)
-            .all()
-        )
-
         pedido_dict = {
             "id": pedido_obj.id,
             "usuario_id": pedido_obj.usuario_id,
@@ -178,13 +209,13 @@ class PedidoService:
             "itens": [],
         }
 
-        for item, produto_nome, produto_img in itens:
+        for item in pedido_obj.itens:
             pedido_dict["itens"].append(
                 {
                     "id": item.id,
                     "produto_id": item.produto_id,
-                    "produto_nome": produto_nome,
-                    "produto_img": produto_img,
+                    "produto_nome": item.produto.nome if item.produto else None,
+                    "produto_img": item.produto.img if item.produto else None,
                     "quantidade": item.quantidade,
                     "preco_unitario": float(item.preco_unitario),
                     "subtotal": float(item.quantidade * item.preco_unitario),
@@ -193,13 +224,63 @@ class PedidoService:
 
         return pedido_dict
 
-    # Lista todos os pedidos de um usuário
+    # Detalhe do pedido já serializado (corpo, etag), guardado em cache por pedido.
+    # Retorna None se o pedido não existir.
+    @staticmethod
+    def obter_documento_pedido(pedido_id):
+        chave = ("pedido", pedido_id)
+        entrada = pedidos_cache.obter(chave)
+        if entrada is None:
+            pedido_dict = PedidoService.obter_pedido(pedido_id)
+            if pedido_dict is None:
+                return None
+            entrada = preparar_json(pedido_dict)
+            pedidos_cache.definir(chave, entrada)
+        return entrada
+
+    # Descarta o detalhe em cache (chamar depois do commit de qualquer alteração
+    # no pedido, nos itens ou nas transações)
+    @staticmethod
+    def invalidar_pedido(*pedido_ids):
+        for pedido_id in pedido_ids:
+            pedidos_cache.remover(("pedido", pedido_id))
+
+    # Lista os pedidos de um usuário, do mais recente para o mais antigo, paginando
+    # por (criado_em, id). Retorna (pedidos, tem_mais); limite=None traz todos.
     @staticmethod
-    def listar_pedidos_usuario(usuario_id):
+    def listar_pedidos_usuario(usuario_id, cursor=None, limite=None):
+        query = Pedido.query.options(
+            load_only(
+                Pedido.id,
+                Pedido.valor_total,
+                Pedido.status,
+                Pedido.frete_valor,
+                Pedido.criado_em,
+                Pedido.melhor_envio_id,
+            )
+        ).filter(Pedido.usuario_id == usuario_id)
+
+        if cursor:
+            query = query.filter(
+                filtro_keyset_desc(Pedido.criado_em, Pedido.id, cursor)
+            )
+
+        query = query.order_by(Pedido.criado_em.desc(), Pedido.id.desc())
+
+        if limite is None:
+            return query.all(), False
+
+        # Busca um item a mais para saber se existe próxima página
+        pedidos = query.limit(limite + 1).all()
+        return pedidos[:limite], len(pedidos) > limite
+
+    # Nome e sobrenome do usuário, para não carregar o usuário pedido a pedido
+    @staticmethod
+    def obter_nome_usuario(usuario_id):
         return (
-            Pedido.query.filter_by(usuario_id=usuario_id)
-            .order_by(Pedido.criado_em.desc())
-            .all()
+            db.session.query(Usuario.nome, Usuario.sobrenome)
+            .filter(Usuario.id == usuario_id)
+            .first()
         )
 
     @staticmethod
@@ -210,18 +291,17 @@ class PedidoService:
 
         status_anterior = pedido.status
         pedido.status = novo_status
-        db.session.commit()
 
-        # Enviar notificação de acordo com o novo status
-        try:
-            if novo_status == StatusPedidoEnum.EM_TRANSITO:
-                EmailNotificationService.notificar_pedido_enviado(
-                    pedido, codigo_rastreio
-                )
-            elif novo_status == StatusPedidoEnum.ENTREGUE:
-                EmailNotificationService.notificar_pedido_entregue(pedido)
-        except Exception as e:
-            logger.error(f"Erro ao enviar notificação de status: {e}")
+        # Enfileirar notificação de acordo com o novo status (mesma transação)
+        if novo_status == StatusPedidoEnum.ENVIADO:
+            NotificacaoEmailService.enfileirar(
+                pedido.id, "pedido_enviado", codigo_rastreio=codigo_rastreio
+            )
+        elif novo_status == StatusPedidoEnum.ENTREGUE:
+            NotificacaoEmailService.enfileirar(pedido.id, "pedido_entregue")
+
+        db.session.commit()
+        PedidoService.invalidar_pedido(pedido.id)
 
         logger.info(
             f"Status do pedido #{pedido_id} alterado: {status_anterior.value} → {novo_status.value}"
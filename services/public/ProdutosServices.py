@@ -1,5 +1,58 @@
+from database import db
 from database.models import Produto
-from sqlalchemy import desc
+from sqlalchemy import desc, func
+from sqlalchemy.orm import joinedload, load_only
+from services.public.BuscaService import BuscaService
+from services.public.PromocoesService import PromocaoService
+from utils.formatters.produto_formatter import (
+    CAMPOS_DERIVADOS,
+    CAMPOS_PRODUTO,
+    formatar_produto,
+    formatar_produtos,
+)
+from utils.paginacao import filtro_keyset_desc
+
+
+# Opções de carga para os campos pedidos: só as colunas necessárias e, se o
+# preço efetivo for pedido, a promoção no mesmo SELECT (LEFT OUTER JOIN)
+def _opcoes_carga(campos=None):
+    if not campos:
+        return [joinedload(Produto.promocao)]
+
+    colunas = {c for c in campos if c not in CAMPOS_DERIVADOS}
+    # criado_em e id sempre entram, pois formam o cursor da próxima página
+    colunas |= {"id", "criado_em"}
+
+    opcoes = []
+    if any(c in CAMPOS_DERIVADOS for c in campos):
+        colunas.add("preco")
+        opcoes.append(joinedload(Produto.promocao))
+
+    opcoes.append(load_only(*[getattr(Produto, c) for c in sorted(colunas)]))
+    return opcoes
+
+
+# Aplica os filtros de catálogo (categoria, faixa de preço, estoque, promoção).
+# Usa o preço de tabela (coluna indexada), não o preço com desconto.
+def _aplicar_filtros(query, filtros=None, ignorar=()):
+    filtros = filtros or {}
+
+    if filtros.get("categoria") and "categoria" not in ignorar:
+        query = query.filter(Produto.categoria == filtros["categoria"])
+    if filtros.get("preco_min") is not None:
+        query = query.filter(Produto.preco >= filtros["preco_min"])
+    if filtros.get("preco_max") is not None:
+        query = query.filter(Produto.preco <= filtros["preco_max"])
+    if filtros.get("em_estoque") is not None:
+        query = query.filter(
+            Produto.estoque > 0 if filtros["em_estoque"] else Produto.estoque <= 0
+        )
+    if filtros.get("em_promocao") is not None:
+        # EXISTS na tabela de promoção
+        em_promocao = Produto.promocao.has()
+        query = query.filter(em_promocao if filtros["em_promocao"] else ~em_promocao)
+
+    return query
 
 
 class ProdutoService:
@@ -9,22 +62,111 @@ class ProdutoService:
     def listar_todos():
         return Produto.query.all()
 
+    # Lista uma página de produtos (keyset em criado_em, id), carregando só os campos pedidos
+    @staticmethod
+    def listar_pagina(cursor=None, limite=20, campos=None, filtros=None):
+        query = _aplicar_filtros(Produto.query.options(*_opcoes_carga(campos)), filtros)
+
+        if cursor:
+            query = query.filter(
+                filtro_keyset_desc(Produto.criado_em, Produto.id, cursor)
+            )
+
+        query = query.order_by(Produto.criado_em.desc(), Produto.id.desc())
+
+        # Sem limite, retorna o catálogo inteiro (ainda respeitando a projeção)
+        if limite is None:
+            return query.all(), False
+
+        # Busca um item a mais para saber se existe próxima página
+        produtos = query.limit(limite + 1).all()
+
+        tem_mais = len(produtos) > limite
+        return produtos[:limite], tem_mais
+
+    # Quantidade de produtos por categoria, em um único GROUP BY.
+    # O filtro de categoria é ignorado, para que as outras opções continuem visíveis.
+    @staticmethod
+    def contar_por_categoria(filtros=None):
+        query = _aplicar_filtros(
+            db.session.query(Produto.categoria, func.count(Produto.id)),
+            filtros,
+            ignorar=("categoria",),
+        )
+        return {
+            categoria: total
+            for categoria, total in query.group_by(Produto.categoria).all()
+            if categoria
+        }
+
     # Busca produto pelo ID
     @staticmethod
     def buscar_por_id(produto_id):
-        return Produto.query.get(produto_id)
+        return Produto.query.options(*_opcoes_carga()).get(produto_id)
+
+    # Busca vários produtos de uma vez (um único IN), na ordem dos IDs informados
+    @staticmethod
+    def buscar_por_ids(ids, campos=None):
+        if not ids:
+            return []
+
+        produtos = {
+            p.id: p
+            for p in Produto.query.options(*_opcoes_carga(campos))
+            .filter(Produto.id.in_(ids))
+            .all()
+        }
+        return [produtos[i] for i in ids if i in produtos]
 
     # Lista produtos com maior estoque (limitado por default a 3)
     @staticmethod
     def listar_top_estoque(limit=3):
-        return Produto.query.order_by(Produto.estoque.desc()).limit(limit).all()
+        return (
+            Produto.query.options(*_opcoes_carga())
+            .order_by(Produto.estoque.desc())
+            .limit(limit)
+            .all()
+        )
 
-    # Busca produtos pelo nome (case-insensitive)
+    # Busca produtos por nome, categoria e descrição (índice invertido + BM25),
+    # na ordem de relevância. Retorna (produtos, total de encontrados); com
+    # limite, só os `limite` primeiros são carregados.
     @staticmethod
-    def buscar_por_nome(termo):
-        return Produto.query.filter(Produto.nome.ilike(f"%{termo}%")).all()
+    def buscar_por_nome(termo, limite=None):
+        ids = BuscaService.buscar(termo, None)
+        total = len(ids)
+        if limite is not None:
+            ids = ids[:limite]
+        if not ids:
+            return [], total
+
+        produtos = {
+            p.id: p
+            for p in Produto.query.options(*_opcoes_carga())
+            .filter(Produto.id.in_(ids))
+            .all()
+        }
+        return [produtos[i] for i in ids if i in produtos], total
 
     # Retorna os últimos produtos adicionado
     @staticmethod
     def listar_ultimos_adicionados(limit=3):
-        return Produto.query.order_by(desc(Produto.created_at)).limit(limit).all()
+        return (
+            Produto.query.options(*_opcoes_carga())
+            .order_by(desc(Produto.criado_em), desc(Produto.id))
+            .limit(limit)
+            .all()
+        )
+
+    # Dict de resposta do produto, com o preço da promoção calculado aqui
+    @staticmethod
+    def formatar(produto, campos=CAMPOS_PRODUTO):
+        return formatar_produto(
+            produto, campos, PromocaoService.calcular_preco_com_desconto
+        )
+
+    @staticmethod
+    def formatar_lista(produtos, campos=CAMPOS_PRODUTO):
+        return formatar_produtos(
+            produtos, campos, PromocaoService.calcular_preco_com_desconto
+        )
@@ -1,12 +1,31 @@
-from database.models import Promocao
+from database import db
+from database.models import Produto, Promocao
 from decimal import Decimal
+from sqlalchemy import func
 
 
 class PromocaoService:
-    # Retorna todas as promoções
+    # Preço com desconto calculado no banco: preco * (100 - desconto) / 100
+    preco_com_desconto_sql = func.round(
+        Produto.preco * (100 - Promocao.desconto_percentual) / 100, 2
+    )
+
+    # Retorna todas as promoções com os dados do produto e o preço final,
+    # em uma única consulta (sem carregar cada produto separadamente)
     @staticmethod
     def listar():
-        return Promocao.query.all()
+        return (
+            db.session.query(
+                Promocao.id,
+                Promocao.produto_id,
+                Produto.nome.label("produto_nome"),
+                Produto.preco.label("preco_original"),
+                Promocao.desconto_percentual,
+                PromocaoService.preco_com_desconto_sql.label("preco_com_desconto"),
+            )
+            .join(Produto, Promocao.produto_id == Produto.id)
+            .all()
+        )
 
     # Calcula o preço com desconto
     @staticmethod
@@ -0,0 +1,339 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from sqlalchemy import bindparam, insert, update
+
+from database import db
+from database.models import (
+    EventoWebhook,
+    Pedido,
+    StatusPagamentoEnum,
+    StatusPedidoEnum,
+    TransacaoPagamento,
+)
+from services.public.MercadoPagoService import MercadoPagoService
+from services.public.NotificacaoEmailService import NotificacaoEmailService
+from services.public.PagamentosService import STATUS_MERCADOPAGO, PagamentoService
+from services.public.PedidosService import PedidoService
+from services.public.ReservaEstoqueService import ReservaEstoqueService
+from utils.date_time import agora_brasil_sem_fuso
+from utils.paginacao import filtro_keyset_desc
+
+logger = logging.getLogger(__name__)
+
+# Transações lidas do banco por rodada (e consultadas no MP em paralelo)
+RECONCILIACAO_LOTE = int(os.getenv("RECONCILIACAO_LOTE", 100))
+# Consultas simultâneas ao Mercado Pago
+RECONCILIACAO_WORKERS = int(os.getenv("RECONCILIACAO_WORKERS", 4))
+# Transações mais novas que isso ainda esperam o webhook
+RECONCILIACAO_IDADE_MINUTOS = int(os.getenv("RECONCILIACAO_IDADE_MINUTOS", 10))
+# Transações mais antigas que isso não são mais consultadas
+RECONCILIACAO_JANELA_HORAS = int(os.getenv("RECONCILIACAO_JANELA_HORAS", 72))
+
+
+# Quando um pedido tem várias transações no lote, vale a de status mais forte
+_PRIORIDADE = {
+    StatusPagamentoEnum.APROVADO: 0,
+    StatusPagamentoEnum.REEMBOLSADO: 1,
+    StatusPagamentoEnum.REJEITADO: 2,
+    StatusPagamentoEnum.CANCELADO: 3,
+}
+
+
+# Pagamento da transação no MP: {"id", "status"}, None se o cliente não pagou
+# ou a exceção da consulta. Roda nas threads do pool (sem acesso ao banco).
+def _consultar(mp_service, pedido_id, mp_payment_id):
+    try:
+        if mp_payment_id:
+            pagamento = mp_service.consultar_pagamento(mp_payment_id)
+            return {"id": str(pagamento["id"]), "status": pagamento["status"]}
+        return mp_service.buscar_pagamento_do_pedido(pedido_id)
+    except Exception as e:
+        return e
+
+
+class ReconciliacaoService:
+    """
+    Reconciliação das transações PENDENTE com o Mercado Pago, para quando o
+    webhook não chega: python -m jobs.reconciliar_pagamentos percorre as
+    transações em lotes, consulta o MP com um pool de threads e aplica as
+    mudanças de cada lote com UPDATEs em lote por status; só os efeitos de
+    cada pedido (email, envio, reversão de estoque) são feitos um a um.
+    """
+
+    # Retorna o resumo da rodada (verificadas, atualizadas, sem_pagamento...)
+    @staticmethod
+    def reconciliar(lote=RECONCILIACAO_LOTE, workers=RECONCILIACAO_WORKERS):
+        agora = agora_brasil_sem_fuso()
+        ate = agora - timedelta(minutes=RECONCILIACAO_IDADE_MINUTOS)
+        desde = agora - timedelta(hours=RECONCILIACAO_JANELA_HORAS)
+
+        resumo = {
+            "verificadas": 0,
+            "atualizadas": 0,
+            "ja_aplicadas": 0,
+            "inalteradas": 0,
+            "sem_pagamento": 0,
+            "encerradas": 0,
+            "erros": 0,
+        }
+        mp_service = MercadoPagoService()
+        cursor = None
+
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+            while True:
+                query = db.session.query(
+                    TransacaoPagamento.id,
+                    TransacaoPagamento.pedido_id,
+                    TransacaoPagamento.mp_payment_id,
+                    TransacaoPagamento.criado_em,
+                ).filter(
+                    TransacaoPagamento.status == StatusPagamentoEnum.PENDENTE,
+                    TransacaoPagamento.criado_em >= desde,
+                    TransacaoPagamento.criado_em <= ate,
+                )
+                if cursor:
+                    query = query.filter(
+                        filtro_keyset_desc(
+                            TransacaoPagamento.criado_em, TransacaoPagamento.id, cursor
+                        )
+                    )
+                linhas = (
+                    query.order_by(
+                        TransacaoPagamento.criado_em.desc(),
+                        TransacaoPagamento.id.desc(),
+                    )
+                    .limit(lote)
+                    .all()
+                )
+                # Não segura a transação de leitura enquanto consulta o MP
+                db.session.commit()
+
+                if not linhas:
+                    break
+                cursor = (linhas[-1].criado_em, linhas[-1].id)
+
+                pagamentos = list(
+                    executor.map(
+                        lambda linha: _consultar(
+                            mp_service, linha.pedido_id, linha.mp_payment_id
+                        ),
+                        linhas,
+                    )
+                )
+
+                resumo["verificadas"] += len(linhas)
+                ReconciliacaoService._aplicar_lote(linhas, pagamentos, resumo)
+
+                if len(linhas) < lote:
+                    break
+
+        logger.info(f"Reconciliação de pagamentos: {resumo}")
+        return resumo
+
+    # Aplica os pagamentos encontrados no MP para um lote de transações
+    @staticmethod
+    def _aplicar_lote(linhas, pagamentos, resumo):
+        # Uma transação por pedido: várias transações do mesmo pedido sem
+        # payment_id trazem o mesmo pagamento da busca pelo pedido
+        vencedoras = {}  # pedido_id -> (linha, pagamento, novo_status)
+        for linha, pagamento in zip(linhas, pagamentos):
+            if isinstance(pagamento, Exception):
+                resumo["erros"] += 1
+                logger.warning(
+                    f"Erro ao consultar o MP para a transação {linha.id}: {pagamento}"
+                )
+                continue
+
+            if pagamento is None:
+                resumo["sem_pagamento"] += 1
+                continue
+
+            novo_status = STATUS_MERCADOPAGO.get(pagamento["status"])
+            if novo_status in (None, StatusPagamentoEnum.PENDENTE):
+                resumo["inalteradas"] += 1
+                continue
+
+            atual = vencedoras.get(linha.pedido_id)
+            if atual is None or _PRIORIDADE[novo_status] < _PRIORIDADE[atual[2]]:
+                vencedoras[linha.pedido_id] = (linha, pagamento, novo_status)
+
+        if not vencedoras:
+            return
+
+        try:
+            pagos = ReconciliacaoService._aplicar_vencedoras(vencedoras, resumo)
+        except Exception as e:
+            db.session.rollback()
+            resumo["erros"] += len(vencedoras)
+            logger.error(f"Erro ao reconciliar {len(vencedoras)} transações: {e}")
+            return
+
+        PedidoService.invalidar_pedido(*vencedoras)
+
+        # Frete comprado depois do commit, pedido a pedido e sem travas
+        for pedido_id in pagos:
+            try:
+                PagamentoService.criar_envio(pedido_id)
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Erro ao gravar envio do pedido #{pedido_id}: {e}")
+
+    # Grava o lote com os pedidos travados e faz o commit. Retorna os pedidos
+    # que foram para PAGO.
+    @staticmethod
+    def _aplicar_vencedoras(vencedoras, resumo):
+        agora = agora_brasil_sem_fuso()
+
+        # Trava os pedidos em ordem, como o webhook (um pedido por vez), e
+        # relê as transações: um webhook pode ter aplicado o status enquanto
+        # o MP era consultado
+        pedidos = {
+            pedido.id: pedido
+            for pedido in Pedido.query.filter(Pedido.id.in_(sorted(vencedoras)))
+            .order_by(Pedido.id)
+            .with_for_update()
+            .populate_existing()
+            .all()
+        }
+        pendentes = {
+            transacao_id
+            for (transacao_id,) in db.session.query(TransacaoPagamento.id).filter(
+                TransacaoPagamento.id.in_(
+                    [linha.id for linha, _, _ in vencedoras.values()]
+                ),
+                TransacaoPagamento.status == StatusPagamentoEnum.PENDENTE,
+            )
+        }
+        # Eventos (pagamento, status) já aplicados pelo webhook
+        aplicados = set(
+            db.session.query(EventoWebhook.recurso_id, EventoWebhook.status).filter(
+                EventoWebhook.topico == "payment",
+                EventoWebhook.recurso_id.in_(
+                    {pagamento["id"] for _, pagamento, _ in vencedoras.values()}
+                ),
+            )
+        )
+
+        aplicar = []
+        for pedido_id, (linha, pagamento, novo_status) in vencedoras.items():
+            if (
+                pedido_id not in pedidos
+                or linha.id not in pendentes
+                or (pagamento["id"], pagamento["status"]) in aplicados
+            ):
+                resumo["ja_aplicadas"] += 1
+                continue
+            aplicar.append((pedidos[pedido_id], linha, pagamento, novo_status))
+
+        if aplicar:
+            db.session.execute(
+                insert(EventoWebhook),
+                [
+                    {
+                        "topico": "payment",
+                        "recurso_id": pagamento["id"],
+                        "status": pagamento["status"],
+                        "pedido_id": pedido.id,
+                    }
+                    for pedido, _, pagamento, _ in aplicar
+                ],
+            )
+
+        # Transações: um UPDATE por status e o payment_id das que não tinham
+        transacoes = TransacaoPagamento.__table__
+        por_status = {}
+        for _, linha, _, novo_status in aplicar:
+            por_status.setdefault(novo_status, []).append(linha.id)
+        for novo_status, transacao_ids in por_status.items():
+            db.session.execute(
+                update(transacoes)
+                .where(transacoes.c.id.in_(transacao_ids))
+                .values(status=novo_status, atualizado_em=agora)
+            )
+        sem_payment_id = [
+            {"b_id": linha.id, "b_payment_id": pagamento["id"]}
+            for _, linha, pagamento, _ in aplicar
+            if not linha.mp_payment_id
+        ]
+        if sem_payment_id:
+            db.session.execute(
+                update(transacoes)
+                .where(transacoes.c.id == bindparam("b_id"))
+                .values(mp_payment_id=bindparam("b_payment_id")),
+                sem_payment_id,
+            )
+
+        # Pedidos: as mesmas transições do webhook, agrupadas
+        pagos, cancelados, liberar = [], [], []
+        for pedido, _, _, novo_status in aplicar:
+            if novo_status == StatusPagamentoEnum.APROVADO:
+                if pedido.status == StatusPedidoEnum.CANCELADO:
+                    # Reserva já vencida: baixa o estoque de novo, se houver;
+                    # sem estoque o pedido fica cancelado e marcado
+                    if not ReservaEstoqueService.confirmar(pedido):
+                        continue
+                elif pedido.status != StatusPedidoEnum.PENDENTE:
+                    continue  # já pago por outra transação
+                pagos.append(pedido.id)
+                NotificacaoEmailService.enfileirar(pedido.id, "pagamento_aprovado")
+
+            elif novo_status == StatusPagamentoEnum.REJEITADO:
+                if pedido.status == StatusPedidoEnum.PENDENTE:
+                    cancelados.append(pedido.id)
+                    liberar.append(pedido.id)
+
+            elif novo_status == StatusPagamentoEnum.REEMBOLSADO:
+                if pedido.status == StatusPedidoEnum.PENDENTE:
+                    liberar.append(pedido.id)
+                elif pedido.status != StatusPedidoEnum.CANCELADO:
+                    PagamentoService._reverter_estoque(pedido)
+                else:
+                    continue
+                cancelados.append(pedido.id)
+
+        ReservaEstoqueService.confirmar_pedidos(
+            [
+                pedido_id
+                for pedido_id in pagos
+                if pedidos[pedido_id].status == StatusPedidoEnum.PENDENTE
+            ]
+        )
+        ReservaEstoqueService.liberar_pedidos(liberar)
+
+        pedidos_tabela = Pedido.__table__
+        for novo_status, pedido_ids in (
+            (StatusPedidoEnum.PAGO, pagos),
+            (StatusPedidoEnum.CANCELADO, cancelados),
+        ):
+            if pedido_ids:
+                db.session.execute(
+                    update(pedidos_tabela)
+                    .where(pedidos_tabela.c.id.in_(pedido_ids))
+                    .values(status=novo_status, atualizado_em=agora)
+                )
+
+        # Pedidos que não estão mais PENDENTE (aqui ou antes, pelo webhook): as
+        # outras transações deles são canceladas e deixam de ser consultadas
+        finais = [
+            pedido_id
+            for pedido_id, pedido in pedidos.items()
+            if pedido_id in pagos
+            or pedido_id in cancelados
+            or pedido.status != StatusPedidoEnum.PENDENTE
+        ]
+        resumo["encerradas"] += PagamentoService.encerrar_transacoes_pendentes(finais)
+
+        # Roda no job: o catálogo em cache da API mostra o estoque devolvido
+        # ou baixado de novo quando as entradas vencem
+        db.session.commit()
+
+        if aplicar:
+            resumo["atualizadas"] += len(aplicar)
+            logger.info(
+                f"{len(aplicar)} transações reconciliadas: {len(pagos)} pedidos "
+                f"pagos, {len(cancelados)} cancelados"
+            )
+        return pagos
@@ -0,0 +1,218 @@
+import logging
+import os
+from datetime import timedelta
+
+from sqlalchemy import bindparam, func, update
+
+from database import db
+from database.models import (
+    ItemPedido,
+    Pedido,
+    Produto,
+    ReservaEstoque,
+    StatusPedidoEnum,
+)
+from utils.date_time import agora_brasil_sem_fuso
+
+logger = logging.getLogger(__name__)
+
+# Tempo que um pedido PENDENTE segura o estoque antes de ser cancelado
+RESERVA_ESTOQUE_MINUTOS = int(os.getenv("RESERVA_ESTOQUE_MINUTOS", 30))
+# Quantidade de pedidos vencidos tratados por transação na varredura
+RESERVA_ESTOQUE_LOTE = int(os.getenv("RESERVA_ESTOQUE_LOTE", 200))
+
+# Pedido.revisao_motivo do pagamento aprovado sem estoque para atender
+REVISAO_PAGO_SEM_ESTOQUE = "pago_sem_estoque"
+
+
+# UPDATE em lote: soma (ou subtrai) quantidades do estoque, um parâmetro por produto
+def _ajustar_estoque(quantidades, sinal=1):
+    if not quantidades:
+        return
+
+    tabela = Produto.__table__
+    db.session.execute(
+        update(tabela)
+        .where(tabela.c.id == bindparam("b_produto_id"))
+        .values(estoque=tabela.c.estoque + sinal * bindparam("b_quantidade")),
+        [
+            {"b_produto_id": produto_id, "b_quantidade": quantidade}
+            for produto_id, quantidade in quantidades.items()
+        ],
+    )
+
+
+class ReservaEstoqueService:
+    """
+    O estoque é baixado na criação do pedido e fica reservado até o pagamento.
+    Na aprovação a reserva vira baixa definitiva (é apagada); se o pedido
+    continuar PENDENTE depois de RESERVA_ESTOQUE_MINUTOS, a varredura cancela o
+    pedido e devolve o estoque.
+    """
+
+    # Registra a reserva dos itens do pedido (sem commit: vai junto com o pedido)
+    @staticmethod
+    def reservar(pedido_id, quantidades):
+        expira_em = agora_brasil_sem_fuso() + timedelta(minutes=RESERVA_ESTOQUE_MINUTOS)
+        for produto_id, quantidade in quantidades.items():
+            db.session.add(
+                ReservaEstoque(
+                    pedido_id=pedido_id,
+                    produto_id=produto_id,
+                    quantidade=quantidade,
+                    expira_em=expira_em,
+                )
+            )
+
+    # Quando vence a reserva do pedido; None se ele não segura estoque
+    @staticmethod
+    def expiracao(pedido_id):
+        return (
+            db.session.query(func.min(ReservaEstoque.expira_em))
+            .filter(ReservaEstoque.pedido_id == pedido_id)
+            .scalar()
+        )
+
+    # Pagamento aprovado: a reserva vira baixa definitiva (sem commit).
+    # Retorna False se o estoque não cobre mais o pedido: ele fica marcado
+    # para revisão (estorno ou reposição) e não deve seguir como pago.
+    @staticmethod
+    def confirmar(pedido):
+        removidas = ReservaEstoque.query.filter_by(pedido_id=pedido.id).delete(
+            synchronize_session=False
+        )
+        if removidas or pedido.status != StatusPedidoEnum.CANCELADO:
+            return True
+
+        # A reserva já tinha vencido e o estoque voltou para a prateleira:
+        # baixa de novo, porque o cliente pagou, mas só se ainda houver
+        # estoque de todos os itens (senão nenhum é baixado)
+        quantidades = dict(
+            db.session.query(ItemPedido.produto_id, func.sum(ItemPedido.quantidade))
+            .filter(ItemPedido.pedido_id == pedido.id)
+            .group_by(ItemPedido.produto_id)
+            .all()
+        )
+        tabela = Produto.__table__
+        savepoint = db.session.begin_nested()
+        for produto_id, quantidade in quantidades.items():
+            baixados = db.session.execute(
+                update(tabela)
+                .where(tabela.c.id == produto_id, tabela.c.estoque >= quantidade)
+                .values(estoque=tabela.c.estoque - quantidade)
+            ).rowcount
+            if not baixados:
+                savepoint.rollback()
+                pedido.revisao_motivo = REVISAO_PAGO_SEM_ESTOQUE
+                logger.error(
+                    f"Pedido #{pedido.id} pago após a reserva vencer e sem estoque "
+                    f"do produto {produto_id}; marcado para estorno ou revisão"
+                )
+                return False
+
+        savepoint.commit()
+        logger.warning(
+            f"Pedido #{pedido.id} pago após a reserva vencer; estoque baixado novamente"
+        )
+        return True
+
+    # Pagamento aprovado de vários pedidos PENDENTE: as reservas viram baixa
+    # definitiva, num DELETE só (sem commit). Retorna quantas foram apagadas.
+    @staticmethod
+    def confirmar_pedidos(pedido_ids):
+        if not pedido_ids:
+            return 0
+        return ReservaEstoque.query.filter(
+            ReservaEstoque.pedido_id.in_(pedido_ids)
+        ).delete(synchronize_session=False)
+
+    # Pagamento recusado: devolve o estoque reservado (sem commit)
+    @staticmethod
+    def liberar(pedido):
+        return ReservaEstoqueService.liberar_pedidos([pedido.id])
+
+    # Devolve o estoque reservado de vários pedidos e apaga as reservas, com
+    # um UPDATE em lote (sem commit). Retorna {produto_id: quantidade devolvida}.
+    @staticmethod
+    def liberar_pedidos(pedido_ids):
+        if not pedido_ids:
+            return {}
+
+        quantidades = dict(
+            db.session.query(
+                ReservaEstoque.produto_id, func.sum(ReservaEstoque.quantidade)
+            )
+            .filter(ReservaEstoque.pedido_id.in_(pedido_ids))
+            .group_by(ReservaEstoque.produto_id)
+            .all()
+        )
+        _ajustar_estoque(quantidades)
+        ReservaEstoque.query.filter(ReservaEstoque.pedido_id.in_(pedido_ids)).delete(
+            synchronize_session=False
+        )
+        return quantidades
+
+    # Cancela os pedidos PENDENTE com reserva vencida e devolve o estoque,
+    # com UPDATEs em lote. Retorna quantos pedidos foram cancelados. Roda no
+    # job: o catálogo em cache da API mostra o estoque devolvido quando vence.
+    @staticmethod
+    def liberar_expiradas(lote=RESERVA_ESTOQUE_LOTE):
+        total = 0
+
+        while True:
+            agora = agora_brasil_sem_fuso()
+
+            # Trava os pedidos do lote; SKIP LOCKED deixa de fora os que estão
+            # sendo pagos neste exato momento
+            pedido_ids = [
+                pedido_id
+                for (pedido_id,) in db.session.query(Pedido.id)
+                .filter(
+                    Pedido.status == StatusPedidoEnum.PENDENTE,
+                    Pedido.reservas.any(ReservaEstoque.expira_em <= agora),
+                )
+                .limit(lote)
+                .with_for_update(skip_locked=True)
+                .all()
+            ]
+
+            if not pedido_ids:
+                break
+
+            quantidades = ReservaEstoqueService.liberar_pedidos(pedido_ids)
+            db.session.execute(
+                update(Pedido.__table__)
+                .where(
+                    Pedido.__table__.c.id.in_(pedido_ids),
+                    Pedido.__table__.c.status == StatusPedidoEnum.PENDENTE,
+                )
+                .values(status=StatusPedidoEnum.CANCELADO, atualizado_em=agora)
+            )
+            db.session.commit()
+
+            total += len(pedido_ids)
+            logger.info(
+                f"{len(pedido_ids)} pedidos com reserva vencida cancelados; "
+                f"estoque devolvido para {len(quantidades)} produtos"
+            )
+
+            if len(pedido_ids) < lote:
+                break
+
+        # Reservas vencidas de pedidos que já saíram de PENDENTE (ex.: atualizados
+        # manualmente pelo admin) não seguram estoque; só são removidas
+        restantes = ReservaEstoque.query.filter(
+            ReservaEstoque.expira_em <= agora_brasil_sem_fuso(),
+            ReservaEstoque.pedido_id.in_(
+                db.session.query(Pedido.id).filter(
+                    Pedido.status != StatusPedidoEnum.PENDENTE
+                )
+            ),
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        if restantes:
+            logger.info(
+                f"{restantes} reservas vencidas de pedidos já tratados removidas"
+            )
+
+        return total
@@ -0,0 +1,87 @@
+import logging
+import os
+import threading
+import time
+
+from services.public.ProdutosServices import ProdutoService
+from utils.cache import catalogo_cache, tag_produto
+from utils.http_cache import preparar_json
+
+logger = logging.getLogger(__name__)
+
+# Quantidade de produtos em cada vitrine da home
+HOME_FEED_TAMANHO = int(os.getenv("HOME_FEED_TAMANHO", 3))
+# Intervalo máximo entre regerações (cobre escritas feitas em outros workers)
+HOME_FEED_INTERVALO = int(os.getenv("HOME_FEED_INTERVALO", 60))
+
+FEEDS = {
+    "home": ProdutoService.listar_top_estoque,
+    "novidades": ProdutoService.listar_ultimos_adicionados,
+}
+
+
+class VitrineService:
+    """
+    Vitrines da página inicial pré-montadas: cada feed fica guardado como
+    JSON pronto (corpo + ETag) e é regerado nas escritas do admin ou quando
+    passa de HOME_FEED_INTERVALO.
+    """
+
+    _feeds = {}  # nome -> (entrada ou None, gerado_em, ids dos produtos)
+    _lock = threading.Lock()
+
+    # Retorna (corpo, etag) do feed, ou None se não houver produtos
+    @staticmethod
+    def obter(nome):
+        feed = VitrineService._feeds.get(nome)
+        if feed is None or time.monotonic() - feed[1] > HOME_FEED_INTERVALO:
+            with VitrineService._lock:
+                # Outro thread pode ter regerado enquanto esperávamos o lock
+                feed = VitrineService._feeds.get(nome)
+                if feed is None or time.monotonic() - feed[1] > HOME_FEED_INTERVALO:
+                    return VitrineService._gerar(nome)
+        return feed[0]
+
+    @staticmethod
+    def _gerar(nome):
+        produtos = FEEDS[nome](HOME_FEED_TAMANHO)
+        entrada = (
+            preparar_json(ProdutoService.formatar_lista(produtos)) if produtos else None
+        )
+        ids = frozenset(p.id for p in produtos)
+        VitrineService._feeds[nome] = (entrada, time.monotonic(), ids)
+        return entrada
+
+    # Descarta os feeds que mostram algum dos produtos; a próxima leitura de
+    # cada um regera. Um produto que passaria a entrar num feed só aparece
+    # quando o feed passa de HOME_FEED_INTERVALO.
+    @staticmethod
+    def expirar(produto_ids):
+        produto_ids = set(produto_ids)
+        with VitrineService._lock:
+            for nome, feed in list(VitrineService._feeds.items()):
+                if feed[2] & produto_ids:
+                    del VitrineService._feeds[nome]
+
+    # O estoque dos produtos mudou com pedidos (fora do admin): descarta só as
+    # respostas do catálogo e os feeds que mostram esses produtos. Chamar depois
+    # do commit, no processo que atende a API; o que os jobs alteram aparece
+    # quando as entradas vencem (CATALOGO_CACHE_TTL, HOME_FEED_INTERVALO).
+    @staticmethod
+    def estoque_alterado(produto_ids):
+        if not produto_ids:
+            return
+        catalogo_cache.invalidar(*(tag_produto(i) for i in produto_ids))
+        VitrineService.expirar(produto_ids)
+
+    # Regera todos os feeds (chamado após escritas do admin no catálogo)
+    @staticmethod
+    def atualizar():
+        with VitrineService._lock:
+            for nome in FEEDS:
+                try:
+                    VitrineService._gerar(nome)
+                except Exception as e:
+                    # Sem o feed em memória, a próxima leitura tenta de novo
+                    VitrineService._feeds.pop(nome, None)
+                    logger.error(f"Erro ao regerar vitrine '{nome}': {e}")
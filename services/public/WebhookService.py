@@ -0,0 +1,327 @@
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from flask import current_app
+from sqlalchemy import func
+
+from database import db
+from database.models import (
+    NotificacaoWebhook,
+    NotificacaoWebhookFalha,
+    StatusWebhookEnum,
+)
+from services.public.MercadoPagoService import MercadoPagoService
+from services.public.PagamentosService import PagamentoService
+from utils.cache import webhooks_cache
+from utils.date_time import agora_brasil_sem_fuso
+
+logger = logging.getLogger(__name__)
+
+# Tópicos do Mercado Pago que a loja processa; os demais são só confirmados
+TOPICOS_MERCADOPAGO = {"payment", "merchant_order"}
+
+# Notificações pegas por rodada do worker
+WEBHOOK_FILA_LOTE = int(os.getenv("WEBHOOK_FILA_LOTE", 100))
+# Threads processando notificações em paralelo (chamadas ao MP e Melhor Envio)
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", 4))
+# Tentativas antes de mover a notificação para a tabela de falhas
+WEBHOOK_MAX_TENTATIVAS = int(os.getenv("WEBHOOK_MAX_TENTATIVAS", 8))
+# Reserva de um lote para o worker que o pegou; se ele morrer, o lote volta
+# para a fila depois desse tempo (cobre as 4 chamadas de 20 s ao Melhor Envio)
+WEBHOOK_RESERVA_SEGUNDOS = int(os.getenv("WEBHOOK_RESERVA_SEGUNDOS", 300))
+# Janela das estatísticas da fila
+WEBHOOK_ESTATISTICAS_HORAS = int(os.getenv("WEBHOOK_ESTATISTICAS_HORAS", 24))
+
+# Contadores da recepção neste processo
+_contadores = {
+    "recebidas": 0,
+    "ignoradas": 0,
+    "descartadas_memoria": 0,
+    "descartadas_fila": 0,
+    "enfileiradas": 0,
+}
+_contadores_lock = threading.Lock()
+
+
+def _contar(nome):
+    with _contadores_lock:
+        _contadores[nome] += 1
+
+
+# Espera antes da próxima tentativa: 30 s, 1 min, 2 min... (até 1 hora)
+def _espera(tentativas):
+    return timedelta(seconds=min(30 * 2 ** max(tentativas - 1, 0), 3600))
+
+
+class WebhookService:
+    """
+    Fila dos webhooks do Mercado Pago: a rota só grava a notificação e responde
+    200; python -m jobs.processar_webhooks processa a fila com um pool de
+    threads, novas tentativas com espera crescente e, quando as tentativas
+    acabam, move a notificação para notificacao_webhook_falha.
+
+    Repetições são descartadas em três pontos: na chegada (filtro em memória
+    e notificação do mesmo recurso ainda na fila), no lote do worker e, depois
+    da consulta ao MP, pelo evento (tópico, recurso, status) já aplicado.
+    """
+
+    # Grava a notificação recebida. Retorna o id, ou None se o tópico não
+    # interessa à loja ou se é repetição de uma notificação ainda não tratada.
+    @staticmethod
+    def receber(data):
+        _contar("recebidas")
+        topico, recurso_id = MercadoPagoService.extrair_recurso(data)
+        if topico not in TOPICOS_MERCADOPAGO:
+            _contar("ignoradas")
+            logger.debug(f"Webhook com tópico {topico} ignorado")
+            return None
+
+        # Filtro em memória: o MP reenvia a mesma notificação (mesmo id e ação)
+        # em rajadas; dentro do TTL ela nem chega ao banco
+        chave = (topico, recurso_id, data.get("action"), str(data.get("id")))
+        if webhooks_cache.obter(chave) is not None:
+            _contar("descartadas_memoria")
+            return None
+
+        notificacao_id = WebhookService.enfileirar(topico, recurso_id, data)
+        webhooks_cache.definir(chave, True)
+        if notificacao_id is None:
+            _contar("descartadas_fila")
+            return None
+
+        _contar("enfileiradas")
+        return notificacao_id
+
+    # Põe um recurso na fila para o worker consultar o MP e aplicar o status
+    # (também usado pela consulta da transação). Retorna o id, ou None se já
+    # existe notificação do mesmo recurso aguardando.
+    @staticmethod
+    def enfileirar(topico, recurso_id, payload, origem="mercadopago"):
+        # Já existe notificação do mesmo recurso que nenhum worker pegou: ela
+        # vai consultar o status atual no MP, então esta não traz nada novo.
+        # Com tentativas > 0 a consulta pode já ter sido feita; aí enfileira.
+        if recurso_id is not None:
+            pendente_id = (
+                db.session.query(NotificacaoWebhook.id)
+                .filter(
+                    NotificacaoWebhook.topico == topico,
+                    NotificacaoWebhook.recurso_id == recurso_id,
+                    NotificacaoWebhook.status == StatusWebhookEnum.PENDENTE,
+                    NotificacaoWebhook.tentativas == 0,
+                )
+                .limit(1)
+                .scalar()
+            )
+            if pendente_id is not None:
+                return None
+
+        notificacao = NotificacaoWebhook(
+            origem=origem,
+            topico=topico,
+            recurso_id=recurso_id,
+            payload=json.dumps(payload),
+            proxima_tentativa_em=agora_brasil_sem_fuso(),
+        )
+        db.session.add(notificacao)
+        db.session.commit()
+        return notificacao.id
+
+    # Processa um lote da fila. Retorna quantas notificações foram pegas.
+    @staticmethod
+    def processar_pendentes(lote=WEBHOOK_FILA_LOTE, workers=WEBHOOK_WORKERS):
+        agora = agora_brasil_sem_fuso()
+        # Todas as notificações do lote chegaram antes deste instante: consultas
+        # ao MP (em cache ou em andamento) iniciadas antes dele não servem
+        reservado_em = time.time()
+
+        # Reserva o lote; SKIP LOCKED deixa outros workers pegarem outras linhas
+        notificacoes = (
+            NotificacaoWebhook.query.filter(
+                NotificacaoWebhook.status == StatusWebhookEnum.PENDENTE,
+                NotificacaoWebhook.proxima_tentativa_em <= agora,
+            )
+            .order_by(NotificacaoWebhook.criado_em)
+            .limit(lote)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        if not notificacoes:
+            db.session.commit()
+            return 0
+
+        # Notificações do mesmo recurso vão para a mesma thread, na ordem de
+        # chegada; o processamento ainda trava o pedido, o que serializa
+        # payment e merchant_order do mesmo pedido entre threads e workers
+        filas = [[] for _ in range(max(workers, 1))]
+        reservadas = set()
+        duplicadas = 0
+        for notificacao in notificacoes:
+            chave = f"{notificacao.topico}:{notificacao.recurso_id}"
+
+            # Várias notificações do mesmo recurso no lote: uma só consulta ao
+            # MP, feita depois desta reserva, já traz o status mais recente
+            if notificacao.recurso_id is not None and chave in reservadas:
+                notificacao.status = StatusWebhookEnum.DUPLICADO
+                notificacao.processado_em = agora
+                duplicadas += 1
+                continue
+            reservadas.add(chave)
+
+            notificacao.tentativas += 1
+            notificacao.proxima_tentativa_em = agora + timedelta(
+                seconds=WEBHOOK_RESERVA_SEGUNDOS
+            )
+            filas[zlib.crc32(chave.encode()) % len(filas)].append(notificacao.id)
+        db.session.commit()
+
+        if duplicadas:
+            logger.info(f"{duplicadas} notificações repetidas no lote descartadas")
+
+        app = current_app._get_current_object()
+        filas = [fila for fila in filas if fila]
+        with ThreadPoolExecutor(max_workers=len(filas)) as executor:
+            list(
+                executor.map(
+                    lambda ids: WebhookService._processar_fila(app, ids, reservado_em),
+                    filas,
+                )
+            )
+
+        return len(notificacoes)
+
+    @staticmethod
+    def _processar_fila(app, notificacao_ids, desde):
+        with app.app_context():
+            try:
+                for notificacao_id in notificacao_ids:
+                    WebhookService._processar(notificacao_id, desde)
+            finally:
+                db.session.remove()
+
+    @staticmethod
+    def _processar(notificacao_id, desde=None):
+        notificacao = NotificacaoWebhook.query.get(notificacao_id)
+        if notificacao is None or notificacao.status != StatusWebhookEnum.PENDENTE:
+            return
+
+        payload = json.loads(notificacao.payload)
+        try:
+            resultado = PagamentoService.processar_webhook_mercadopago(payload, desde)
+        except Exception as e:
+            db.session.rollback()
+            WebhookService._registrar_falha(notificacao_id, e)
+            return
+
+        notificacao = NotificacaoWebhook.query.get(notificacao_id)
+        if not resultado:
+            notificacao.status = StatusWebhookEnum.IGNORADO
+        elif resultado.get("duplicado"):
+            notificacao.status = StatusWebhookEnum.DUPLICADO
+        else:
+            notificacao.status = StatusWebhookEnum.PROCESSADO
+        notificacao.processado_em = agora_brasil_sem_fuso()
+        notificacao.ultimo_erro = None
+        db.session.commit()
+
+    @staticmethod
+    def _registrar_falha(notificacao_id, erro):
+        notificacao = NotificacaoWebhook.query.get(notificacao_id)
+        if notificacao is None:
+            return
+
+        if notificacao.tentativas < WEBHOOK_MAX_TENTATIVAS:
+            notificacao.ultimo_erro = str(erro)[:1000]
+            notificacao.proxima_tentativa_em = agora_brasil_sem_fuso() + _espera(
+                notificacao.tentativas
+            )
+            db.session.commit()
+            logger.warning(
+                f"Webhook {notificacao.topico} {notificacao.recurso_id} falhou "
+                f"(tentativa {notificacao.tentativas}): {erro}"
+            )
+            return
+
+        # Esgotou as tentativas: move para a tabela de falhas
+        descricao = f"{notificacao.topico} {notificacao.recurso_id}"
+        tentativas = notificacao.tentativas
+        db.session.add(
+            NotificacaoWebhookFalha(
+                notificacao_id=notificacao.id,
+                origem=notificacao.origem,
+                topico=notificacao.topico,
+                recurso_id=notificacao.recurso_id,
+                payload=notificacao.payload,
+                tentativas=notificacao.tentativas,
+                ultimo_erro=str(erro)[:1000],
+                recebido_em=notificacao.criado_em,
+            )
+        )
+        db.session.delete(notificacao)
+        db.session.commit()
+        logger.error(
+            f"Webhook {descricao} movido para falhas após {tentativas} "
+            f"tentativas: {erro}"
+        )
+
+    # Devolve para a fila as notificações da tabela de falhas (ex.: depois de
+    # corrigir a causa). Retorna quantas foram reenfileiradas.
+    @staticmethod
+    def reenfileirar_falhas():
+        falhas = NotificacaoWebhookFalha.query.all()
+        agora = agora_brasil_sem_fuso()
+        for falha in falhas:
+            db.session.add(
+                NotificacaoWebhook(
+                    origem=falha.origem,
+                    topico=falha.topico,
+                    recurso_id=falha.recurso_id,
+                    payload=falha.payload,
+                    proxima_tentativa_em=agora,
+                    criado_em=falha.recebido_em,
+                )
+            )
+            db.session.delete(falha)
+        db.session.commit()
+        return len(falhas)
+
+    # Taxa de descarte: recepção deste worker (memória) e fila de todos os
+    # processos nas últimas WEBHOOK_ESTATISTICAS_HORAS (banco)
+    @staticmethod
+    def estatisticas():
+        with _contadores_lock:
+            recepcao = dict(_contadores)
+        descartadas = recepcao["descartadas_memoria"] + recepcao["descartadas_fila"]
+        recepcao["taxa_descarte"] = (
+            round(descartadas / recepcao["recebidas"], 4)
+            if recepcao["recebidas"]
+            else 0.0
+        )
+        recepcao["cache"] = webhooks_cache.estatisticas()
+
+        desde = agora_brasil_sem_fuso() - timedelta(hours=WEBHOOK_ESTATISTICAS_HORAS)
+        por_status = {
+            status.value: total
+            for status, total in db.session.query(
+                NotificacaoWebhook.status, func.count(NotificacaoWebhook.id)
+            )
+            .filter(NotificacaoWebhook.criado_em >= desde)
+            .group_by(NotificacaoWebhook.status)
+        }
+        total = sum(por_status.values())
+        duplicadas = por_status.get(StatusWebhookEnum.DUPLICADO.value, 0)
+
+        return {
+            "recepcao": recepcao,
+            "fila": {
+                "horas": WEBHOOK_ESTATISTICAS_HORAS,
+                "total": total,
+                "por_status": por_status,
+                "taxa_duplicadas": round(duplicadas / total, 4) if total else 0.0,
+            },
+        }
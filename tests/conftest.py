@@ -0,0 +1,188 @@
+import os
+import tempfile
+import uuid
+from datetime import timedelta
+
+import jwt
+import pytest
+from cryptography.fernet import Fernet
+from sqlalchemy import event
+
+# Configuração mínima para importar a aplicação, antes de qualquer import dela.
+# SQLite em arquivo (compartilhado pelas threads), esperando até 30 s pela trava.
+_BANCO = os.path.join(tempfile.mkdtemp(prefix="nego-maq-testes-"), "testes.sqlite")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_BANCO}?timeout=30")
+os.environ.setdefault("CRYPTO_KEY", Fernet.generate_key().decode())
+os.environ.setdefault("ADMIN_TOKEN", "token-admin-testes")
+os.environ.setdefault("SECRET_KEY", "segredo-testes")
+os.environ.setdefault("MERCADOPAGO_ACCESS_TOKEN", "TEST-testes")
+
+from app import app as aplicacao  # noqa: E402
+from benchmarks import mercadopago_local  # noqa: E402
+from database import db  # noqa: E402
+from database.models import (  # noqa: E402
+    Endereco,
+    ItemPedido,
+    Pedido,
+    Produto,
+    ReservaEstoque,
+    TransacaoPagamento,
+    Usuario,
+)
+from services.public.BuscaService import BuscaService  # noqa: E402
+from services.public.MercadoPagoService import consultas_mercadopago  # noqa: E402
+from services.public.VitrineService import VitrineService  # noqa: E402
+from utils import mercadopago_client  # noqa: E402
+from utils.date_time import agora_brasil_sem_fuso  # noqa: E402
+from utils.cache import (  # noqa: E402
+    catalogo_cache,
+    idempotencia_cache,
+    mercadopago_cache,
+    pedidos_cache,
+)
+
+
+# O SQLite não tem SELECT ... FOR UPDATE: cada transação começa com BEGIN
+# IMMEDIATE e fica com a trava de escrita do banco até o commit, o que
+# serializa as transações concorrentes como as travas de linha do MySQL
+def _travar_transacoes(engine):
+    @event.listens_for(engine, "connect")
+    def ao_conectar(conexao_dbapi, _):
+        conexao_dbapi.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def ao_iniciar(conexao):
+        conexao.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+with aplicacao.app_context():
+    _travar_transacoes(db.engine)
+    db.engine.dispose()
+
+
+@pytest.fixture
+def app():
+    with aplicacao.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.remove()
+
+    for cache in (catalogo_cache, idempotencia_cache, mercadopago_cache, pedidos_cache):
+        cache.limpar()
+    VitrineService._feeds.clear()
+    BuscaService._indice = None  # reconstruído na primeira busca
+
+    yield aplicacao
+
+
+# Usuário com endereço e um produto em estoque: (usuario_id, endereco_id, produto_id)
+@pytest.fixture
+def dados(app):
+    with app.app_context():
+        usuario = Usuario(
+            nome="Ana",
+            sobrenome="Silva",
+            email=f"{uuid.uuid4()}@teste.com",
+            senha_hash="x",
+        )
+        db.session.add(usuario)
+        db.session.flush()
+        endereco = Endereco(
+            usuario_id=usuario.id,
+            cep="90000000",
+            logradouro="Rua A",
+            numero="1",
+            bairro="Centro",
+            cidade="Porto Alegre",
+            estado="RS",
+        )
+        produto = Produto(
+            nome="Faca Artesanal",
+            descricao="Lâmina de aço carbono",
+            categoria="facas",
+            preco=100,
+            estoque=10,
+            peso=1,
+            altura=5,
+            largura=4,
+            comprimento=32,
+        )
+        db.session.add_all([endereco, produto])
+        db.session.commit()
+        ids = (usuario.id, endereco.id, produto.id)
+        db.session.remove()
+    return ids
+
+
+# Cria um pedido PENDENTE de 2 unidades do produto, com a reserva vencendo em
+# `expira_em_minutos` (negativo = já vencida) e uma transação PENDENTE;
+# devolve (pedido_id, transacao_id)
+@pytest.fixture
+def criar_pedido(app, dados):
+    usuario_id, endereco_id, produto_id = dados
+
+    def criar(expira_em_minutos=30):
+        with app.app_context():
+            pedido = Pedido(
+                usuario_id=usuario_id, endereco_id=endereco_id, valor_total=200
+            )
+            db.session.add(pedido)
+            db.session.flush()
+            db.session.add(
+                ItemPedido(
+                    pedido_id=pedido.id,
+                    produto_id=produto_id,
+                    quantidade=2,
+                    preco_unitario=100,
+                    peso=1,
+                    altura=5,
+                    largura=4,
+                    comprimento=32,
+                )
+            )
+            Produto.query.get(produto_id).estoque -= 2
+            db.session.add(
+                ReservaEstoque(
+                    pedido_id=pedido.id,
+                    produto_id=produto_id,
+                    quantidade=2,
+                    expira_em=agora_brasil_sem_fuso()
+                    + timedelta(minutes=expira_em_minutos),
+                )
+            )
+            transacao = TransacaoPagamento(
+                pedido_id=pedido.id, valor=200, metodo_pagamento="mercadopago"
+            )
+            db.session.add(transacao)
+            db.session.commit()
+            ids = (pedido.id, transacao.id)
+            db.session.remove()
+        return ids
+
+    return criar
+
+
+@pytest.fixture
+def token(app, dados):
+    usuario_id = dados[0]
+    segredo = app.config["SECRET_KEY"]
+    return jwt.encode({"id": usuario_id}, segredo, algorithm="HS256")
+
+
+# API do Mercado Pago local (benchmarks.mercadopago_local) com latência, para
+# que requisições simultâneas se sobreponham; devolve o estado do servidor
+@pytest.fixture
+def mercadopago(monkeypatch):
+    servidor, estado = mercadopago_local.iniciar(latencia_ms=200)
+    monkeypatch.setattr(
+        mercadopago_client,
+        "MERCADOPAGO_API_URL",
+        f"http://127.0.0.1:{servidor.server_port}",
+    )
+    mercadopago_cache.limpar()
+    yield estado
+    servidor.shutdown()
+    servidor.server_close()
+    mercadopago_cache.limpar()
+    consultas_mercadopago.executadas = 0
+    consultas_mercadopago.compartilhadas = 0
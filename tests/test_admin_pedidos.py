@@ -0,0 +1,92 @@
+import json
+import os
+from functools import partial
+
+from database import db
+from database.models import Pedido, Produto, StatusPedidoEnum, TransacaoPagamento
+from routes.admin import pedidos_admin
+from services.admin import AdminPedidosService
+from services.admin.AdminPedidosService import atualizar_status_em_lote
+from services.public.PagamentosService import PagamentoService
+
+
+def _aprovar(transacao_id, status_mp="approved"):
+    transacao = TransacaoPagamento.query.get(transacao_id)
+    return PagamentoService.aplicar_status_pagamento(
+        transacao, f"pagamento-{transacao_id}", status_mp
+    )
+
+
+def test_cancelar_pedido_pago_em_lote_devolve_o_estoque_uma_vez(
+    app, dados, criar_pedido
+):
+    produto_id = dados[2]
+    pedido_id, transacao_id = criar_pedido()
+    with app.app_context():
+        _aprovar(transacao_id)
+        assert Produto.query.get(produto_id).estoque == 8
+
+        resposta = atualizar_status_em_lote([pedido_id], "cancelado")
+        assert resposta["resultados"][0]["resultado"] == "atualizado"
+        assert "aviso" in resposta["resultados"][0]
+        assert Produto.query.get(produto_id).estoque == 10
+
+        # O estorno que chega depois não devolve o estoque de novo
+        _aprovar(transacao_id, "refunded")
+        assert Pedido.query.get(pedido_id).status == StatusPedidoEnum.CANCELADO
+        assert Produto.query.get(produto_id).estoque == 10
+
+
+def test_cancelar_pedido_pendente_em_lote_libera_a_reserva(app, dados, criar_pedido):
+    produto_id = dados[2]
+    pedido_id, _ = criar_pedido()
+    with app.app_context():
+        resposta = atualizar_status_em_lote([pedido_id], "cancelado")
+        assert "aviso" not in resposta["resultados"][0]
+        assert Produto.query.get(produto_id).estoque == 10
+
+
+def test_transicoes_invalidas_em_lote_nao_alteram_o_pedido(app, criar_pedido):
+    pedido_id, _ = criar_pedido()
+    with app.app_context():
+        resposta = atualizar_status_em_lote(
+            [pedido_id, "nao-existe", pedido_id], "entregue"
+        )
+        assert [r["resultado"] for r in resposta["resultados"]] == [
+            "transicao_invalida",
+            "nao_encontrado",
+            "duplicado",
+        ]
+        db.session.expire_all()
+        assert Pedido.query.get(pedido_id).status == StatusPedidoEnum.PENDENTE
+
+
+def test_listagem_em_streaming_fecha_o_json_quando_falha_no_meio(
+    app, criar_pedido, monkeypatch
+):
+    for _ in range(3):
+        criar_pedido()
+    chamadas = []
+
+    def formatar(pedido):
+        chamadas.append(pedido.id)
+        if len(chamadas) == 3:
+            raise RuntimeError("conexão perdida")
+        return {"id": pedido.id}
+
+    monkeypatch.setattr(AdminPedidosService, "_formatar_pedido", formatar)
+    monkeypatch.setattr(
+        pedidos_admin,
+        "iterar_pedidos_service",
+        partial(AdminPedidosService.iterar_pedidos, lote=1),
+    )
+
+    resposta = app.test_client().get(
+        "/admin_pedidos/pedidos",
+        headers={"Authorization": f"Bearer {os.environ['ADMIN_TOKEN']}"},
+    )
+
+    itens = json.loads(resposta.data)
+    assert resposta.status_code == 200
+    assert [i.get("id") for i in itens[:2]] == chamadas[:2]
+    assert itens[-1]["erro"] == "Listagem interrompida"
@@ -0,0 +1,111 @@
+from types import SimpleNamespace
+
+from services.public.BuscaService import IndiceInvertido, IndicePrefixos
+
+
+def _produto(id, nome, descricao=None, categoria=None):
+    return SimpleNamespace(id=id, nome=nome, descricao=descricao, categoria=categoria)
+
+
+def _indice(*produtos):
+    indice = IndiceInvertido()
+    for produto in produtos:
+        indice.adicionar(produto)
+    return indice
+
+
+def _ids(resultado):
+    return [produto_id for produto_id, _ in resultado]
+
+
+def test_termo_no_nome_vale_mais_que_na_descricao():
+    indice = _indice(
+        _produto("p1", "Avental de Couro", "Protege na churrasqueira", "aventais"),
+        _produto("p2", "Faca do Chef", "Acompanha bainha de couro", "facas"),
+        _produto("p3", "Chaira", "Afia a lâmina", "acessorios"),
+    )
+    assert _ids(indice.buscar("couro")) == ["p1", "p2"]
+
+
+def test_busca_ignora_acentos_plural_e_expande_prefixo():
+    indice = _indice(
+        _produto("p1", "Faca Açougueiro", "Lâmina larga", "facas"),
+        _produto("p2", "Avental Infantil", None, "aventais"),
+    )
+    assert _ids(indice.buscar("ACOUGUEIROS")) == ["p1"]
+    assert _ids(indice.buscar("lamin")) == ["p1"]
+    assert _ids(indice.buscar("avental")) == ["p2"]
+    # Só stopwords ou nenhum termo conhecido: nada
+    assert indice.buscar("de para") == []
+    assert indice.buscar("bainha") == []
+
+
+def test_limite_e_remocao():
+    indice = _indice(*(_produto(f"p{i}", f"Faca {i}") for i in range(30)))
+    assert len(indice.buscar("faca")) == 20
+    assert len(indice.buscar("faca", limite=None)) == 30
+
+    indice.remover("p0")
+    # Reindexar um produto substitui os termos antigos
+    indice.adicionar(_produto("p1", "Chaira"))
+    assert len(indice) == 29
+    assert len(indice.buscar("faca", limite=None)) == 28
+    assert _ids(indice.buscar("chaira")) == ["p1"]
+    assert indice.buscar("0") == []
+
+
+def _prefixos(*produtos):
+    prefixos = IndicePrefixos()
+    for produto in produtos:
+        prefixos.adicionar(produto)
+    return prefixos
+
+
+def _textos(sugestoes):
+    return [(s["tipo"], s["texto"]) for s in sugestoes]
+
+
+def test_sugere_nomes_e_categorias_pelo_prefixo():
+    prefixos = _prefixos(
+        _produto("p1", "Faca Açougueiro", categoria="facas"),
+        _produto("p2", "Faca do Chef", categoria="facas"),
+        _produto("p3", "Avental de Couro", categoria="aventais"),
+    )
+    assert _textos(prefixos.sugerir("fac")) == [
+        ("produto", "Faca Açougueiro"),
+        ("produto", "Faca do Chef"),
+        ("categoria", "facas"),
+    ]
+    assert prefixos.sugerir("fac", limite=1) == [
+        {"texto": "Faca Açougueiro", "tipo": "produto", "produto_id": "p1"}
+    ]
+    assert prefixos.sugerir("  ") == []
+
+
+def test_sugere_pelo_meio_do_nome_sem_acentos():
+    prefixos = _prefixos(
+        _produto("p1", "Faca Açougueiro", categoria="facas"),
+        _produto("p2", "Açougue Completo", categoria="kits"),
+    )
+    # Nome que começa com o prefixo vem antes do que só contém a palavra
+    assert _textos(prefixos.sugerir("AÇOUG")) == [
+        ("produto", "Açougue Completo"),
+        ("produto", "Faca Açougueiro"),
+    ]
+    assert _textos(prefixos.sugerir("faca acou")) == [("produto", "Faca Açougueiro")]
+
+
+def test_categoria_sai_com_o_ultimo_produto():
+    prefixos = _prefixos(
+        _produto("p1", "Avental de Couro", categoria="aventais"),
+        _produto("p2", "Avental Infantil", categoria="aventais"),
+    )
+    prefixos.remover("p1")
+    assert _textos(prefixos.sugerir("aven")) == [
+        ("categoria", "aventais"),
+        ("produto", "Avental Infantil"),
+    ]
+
+    prefixos.remover("p2")
+    assert prefixos.sugerir("aven") == []
+    assert len(prefixos) == 0
@@ -0,0 +1,234 @@
+from datetime import datetime
+
+from database import db
+from database.models import Produto
+from routes.public import public
+from services.admin import AdminService
+from services.public.BuscaService import BuscaService
+from services.public.ProdutosServices import ProdutoService
+from services.public.VitrineService import VitrineService
+from utils.cache import catalogo_cache
+
+
+def _novo_produto(app, nome, estoque=5, categoria="aventais", preco=50, **campos):
+    with app.app_context():
+        produto = Produto(
+            nome=nome,
+            descricao=nome,
+            categoria=categoria,
+            preco=preco,
+            estoque=estoque,
+            peso=1,
+            altura=1,
+            largura=1,
+            comprimento=1,
+            **campos,
+        )
+        db.session.add(produto)
+        db.session.commit()
+        produto_id = produto.id
+        db.session.remove()
+    return produto_id
+
+
+def test_estoque_alterado_descarta_so_as_entradas_do_produto(app, dados):
+    produto_id = dados[2]
+    outro_id = _novo_produto(app, "Avental de Couro")
+    cliente = app.test_client()
+
+    for url in (f"/produtos/{produto_id}", f"/produtos/{outro_id}", "/produtos"):
+        assert cliente.get(url).status_code == 200
+    assert catalogo_cache.obter(("produto", produto_id)) is not None
+
+    with app.app_context():
+        VitrineService.estoque_alterado([produto_id])
+
+    assert catalogo_cache.obter(("produto", produto_id)) is None
+    assert catalogo_cache.obter(("produto", outro_id)) is not None
+    # A lista mostra o produto alterado: também sai do cache
+    assert catalogo_cache.invalidar("produtos") == 1
+
+
+def test_estoque_alterado_expira_so_os_feeds_com_o_produto(app, dados):
+    produto_id = dados[2]
+    cliente = app.test_client()
+    with app.app_context():
+        VitrineService.atualizar()
+    assert {"home", "novidades"} <= set(VitrineService._feeds)
+
+    with app.app_context():
+        VitrineService.estoque_alterado(["outro-produto"])
+    assert {"home", "novidades"} <= set(VitrineService._feeds)
+
+    with app.app_context():
+        VitrineService.estoque_alterado([produto_id])
+    assert not VitrineService._feeds
+
+    resposta = cliente.get("/produtos/home")
+    assert resposta.get_json()[0]["id"] == produto_id
+
+
+def test_lote_e_autocomplete_respondem_304_sem_consultar(app, dados, monkeypatch):
+    produto_id = dados[2]
+    cliente = app.test_client()
+    urls = (f"/produtos/lote?ids={produto_id}", "/produtos/autocomplete?q=fac")
+
+    etags = {}
+    for url in urls:
+        resposta = cliente.get(url)
+        assert resposta.status_code == 200
+        etags[url] = resposta.headers["ETag"]
+    assert resposta.get_json()["sugestoes"]
+
+    def nao_consultar(*args, **kwargs):
+        raise AssertionError("consultou com a resposta em cache")
+
+    monkeypatch.setattr(ProdutoService, "buscar_por_ids", nao_consultar)
+    monkeypatch.setattr(BuscaService, "sugerir", nao_consultar)
+
+    for url in urls:
+        resposta = cliente.get(url, headers={"If-None-Match": etags[url]})
+        assert resposta.status_code == 304
+
+
+def test_busca_sem_limite_traz_todos_e_com_limite_informa_o_total(app, dados):
+    for i in range(24):
+        _novo_produto(app, f"Faca Churrasco {i}")
+    cliente = app.test_client()
+
+    todos = cliente.get("/produtos/busca?nome=faca").get_json()
+    assert len(todos) == 25
+
+    pagina = cliente.get("/produtos/busca?nome=faca&limite=20").get_json()
+    assert len(pagina["produtos"]) == 20
+    assert pagina["total"] == 25
+
+
+def test_cursor_percorre_o_catalogo_sem_repetir_nem_pular(app, dados):
+    # Metade com o mesmo criado_em: o desempate é pelo id
+    mesmo_instante = datetime(2026, 1, 1, 12, 0, 0)
+    for i in range(6):
+        extras = {"criado_em": mesmo_instante} if i % 2 else {}
+        _novo_produto(app, f"Estojo {i}", **extras)
+    cliente = app.test_client()
+    completo = [p["id"] for p in cliente.get("/produtos").get_json()]
+    assert len(completo) == 7
+
+    vistos, cursor = [], None
+    while True:
+        url = "/produtos?limite=2" + (f"&cursor={cursor}" if cursor else "")
+        pagina = cliente.get(url).get_json()
+        assert len(pagina["produtos"]) <= 2
+        vistos += [p["id"] for p in pagina["produtos"]]
+        cursor = pagina["proximo_cursor"]
+        if cursor is None:
+            break
+
+    assert vistos == completo
+
+
+def test_cursor_invalido_e_campos_invalidos_respondem_400(app):
+    cliente = app.test_client()
+    assert cliente.get("/produtos?cursor=nao-e-cursor").status_code == 400
+    assert cliente.get("/produtos?fields=nome,senha").status_code == 400
+
+
+def test_fields_devolve_so_os_campos_pedidos_e_o_id(app, dados):
+    produtos = app.test_client().get("/produtos?fields=nome,preco").get_json()
+    assert produtos == [{"id": dados[2], "nome": "Faca Artesanal", "preco": 100.0}]
+
+
+def test_filtros_e_facetas_do_catalogo(app, dados):
+    _novo_produto(app, "Avental Couro", estoque=0, preco=80)
+    _novo_produto(app, "Avental Lona", estoque=4, preco=120)
+    _novo_produto(app, "Estojo Facas", estoque=2, preco=300, categoria="estojos")
+    cliente = app.test_client()
+
+    def nomes(url):
+        return sorted(p["nome"] for p in cliente.get(url).get_json())
+
+    assert nomes("/produtos?categoria=aventais") == ["Avental Couro", "Avental Lona"]
+    assert nomes("/produtos?categoria=aventais&em_estoque=true") == ["Avental Lona"]
+    assert nomes("/produtos?preco_min=100&preco_max=150") == [
+        "Avental Lona",
+        "Faca Artesanal",
+    ]
+    assert cliente.get("/produtos?preco_min=-1").status_code == 400
+
+    # A faceta ignora o filtro de categoria, mas respeita os demais
+    facetas = cliente.get("/produtos/facetas?categoria=aventais&em_estoque=1")
+    assert facetas.get_json() == {
+        "categorias": {"aventais": 1, "estojos": 1, "facas": 1},
+        "total": 3,
+    }
+
+
+def test_escrita_do_admin_invalida_o_catalogo_em_cache(app, dados):
+    produto_id = dados[2]
+    cliente = app.test_client()
+    url = f"/produtos/{produto_id}"
+
+    antes = cliente.get(url)
+    assert antes.get_json()["estoque"] == 10
+    assert cliente.get("/promocoes").get_json() == []
+
+    with app.app_context():
+        AdminService.atualizar_estoque(produto_id, 3)
+        AdminService.criar_promocao(produto_id, 10)
+
+    depois = cliente.get(url, headers={"If-None-Match": antes.headers["ETag"]})
+    assert depois.status_code == 200
+    assert depois.get_json()["estoque"] == 3
+    assert depois.get_json()["preco_com_desconto"] == 90.0
+    assert cliente.get("/promocoes").get_json()[0]["produto_id"] == produto_id
+
+
+def test_lote_mantem_a_ordem_e_lista_os_nao_encontrados(app, dados):
+    produto_id = dados[2]
+    outro_id = _novo_produto(app, "Avental de Couro")
+    cliente = app.test_client()
+
+    resposta = cliente.get(f"/produtos/lote?ids={outro_id},inexistente,{produto_id}")
+    corpo = resposta.get_json()
+    assert [p["id"] for p in corpo["produtos"]] == [outro_id, produto_id]
+    assert corpo["nao_encontrados"] == ["inexistente"]
+    assert set(corpo["produtos"][0]) == set(public.CAMPOS_LOTE)
+
+    # POST com repetidos: cada id uma vez, mesma resposta do GET
+    resposta = cliente.post(
+        "/produtos/lote", json={"ids": [outro_id, "inexistente", outro_id, produto_id]}
+    )
+    assert resposta.get_json() == corpo
+
+    assert cliente.post("/produtos/lote", json={"ids": "a,b"}).status_code == 400
+    assert cliente.get("/produtos/lote?ids=,").status_code == 400
+
+
+def test_feeds_da_home_e_novidades(app):
+    cliente = app.test_client()
+    # Sem produtos: home vazia e novidades 404, e o feed vazio também fica guardado
+    assert cliente.get("/produtos/home").get_json() == []
+    assert cliente.get("/produtos/novidades").status_code == 404
+
+    ids = [
+        _novo_produto(
+            app, f"Produto {i}", estoque=i, criado_em=datetime(2026, 1, 10 - i)
+        )
+        for i in range(1, 5)
+    ]
+    # Produtos novos só entram quando o feed é regerado
+    assert cliente.get("/produtos/home").get_json() == []
+
+    with app.app_context():
+        VitrineService.atualizar()
+
+    # Home pelo maior estoque; novidades pelos mais recentes
+    home = cliente.get("/produtos/home")
+    assert [p["id"] for p in home.get_json()] == ids[:0:-1]
+    novidades = cliente.get("/produtos/novidades")
+    assert [p["id"] for p in novidades.get_json()] == ids[:3]
+
+    resposta = cliente.get(
+        "/produtos/home", headers={"If-None-Match": home.headers["ETag"]}
+    )
+    assert resposta.status_code == 304
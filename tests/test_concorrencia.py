@@ -0,0 +1,146 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from database import db
+from database.models import (
+    ChaveIdempotencia,
+    Pedido,
+    Produto,
+    ReservaEstoque,
+    StatusPedidoEnum,
+    TransacaoPagamento,
+)
+from services.public.MercadoPagoService import MercadoPagoService
+from services.public.PagamentosService import PagamentoService
+from services.public.ReservaEstoqueService import ReservaEstoqueService
+
+REQUISICOES = 8
+
+
+# Roda funcao(i) em n threads liberadas juntas por uma barreira
+def _simultaneas(funcao, n=REQUISICOES):
+    barreira = threading.Barrier(n)
+
+    def rodar(i):
+        barreira.wait()
+        return funcao(i)
+
+    with ThreadPoolExecutor(max_workers=n) as executor:
+        return list(executor.map(rodar, range(n)))
+
+
+def test_mesma_idempotency_key_executa_uma_vez(app, criar_pedido, token, mercadopago):
+    pedido_id, _ = criar_pedido()
+    # A transação PENDENTE do pedido ainda não tem preferência: sai da conta
+    with app.app_context():
+        TransacaoPagamento.query.filter_by(pedido_id=pedido_id).delete()
+        db.session.commit()
+
+    def criar_preferencia(_):
+        resposta = app.test_client().post(
+            f"/pedidos/{pedido_id}/pagamento/preferencia",
+            headers={
+                "Authorization": f"Bearer {token}",
+                "Idempotency-Key": "preferencia-1",
+            },
+        )
+        return (
+            resposta.status_code,
+            resposta.headers.get("Idempotent-Replayed"),
+            resposta.get_json(),
+        )
+
+    respostas = _simultaneas(criar_preferencia)
+
+    executadas = [r for r in respostas if r[0] == 201 and not r[1]]
+    assert len(executadas) == 1
+    # As demais esperam (409) ou recebem a resposta guardada da primeira
+    for status, repetida, corpo in respostas:
+        assert status in (201, 409)
+        if status == 201:
+            assert corpo == executadas[0][2]
+            assert repetida or corpo is executadas[0][2]
+
+    assert mercadopago.requisicoes == 1
+    with app.app_context():
+        assert TransacaoPagamento.query.filter_by(pedido_id=pedido_id).count() == 1
+        assert ChaveIdempotencia.query.count() == 1
+
+
+def test_notificacoes_simultaneas_da_mesma_ordem_vao_uma_vez_ao_mp(
+    app, criar_pedido, mercadopago
+):
+    pedido_id, _ = criar_pedido()
+    pagamento = mercadopago.salvar_pagamento(
+        {"external_reference": pedido_id, "status": "approved"}
+    )
+    notificacao = {
+        "topic": "merchant_order",
+        "resource": f"https://api.mercadolibre.com/merchant_orders/{pedido_id}",
+    }
+
+    resultados = _simultaneas(
+        lambda _: MercadoPagoService().processar_webhook(notificacao)
+    )
+
+    assert mercadopago.requisicoes == 1
+    assert all(r == resultados[0] for r in resultados)
+    assert resultados[0]["payment_id"] == str(pagamento["id"])
+    assert resultados[0]["status"] == "approved"
+
+
+def test_consultas_simultaneas_do_mesmo_pagamento_vao_uma_vez_ao_mp(
+    app, criar_pedido, mercadopago
+):
+    pedido_id, _ = criar_pedido()
+    pagamento = mercadopago.salvar_pagamento(
+        {"external_reference": pedido_id, "status": "approved"}
+    )
+
+    consultas = _simultaneas(
+        lambda _: MercadoPagoService().consultar_pagamento(pagamento["id"])
+    )
+
+    assert mercadopago.requisicoes == 1
+    assert all(c == consultas[0] for c in consultas)
+    assert consultas[0]["external_reference"] == pedido_id
+
+
+def test_varredura_e_aprovacao_simultaneas_baixam_o_estoque_uma_vez(
+    app, dados, criar_pedido
+):
+    produto_id = dados[2]
+    for _ in range(5):
+        with app.app_context():
+            estoque_inicial = Produto.query.get(produto_id).estoque
+            db.session.remove()
+        pedido_id, transacao_id = criar_pedido(expira_em_minutos=-1)
+
+        def varrer():
+            return ReservaEstoqueService.liberar_expiradas()
+
+        def aprovar():
+            transacao = TransacaoPagamento.query.get(transacao_id)
+            return PagamentoService.aplicar_status_pagamento(
+                transacao, f"pagamento-{transacao_id}", "approved"
+            )
+
+        def rodar(i):
+            with app.app_context():
+                try:
+                    return (varrer, aprovar)[i]()
+                finally:
+                    db.session.remove()
+
+        _simultaneas(rodar, n=2)
+
+        # Qualquer que seja a ordem (a varredura cancela e a aprovação baixa de
+        # novo, ou a aprovação confirma a reserva e a varredura não acha nada),
+        # o pedido termina pago e o estoque é baixado uma única vez
+        with app.app_context():
+            pedido = Pedido.query.get(pedido_id)
+            assert pedido.status == StatusPedidoEnum.PAGO
+            assert pedido.revisao_motivo is None
+            assert ReservaEstoque.query.filter_by(pedido_id=pedido_id).count() == 0
+            assert Produto.query.get(produto_id).estoque == estoque_inicial - 2
+            db.session.remove()
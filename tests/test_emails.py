@@ -0,0 +1,92 @@
+from datetime import timedelta
+
+from database import db
+from database.models import NotificacaoEmail, Pedido, StatusNotificacaoEnum
+from services.public import NotificacaoEmailService as modulo_emails
+from services.public.NotificacaoEmailService import NotificacaoEmailService
+from utils.date_time import agora_brasil_sem_fuso
+
+
+# Devolve as notificações reservadas/adiadas para a fila, como se o tempo passasse
+def _liberar_fila():
+    NotificacaoEmail.query.update(
+        {
+            NotificacaoEmail.proxima_tentativa_em: agora_brasil_sem_fuso()
+            - timedelta(seconds=1)
+        }
+    )
+    db.session.commit()
+
+
+# Pedido com frete, como os criados pelo checkout (o email mostra o subtotal)
+def _pedido_com_frete(app, criar_pedido):
+    pedido_id, _ = criar_pedido()
+    with app.app_context():
+        pedido = Pedido.query.get(pedido_id)
+        pedido.frete_tipo = "PAC"
+        pedido.frete_valor = 20
+        db.session.commit()
+        db.session.remove()
+    return pedido_id
+
+
+def test_email_enviado_e_repetido_descartado(app, criar_pedido, monkeypatch):
+    pedido_id = _pedido_com_frete(app, criar_pedido)
+    enviados = []
+    monkeypatch.setattr(
+        modulo_emails,
+        "enviar_emails",
+        lambda mensagens: enviados.extend(mensagens) or [None] * len(mensagens),
+    )
+
+    with app.app_context():
+        NotificacaoEmailService.enfileirar(pedido_id, "pedido_criado")
+        db.session.commit()
+        assert NotificacaoEmailService.processar_pendentes() == 1
+
+        # Mesma chave de novo (ex.: status repetido pelo admin): não reenvia
+        NotificacaoEmailService.enfileirar(pedido_id, "pedido_criado")
+        db.session.commit()
+        assert NotificacaoEmailService.processar_pendentes() == 0
+
+        status = sorted(n.status.value for n in NotificacaoEmail.query)
+        db.session.remove()
+
+    assert len(enviados) == 1
+    assert status == [
+        StatusNotificacaoEnum.DESCARTADO.value,
+        StatusNotificacaoEnum.ENVIADO.value,
+    ]
+
+
+def test_email_falha_apos_esgotar_tentativas(app, criar_pedido, monkeypatch):
+    pedido_id = _pedido_com_frete(app, criar_pedido)
+    monkeypatch.setattr(modulo_emails, "EMAIL_MAX_TENTATIVAS", 3)
+    monkeypatch.setattr(
+        modulo_emails,
+        "enviar_emails",
+        lambda mensagens: [OSError("SMTP fora do ar")] * len(mensagens),
+    )
+
+    with app.app_context():
+        NotificacaoEmailService.enfileirar(pedido_id, "pedido_criado")
+        db.session.commit()
+
+        for tentativa in range(1, 4):
+            assert NotificacaoEmailService.processar_pendentes() == 0
+            notificacao = NotificacaoEmail.query.one()
+            assert notificacao.tentativas == tentativa
+            assert notificacao.ultimo_erro == "SMTP fora do ar"
+            if tentativa < 3:
+                # Reagendada com espera, fora da próxima rodada
+                assert notificacao.status == StatusNotificacaoEnum.PENDENTE
+                assert notificacao.proxima_tentativa_em > agora_brasil_sem_fuso()
+                _liberar_fila()
+
+        assert notificacao.status == StatusNotificacaoEnum.FALHOU
+
+        # Falhou de vez: não volta a ser pega pela fila
+        _liberar_fila()
+        assert NotificacaoEmailService.processar_pendentes() == 0
+        assert NotificacaoEmail.query.one().tentativas == 3
+        db.session.remove()
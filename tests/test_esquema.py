@@ -0,0 +1,15 @@
+from database import db
+from database.esquema import _cabe_no_tamanho
+from database.models import Produto
+
+
+def test_tipo_novo_so_e_aplicado_se_os_valores_cabem(app, dados):
+    categoria = Produto.__table__.c.categoria
+    with app.app_context():
+        assert _cabe_no_tamanho(db.engine, categoria)
+
+        produto = Produto.query.get(dados[2])
+        produto.categoria = "x" * (categoria.type.length + 1)
+        db.session.commit()
+
+        assert not _cabe_no_tamanho(db.engine, categoria)
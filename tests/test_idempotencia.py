@@ -0,0 +1,52 @@
+from datetime import timedelta
+
+from database import db
+from database.models import ChaveIdempotencia, ReservaEstoque
+from utils.date_time import agora_brasil_sem_fuso
+
+
+def _criar_preferencia(app, token, pedido_id, chave, corpo=None):
+    return app.test_client().post(
+        f"/pedidos/{pedido_id}/pagamento/preferencia",
+        json=corpo or {},
+        headers={"Authorization": f"Bearer {token}", "Idempotency-Key": chave},
+    )
+
+
+def test_repeticao_devolve_resposta_guardada(app, criar_pedido, token, mercadopago):
+    pedido_id, _ = criar_pedido()
+
+    primeira = _criar_preferencia(app, token, pedido_id, "pref-1", {"origem": "app"})
+    assert primeira.status_code == 201
+    assert primeira.headers.get("Idempotent-Replayed") is None
+
+    repetida = _criar_preferencia(app, token, pedido_id, "pref-1", {"origem": "app"})
+    assert repetida.status_code == 201
+    assert repetida.headers.get("Idempotent-Replayed") == "true"
+    assert repetida.get_json() == primeira.get_json()
+
+    # Mesma chave com outro corpo: recusada sem executar
+    divergente = _criar_preferencia(app, token, pedido_id, "pref-1", {"origem": "web"})
+    assert divergente.status_code == 422
+
+    assert mercadopago.requisicoes == 1
+
+
+def test_erro_libera_a_chave(app, criar_pedido, token, mercadopago):
+    pedido_id, _ = criar_pedido(expira_em_minutos=-1)
+
+    recusada = _criar_preferencia(app, token, pedido_id, "pref-2")
+    assert recusada.status_code == 400
+    with app.app_context():
+        assert ChaveIdempotencia.query.count() == 0
+        ReservaEstoque.query.filter_by(pedido_id=pedido_id).one().expira_em = (
+            agora_brasil_sem_fuso() + timedelta(minutes=30)
+        )
+        db.session.commit()
+        db.session.remove()
+
+    # Corrigida a causa, a mesma chave executa de novo
+    nova = _criar_preferencia(app, token, pedido_id, "pref-2")
+    assert nova.status_code == 201
+    assert nova.headers.get("Idempotent-Replayed") is None
+    assert mercadopago.requisicoes == 1
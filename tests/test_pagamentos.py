@@ -0,0 +1,87 @@
+import pytest
+
+from database import db
+from database.models import (
+    NotificacaoWebhook,
+    Pedido,
+    Produto,
+    ReservaEstoque,
+    StatusPedidoEnum,
+    TransacaoPagamento,
+)
+from services.public.PagamentosService import PagamentoService
+
+
+def test_preferencia_recusada_para_pedido_que_nao_esta_pendente(app, criar_pedido):
+    pedido_id, _ = criar_pedido()
+    with app.app_context():
+        Pedido.query.get(pedido_id).status = StatusPedidoEnum.CANCELADO
+        ReservaEstoque.query.filter_by(pedido_id=pedido_id).delete()
+        db.session.commit()
+
+        with pytest.raises(ValueError, match="aguardando pagamento"):
+            PagamentoService.criar_preferencia_pagamento(pedido_id)
+
+
+def test_preferencia_recusada_sem_reserva_de_estoque(app, criar_pedido):
+    pedido_id, _ = criar_pedido()
+    with app.app_context():
+        ReservaEstoque.query.filter_by(pedido_id=pedido_id).delete()
+        db.session.commit()
+
+        with pytest.raises(ValueError, match="reserva de estoque"):
+            PagamentoService.criar_preferencia_pagamento(pedido_id)
+
+
+def test_preferencia_recusada_com_reserva_vencida(app, criar_pedido):
+    pedido_id, _ = criar_pedido(expira_em_minutos=-1)
+    with app.app_context():
+        with pytest.raises(ValueError, match="reserva de estoque"):
+            PagamentoService.criar_preferencia_pagamento(pedido_id)
+
+
+def test_notificacao_do_estorno_feito_pelo_admin_e_descartada(
+    app, dados, criar_pedido, mercadopago
+):
+    produto_id = dados[2]
+    pedido_id, transacao_id = criar_pedido()
+    pagamento = mercadopago.salvar_pagamento(
+        {"external_reference": pedido_id, "status": "approved"}
+    )
+    with app.app_context():
+        transacao = TransacaoPagamento.query.get(transacao_id)
+        PagamentoService.aplicar_status_pagamento(
+            transacao, pagamento["id"], "approved"
+        )
+        PagamentoService.estornar_pagamento(transacao_id)
+        assert Produto.query.get(produto_id).estoque == 10
+
+        transacao = TransacaoPagamento.query.get(transacao_id)
+        resultado = PagamentoService.aplicar_status_pagamento(
+            transacao, pagamento["id"], "refunded"
+        )
+        assert resultado["duplicado"]
+        assert Produto.query.get(produto_id).estoque == 10
+
+
+def test_consulta_devolve_o_status_do_mp_e_enfileira_a_atualizacao(
+    app, criar_pedido, token, mercadopago
+):
+    pedido_id, transacao_id = criar_pedido()
+    pagamento = mercadopago.salvar_pagamento(
+        {"external_reference": pedido_id, "status": "approved"}
+    )
+    with app.app_context():
+        TransacaoPagamento.query.get(transacao_id).mp_payment_id = str(pagamento["id"])
+        db.session.commit()
+
+    resposta = app.test_client().get(
+        f"/transacoes/{transacao_id}", headers={"Authorization": f"Bearer {token}"}
+    )
+
+    assert resposta.status_code == 200
+    assert resposta.get_json()["status"] == "approved"
+    assert resposta.get_json()["atualizacao_pendente"] is True
+    with app.app_context():
+        assert Pedido.query.get(pedido_id).status == StatusPedidoEnum.PENDENTE
+        assert NotificacaoWebhook.query.filter_by(origem="consulta").count() == 1
@@ -0,0 +1,41 @@
+from decimal import Decimal
+from types import SimpleNamespace
+
+from services.public.PromocoesService import PromocaoService
+from utils.formatters.produto_formatter import CAMPOS_PRODUTO, ProdutoFormatter
+
+
+def _produto(promocao=None):
+    return SimpleNamespace(
+        id="p1",
+        nome="Faca",
+        descricao="Aço carbono",
+        categoria="facas",
+        preco=Decimal("189.90"),
+        img=None,
+        estoque=3,
+        peso=Decimal("0.35"),
+        altura=5,
+        largura=4,
+        comprimento=32,
+        promocao=promocao,
+    )
+
+
+# O dict literal dos campos completos e o plano campo a campo dão o mesmo
+# resultado, na mesma ordem
+def test_formato_completo_segue_o_plano_dos_campos():
+    calcular = PromocaoService.calcular_preco_com_desconto
+    # Com "id" repetido os campos não são CAMPOS_PRODUTO: usa o plano
+    campo_a_campo = ProdutoFormatter.compilar_plano((*CAMPOS_PRODUTO, "id"), calcular)
+    completo = ProdutoFormatter.compilar_plano(CAMPOS_PRODUTO, calcular)
+
+    for promocao in (None, SimpleNamespace(desconto_percentual=10.0)):
+        produto = _produto(promocao)
+        esperado = campo_a_campo(produto)
+        assert list(completo(produto).items()) == list(esperado.items())
+
+
+def test_projecao_devolve_so_os_campos_pedidos():
+    formatar = ProdutoFormatter.compilar_plano(("id", "preco"))
+    assert formatar(_produto()) == {"id": "p1", "preco": 189.9}
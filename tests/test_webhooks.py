@@ -0,0 +1,93 @@
+import json
+from datetime import timedelta
+
+from database import db
+from database.models import (
+    NotificacaoWebhook,
+    NotificacaoWebhookFalha,
+    StatusWebhookEnum,
+)
+from services.public import WebhookService as modulo_webhooks
+from services.public.PagamentosService import PagamentoService
+from services.public.WebhookService import WebhookService
+from utils.cache import webhooks_cache
+from utils.date_time import agora_brasil_sem_fuso
+
+
+def _notificacao(pagamento_id, acao="payment.updated"):
+    return {
+        "type": "payment",
+        "action": acao,
+        "id": f"evt-{pagamento_id}-{acao}",
+        "data": {"id": pagamento_id},
+    }
+
+
+# Devolve a notificação adiada para a fila, como se a espera tivesse passado
+def _liberar_fila():
+    NotificacaoWebhook.query.update(
+        {
+            NotificacaoWebhook.proxima_tentativa_em: agora_brasil_sem_fuso()
+            - timedelta(seconds=1)
+        }
+    )
+    db.session.commit()
+
+
+def test_receber_descarta_repeticoes(app):
+    webhooks_cache.limpar()
+    with app.app_context():
+        primeira = WebhookService.receber(_notificacao("111"))
+        assert primeira is not None
+
+        # Mesma notificação em rajada: barrada pelo filtro em memória
+        assert WebhookService.receber(_notificacao("111")) is None
+        # Outra ação do mesmo pagamento ainda na fila: não enfileira de novo
+        assert WebhookService.receber(_notificacao("111", "payment.created")) is None
+        # Tópico que a loja não processa
+        assert WebhookService.receber({"type": "plan", "data": {"id": "1"}}) is None
+
+        assert NotificacaoWebhook.query.count() == 1
+        db.session.remove()
+    webhooks_cache.limpar()
+
+
+def test_webhook_vai_para_falhas_apos_esgotar_tentativas(app, monkeypatch):
+    def falhar(payload, desde=None):
+        raise RuntimeError("Mercado Pago fora do ar")
+
+    monkeypatch.setattr(modulo_webhooks, "WEBHOOK_MAX_TENTATIVAS", 2)
+    monkeypatch.setattr(PagamentoService, "processar_webhook_mercadopago", falhar)
+
+    with app.app_context():
+        notificacao_id = WebhookService.enfileirar(
+            "payment", "222", _notificacao("222")
+        )
+
+        assert WebhookService.processar_pendentes(workers=1) == 1
+        notificacao = NotificacaoWebhook.query.get(notificacao_id)
+        assert notificacao.status == StatusWebhookEnum.PENDENTE
+        assert notificacao.tentativas == 1
+        assert notificacao.ultimo_erro == "Mercado Pago fora do ar"
+        # Reagendada com espera: a próxima rodada não a pega
+        assert WebhookService.processar_pendentes(workers=1) == 0
+
+        _liberar_fila()
+        assert WebhookService.processar_pendentes(workers=1) == 1
+        db.session.expire_all()
+
+        assert NotificacaoWebhook.query.count() == 0
+        falha = NotificacaoWebhookFalha.query.one()
+        assert falha.notificacao_id == notificacao_id
+        assert falha.tentativas == 2
+        assert falha.recurso_id == "222"
+        assert json.loads(falha.payload) == _notificacao("222")
+
+        # Corrigida a causa, as falhas voltam para a fila do zero
+        assert WebhookService.reenfileirar_falhas() == 1
+        assert NotificacaoWebhookFalha.query.count() == 0
+        devolvida = NotificacaoWebhook.query.one()
+        assert devolvida.status == StatusWebhookEnum.PENDENTE
+        assert devolvida.tentativas == 0
+        assert json.loads(devolvida.payload) == _notificacao("222")
+        db.session.remove()
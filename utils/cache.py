@@ -0,0 +1,152 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+_AUSENTE = object()
+
+
+class CacheTTL:
+    """
+    Cache em memória (por processo) com expiração por TTL, descarte LRU
+    quando atinge o tamanho máximo e invalidação por tags.
+    """
+
+    def __init__(self, tamanho_maximo=512, ttl=60):
+        self.tamanho_maximo = tamanho_maximo
+        self.ttl = ttl
+        self._itens = OrderedDict()  # chave -> (expira_em, valor, tags)
+        self._tags = {}  # tag -> set(chaves)
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.descartes = 0
+
+    def obter(self, chave, padrao=None):
+        with self._lock:
+            item = self._itens.get(chave, _AUSENTE)
+            if item is _AUSENTE:
+                self.misses += 1
+                return padrao
+
+            expira_em, valor, _ = item
+            if expira_em <= time.monotonic():
+                self._remover(chave)
+                self.misses += 1
+                return padrao
+
+            self._itens.move_to_end(chave)
+            self.hits += 1
+            return valor
+
+    def definir(self, chave, valor, tags=(), ttl=None):
+        with self._lock:
+            if chave in self._itens:
+                self._remover(chave)
+
+            expira_em = time.monotonic() + (self.ttl if ttl is None else ttl)
+            self._itens[chave] = (expira_em, valor, tuple(tags))
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(chave)
+
+            while len(self._itens) > self.tamanho_maximo:
+                chave_antiga = next(iter(self._itens))
+                self._remover(chave_antiga)
+                self.descartes += 1
+
+    def obter_ou_calcular(self, chave, calcular, tags=(), ttl=None):
+        # Retorna o valor em cache ou calcula, guarda e retorna
+        valor = self.obter(chave, _AUSENTE)
+        if valor is _AUSENTE:
+            valor = calcular()
+            self.definir(chave, valor, tags=tags, ttl=ttl)
+        return valor
+
+    def invalidar(self, *tags):
+        # Remove todas as entradas marcadas com qualquer uma das tags
+        with self._lock:
+            removidas = 0
+            for tag in tags:
+                for chave in list(self._tags.get(tag, ())):
+                    self._remover(chave)
+                    removidas += 1
+            return removidas
+
+    def remover(self, chave):
+        with self._lock:
+            self._remover(chave)
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+            self._tags.clear()
+
+    def estatisticas(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "itens": len(self._itens),
+                "tamanho_maximo": self.tamanho_maximo,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "descartes": self.descartes,
+                "taxa_acerto": round(self.hits / total, 4) if total else 0.0,
+            }
+
+    def _remover(self, chave):
+        item = self._itens.pop(chave, None)
+        if item is None:
+            return
+
+        for tag in item[2]:
+            chaves = self._tags.get(tag)
+            if chaves is not None:
+                chaves.discard(chave)
+                if not chaves:
+                    del self._tags[tag]
+
+
+# Cache do catálogo público (produtos e promoções).
+# Cada worker do gunicorn tem o seu; o TTL limita quanto tempo um worker que
+# não recebeu a escrita do admin pode servir dados antigos.
+catalogo_cache = CacheTTL(
+    tamanho_maximo=int(os.getenv("CATALOGO_CACHE_TAMANHO", 512)),
+    ttl=int(os.getenv("CATALOGO_CACHE_TTL", 60)),
+)
+
+
+# Tag das entradas do catálogo que mostram o produto: mudanças de estoque por
+# pedidos descartam só essas, não o catálogo inteiro
+def tag_produto(produto_id):
+    return f"produto:{produto_id}"
+
+
+# Respostas já concluídas das requisições com Idempotency-Key: evita ir ao
+# banco quando o cliente repete a mesma chave no mesmo worker
+idempotencia_cache = CacheTTL(
+    tamanho_maximo=int(os.getenv("IDEMPOTENCIA_CACHE_TAMANHO", 1024)),
+    ttl=int(os.getenv("IDEMPOTENCIA_CACHE_TTL", 300)),
+)
+
+# Detalhe dos pedidos (GET /pedidos/<id>), já serializado. É invalidado nas
+# escritas feitas pela API; o TTL curto cobre as feitas por outros processos
+# (jobs e outros workers)
+pedidos_cache = CacheTTL(
+    tamanho_maximo=int(os.getenv("PEDIDOS_CACHE_TAMANHO", 2048)),
+    ttl=int(os.getenv("PEDIDOS_CACHE_TTL", 30)),
+)
+
+# Notificações de webhook recebidas há pouco (tópico, recurso, ação, id):
+# reenvios do Mercado Pago em sequência são descartados antes de tocar no banco
+webhooks_cache = CacheTTL(
+    tamanho_maximo=int(os.getenv("WEBHOOKS_CACHE_TAMANHO", 4096)),
+    ttl=int(os.getenv("WEBHOOKS_CACHE_TTL", 30)),
+)
+
+# Consultas de pagamentos e ordens ao Mercado Pago (ver MercadoPagoService).
+# TTL curto: só absorve rajadas de consultas ao mesmo recurso
+mercadopago_cache = CacheTTL(
+    tamanho_maximo=int(os.getenv("MERCADOPAGO_CACHE_TAMANHO", 1024)),
+    ttl=int(os.getenv("MERCADOPAGO_CACHE_TTL", 5)),
+)
@@ -36,3 +36,8 @@ def formatar_brasil(dt, formato="%d/%m/%Y %H:%M:%S"):
         dt = utc_para_brasil(dt)
 
     return dt.strftime(formato)
+
+
+# Agora no horário de Brasília, sem fuso: é assim que o banco guarda DateTime
+def agora_brasil_sem_fuso():
+    return agora_brasil().replace(tzinfo=None)
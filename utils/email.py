@@ -19,30 +19,79 @@ def _enviar_email_thread(destinatario, assunto, corpo):
     """
     Função interna que realmente envias o email
     """
+    try:
+        erro = enviar_emails([(destinatario, assunto, corpo)])[0]
+    except RuntimeError as e:
+        print(f"AVISO: {str(e)}")
+        return False
+
+    if erro:
+        print(f"Erro ao enviar email: {str(erro)}")
+        return False
+
+    print(f"Email enviado com sucesso para {destinatario}")
+    return True
+
+
+def _montar_mensagem(remetente, destinatario, assunto, corpo):
+    msg = MIMEMultipart()
+    msg["From"] = remetente
+    msg["To"] = destinatario
+    msg["Subject"] = assunto
+    msg.attach(MIMEText(corpo, "html"))
+    return msg
+
+
+def _conectar(smtp_server, smtp_port, smtp_user, smtp_password):
+    server = smtplib.SMTP(smtp_server, smtp_port, timeout=10)
+    server.starttls()
+    server.login(smtp_user, smtp_password)
+    return server
+
+
+def enviar_emails(mensagens):
+    """
+    Envia vários emails (destinatario, assunto, corpo) na mesma conexão SMTP,
+    de forma síncrona. Retorna uma lista com None para cada email enviado ou a
+    exceção que impediu o envio, na mesma ordem das mensagens.
+    """
     smtp_server = os.getenv("SMTP_SERVER", "smtp.gmail.com")
     smtp_port = int(os.getenv("SMTP_PORT", 587))
     smtp_user = os.getenv("SMTP_USER")
     smtp_password = os.getenv("SMTP_PASSWORD")
 
     if not smtp_user or not smtp_password:
-        print("AVISO: Credenciais SMTP não configuradas")
-        return False
+        raise RuntimeError("Credenciais SMTP não configuradas")
+
+    resultados = []
+    server = None
 
     try:
-        msg = MIMEMultipart()
-        msg["From"] = smtp_user
-        msg["To"] = destinatario
-        msg["Subject"] = assunto
-        msg.attach(MIMEText(corpo, "html"))
-
-        with smtplib.SMTP(smtp_server, smtp_port, timeout=10) as server:
-            server.starttls()
-            server.login(smtp_user, smtp_password)
-            server.send_message(msg)
-
-        print(f"Email enviado com sucesso para {destinatario}")
-        return True
-
-    except Exception as e:
-        print(f"Erro ao enviar email: {str(e)}")
-        return False
+        for destinatario, assunto, corpo in mensagens:
+            try:
+                # Reconecta se a conexão caiu no email anterior
+                if server is None:
+                    server = _conectar(smtp_server, smtp_port, smtp_user, smtp_password)
+
+                server.send_message(
+                    _montar_mensagem(smtp_user, destinatario, assunto, corpo)
+                )
+                resultados.append(None)
+            except smtplib.SMTPRecipientsRefused as e:
+                # Problema só deste destinatário; a conexão continua válida
+                resultados.append(e)
+            except Exception as e:
+                resultados.append(e)
+                if server is not None:
+                    try:
+                        server.close()
+                    finally:
+                        server = None
+    finally:
+        if server is not None:
+            try:
+                server.quit()
+            except Exception:
+                server.close()
+
+    return resultados
@@ -1,5 +1,8 @@
 from .user_formatter import UserFormatter
+from .produto_formatter import ProdutoFormatter
 
 formatar_dados_usuario = UserFormatter.formatar_dados_usuario
+formatar_produto = ProdutoFormatter.formatar_produto
+formatar_produtos = ProdutoFormatter.formatar_produtos
 
-__all__ = ["formatar_dados_usuario"]
+__all__ = ["formatar_dados_usuario", "formatar_produto", "formatar_produtos"]
@@ -0,0 +1,124 @@
+from functools import lru_cache
+from operator import attrgetter
+
+# Campos públicos de um produto, na ordem da resposta, e o conversor de cada um
+# (Numeric chega como Decimal e precisa virar float no JSON)
+PLANO_PRODUTO = (
+    ("id", None),
+    ("nome", None),
+    ("descricao", None),
+    ("categoria", None),
+    ("preco", float),
+    ("img", None),
+    ("estoque", None),
+    ("peso", float),
+    ("altura", None),
+    ("largura", None),
+    ("comprimento", None),
+)
+
+# Campos calculados a partir do produto inteiro (e da promoção, carregada junto
+# via joinedload), e não de uma coluna
+CAMPOS_DERIVADOS = ("desconto_percentual", "preco_com_desconto")
+
+CAMPOS_PRODUTO = tuple(campo for campo, _ in PLANO_PRODUTO) + CAMPOS_DERIVADOS
+
+_CONVERSORES = dict(PLANO_PRODUTO)
+
+
+def _desconto_percentual(produto):
+    promocao = produto.promocao
+    return promocao.desconto_percentual if promocao else None
+
+
+# Preço efetivo; calcular_desconto(preco, desconto_percentual) vem do serviço
+# de promoções (ex.: PromocaoService.calcular_preco_com_desconto)
+def _preco_com_desconto(calcular_desconto):
+    def preco_com_desconto(produto):
+        promocao = produto.promocao
+        if not promocao:
+            return float(produto.preco)
+
+        return round(
+            float(calcular_desconto(produto.preco, promocao.desconto_percentual)), 2
+        )
+
+    return preco_com_desconto
+
+
+def _leitor(campo, calcular_desconto):
+    if campo == "desconto_percentual":
+        return _desconto_percentual
+    if campo == "preco_com_desconto":
+        if calcular_desconto is None:
+            raise ValueError("preco_com_desconto exige calcular_desconto")
+        return _preco_com_desconto(calcular_desconto)
+
+    ler = attrgetter(campo)
+    conversor = _CONVERSORES[campo]
+    if conversor is None:
+        return ler
+    return lambda produto: conversor(ler(produto))
+
+
+# Produto com todos os campos (o caminho das listagens sem ?fields=): um dict
+# literal, bem mais rápido que percorrer o plano campo a campo. Tem que seguir
+# PLANO_PRODUTO + CAMPOS_DERIVADOS, na mesma ordem.
+def _formatar_completo(calcular_desconto):
+    def formatar(p):
+        promocao = p.promocao
+        return {
+            "id": p.id,
+            "nome": p.nome,
+            "descricao": p.descricao,
+            "categoria": p.categoria,
+            "preco": float(p.preco),
+            "img": p.img,
+            "estoque": p.estoque,
+            "peso": float(p.peso),
+            "altura": p.altura,
+            "largura": p.largura,
+            "comprimento": p.comprimento,
+            "desconto_percentual": promocao.desconto_percentual if promocao else None,
+            "preco_com_desconto": (
+                round(
+                    float(calcular_desconto(p.preco, promocao.desconto_percentual)), 2
+                )
+                if promocao
+                else float(p.preco)
+            ),
+        }
+
+    return formatar
+
+
+class ProdutoFormatter:
+    # Monta (uma vez por combinação de campos) a tupla de pares (campo, leitor)
+    # e devolve a função que gera o dict do produto a partir dela
+    @staticmethod
+    @lru_cache(maxsize=64)
+    def compilar_plano(campos=CAMPOS_PRODUTO, calcular_desconto=None):
+        if campos == CAMPOS_PRODUTO and calcular_desconto is not None:
+            return _formatar_completo(calcular_desconto)
+
+        plano = tuple((campo, _leitor(campo, calcular_desconto)) for campo in campos)
+        return lambda produto: {campo: ler(produto) for campo, ler in plano}
+
+    @staticmethod
+    def formatar_produto(produto, campos=CAMPOS_PRODUTO, calcular_desconto=None):
+        return ProdutoFormatter.compilar_plano(campos, calcular_desconto)(produto)
+
+    @staticmethod
+    def formatar_produtos(produtos, campos=CAMPOS_PRODUTO, calcular_desconto=None):
+        formatar = ProdutoFormatter.compilar_plano(campos, calcular_desconto)
+        return [formatar(p) for p in produtos]
+
+
+formatar_produto = ProdutoFormatter.formatar_produto
+formatar_produtos = ProdutoFormatter.formatar_produtos
+__all__ = [
+    "formatar_produto",
+    "formatar_produtos",
+    "CAMPOS_PRODUTO",
+    "CAMPOS_DERIVADOS",
+]
@@ -0,0 +1,29 @@
+import hashlib
+from flask import current_app, request
+
+
+# Serializa os dados uma única vez e calcula o ETag fraco a partir do corpo.
+# Como o ETag depende só do conteúdo, workers com os mesmos dados geram o mesmo valor.
+def preparar_json(dados):
+    corpo = current_app.json.dumps_bytes(dados)
+    etag = hashlib.blake2b(corpo, digest_size=16).hexdigest()
+    return corpo, etag
+
+
+# Responde 304 sem corpo se o cliente já tem a versão atual (If-None-Match),
+# senão devolve o corpo já serializado. privado=True para dados do cliente, que
+# não podem ficar em caches compartilhados (proxies/CDN)
+def resposta_condicional(entrada, status=200, privado=False):
+    corpo, etag = entrada
+
+    if request.if_none_match.contains_weak(etag):
+        resposta = current_app.response_class(status=304)
+    else:
+        resposta = current_app.response_class(
+            corpo, status=status, mimetype="application/json"
+        )
+
+    resposta.set_etag(etag, weak=True)
+    escopo = "private" if privado else "public"
+    resposta.headers["Cache-Control"] = f"{escopo}, max-age=0, must-revalidate"
+    return resposta
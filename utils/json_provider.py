@@ -0,0 +1,57 @@
+import os
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional
+    orjson = None
+
+
+class JSONProvider(DefaultJSONProvider):
+    """Provider padrão do Flask (json da stdlib) com saída direta em bytes."""
+
+    nome = "stdlib"
+
+    def dumps_bytes(self, obj):
+        return self.dumps(obj).encode("utf-8")
+
+
+class OrjsonJSONProvider(JSONProvider):
+    """
+    Provider baseado no orjson. Datas continuam passando pelo default() do Flask,
+    para manter o mesmo formato de saída do provider padrão.
+    """
+
+    nome = "orjson"
+
+    def _opcoes(self):
+        opcoes = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            opcoes |= orjson.OPT_SORT_KEYS
+        return opcoes
+
+    def dumps_bytes(self, obj):
+        return orjson.dumps(obj, default=self.default, option=self._opcoes())
+
+    def dumps(self, obj, **kwargs):
+        # Argumentos específicos do json da stdlib (indent, cls...) caem no provider padrão
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return self.dumps_bytes(obj).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+
+# Escolhe o provider: JSON_PROVIDER=stdlib|orjson; sem a variável, usa orjson se instalado
+def escolher_json_provider():
+    preferido = os.getenv("JSON_PROVIDER", "").lower()
+
+    if preferido == "stdlib" or orjson is None:
+        if preferido == "orjson":
+            raise ValueError("JSON_PROVIDER=orjson, mas o orjson não está instalado")
+        return JSONProvider
+
+    return OrjsonJSONProvider
@@ -0,0 +1,180 @@
+import os
+import re
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+import mercadopago
+import requests
+from mercadopago.http import HttpClient
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+
+MERCADOPAGO_ACCESS_TOKEN = os.getenv("MERCADOPAGO_ACCESS_TOKEN")
+# Outra URL para a API (ex.: python -m benchmarks.mercadopago_local)
+MERCADOPAGO_API_URL = os.getenv("MERCADOPAGO_API_URL")
+
+# Conexões keep-alive mantidas com a API do MP por processo
+MERCADOPAGO_POOL_TAMANHO = int(os.getenv("MERCADOPAGO_POOL_TAMANHO", 10))
+# Timeouts (segundos) para abrir a conexão e para esperar a resposta
+MERCADOPAGO_TIMEOUT_CONEXAO = float(os.getenv("MERCADOPAGO_TIMEOUT_CONEXAO", 5))
+MERCADOPAGO_TIMEOUT_LEITURA = float(os.getenv("MERCADOPAGO_TIMEOUT_LEITURA", 20))
+# Novas tentativas em 429/5xx, com espera crescente
+MERCADOPAGO_MAX_TENTATIVAS = int(os.getenv("MERCADOPAGO_MAX_TENTATIVAS", 3))
+# Amostras de latência guardadas por rota para os percentis
+MERCADOPAGO_AMOSTRAS = int(os.getenv("MERCADOPAGO_AMOSTRAS", 500))
+
+_URL_API_SDK = "https://api.mercadopago.com"
+_STATUS_RETENTATIVA = (429, 500, 502, 503, 504)
+# IDs numéricos e UUIDs no caminho viram :id (agrupa /v1/payments/123 etc.)
+_ID_NO_CAMINHO = re.compile(r"/(\d+|[0-9a-f]{8}-[0-9a-f-]{27,})(?=/|$)", re.I)
+
+
+class ClienteHttpMercadoPago(HttpClient):
+    """
+    Transporte do SDK do Mercado Pago com uma sessão requests persistente: as
+    conexões HTTPS ficam abertas no pool e são reaproveitadas entre chamadas
+    e threads, em vez de um handshake TLS por chamada. Mede a latência de
+    cada chamada por método e rota.
+    """
+
+    def __init__(self):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=MERCADOPAGO_POOL_TAMANHO,
+            max_retries=Retry(
+                total=MERCADOPAGO_MAX_TENTATIVAS,
+                status_forcelist=_STATUS_RETENTATIVA,
+                backoff_factor=0.3,
+                respect_retry_after_header=True,
+                raise_on_status=False,
+            ),
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._lock = threading.Lock()
+        self._rotas = {}  # "GET /v1/payments/:id" -> contadores e amostras
+
+    # Mesma assinatura e retorno do HttpClient do SDK; as novas tentativas e
+    # os timeouts vêm da configuração do pool, não de cada chamada
+    def request(
+        self,
+        method,
+        url,
+        maxretries=None,
+        retry_on=None,
+        backoff_factor=None,
+        **kwargs,
+    ):
+        kwargs["timeout"] = (MERCADOPAGO_TIMEOUT_CONEXAO, MERCADOPAGO_TIMEOUT_LEITURA)
+        if MERCADOPAGO_API_URL and url.startswith(_URL_API_SDK):
+            url = MERCADOPAGO_API_URL.rstrip("/") + url[len(_URL_API_SDK) :]
+        rota = f"{method} {_ID_NO_CAMINHO.sub('/:id', urlsplit(url).path)}"
+
+        inicio = time.perf_counter()
+        status = None
+        try:
+            resposta = self.session.request(method, url, **kwargs)
+            status = resposta.status_code
+        finally:
+            self._registrar(rota, time.perf_counter() - inicio, status)
+
+        resultado = {"status": status, "response": None}
+        if status != 204 and resposta.content:
+            try:
+                resultado["response"] = resposta.json()
+            except ValueError:
+                resultado["response"] = {"message": resposta.text[:500]}
+        return resultado
+
+    def _registrar(self, rota, duracao, status):
+        with self._lock:
+            dados = self._rotas.get(rota)
+            if dados is None:
+                dados = self._rotas[rota] = {
+                    "chamadas": 0,
+                    "erros": 0,
+                    "tempo_total": 0.0,
+                    "amostras": deque(maxlen=MERCADOPAGO_AMOSTRAS),
+                }
+            dados["chamadas"] += 1
+            if status is None or status >= 500 or status == 429:
+                dados["erros"] += 1
+            dados["tempo_total"] += duracao
+            dados["amostras"].append(duracao)
+
+    def estatisticas(self):
+        # Latência em ms por rota: média de todas as chamadas e percentis das
+        # últimas MERCADOPAGO_AMOSTRAS
+        with self._lock:
+            rotas = {
+                rota: (
+                    dados["chamadas"],
+                    dados["erros"],
+                    dados["tempo_total"],
+                    sorted(dados["amostras"]),
+                )
+                for rota, dados in self._rotas.items()
+            }
+
+        def percentil(amostras, p):
+            return round(
+                amostras[min(int(len(amostras) * p), len(amostras) - 1)] * 1000, 1
+            )
+
+        return {
+            rota: {
+                "chamadas": chamadas,
+                "erros": erros,
+                "media_ms": round(tempo_total / chamadas * 1000, 1),
+                "p50_ms": percentil(amostras, 0.50),
+                "p95_ms": percentil(amostras, 0.95),
+                "p99_ms": percentil(amostras, 0.99),
+                "max_ms": round(amostras[-1] * 1000, 1),
+            }
+            for rota, (chamadas, erros, tempo_total, amostras) in rotas.items()
+        }
+
+
+_sdk = None
+_sdk_pid = None
+_sdk_lock = threading.Lock()
+
+
+def _descartar_sdk():
+    # Depois do fork (gunicorn com --preload) o filho não herda as conexões
+    # abertas do pai: cada processo monta o seu pool
+    global _sdk, _sdk_pid, _sdk_lock
+    _sdk = None
+    _sdk_pid = None
+    _sdk_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_descartar_sdk)
+
+
+def obter_sdk():
+    """SDK do Mercado Pago compartilhado pelas threads deste processo."""
+    global _sdk, _sdk_pid
+    if _sdk is not None and _sdk_pid == os.getpid():
+        return _sdk
+
+    with _sdk_lock:
+        if _sdk is None or _sdk_pid != os.getpid():
+            if not MERCADOPAGO_ACCESS_TOKEN:
+                raise ValueError("MERCADOPAGO_ACCESS_TOKEN não configurado")
+            _sdk = mercadopago.SDK(
+                MERCADOPAGO_ACCESS_TOKEN, http_client=ClienteHttpMercadoPago()
+            )
+            _sdk_pid = os.getpid()
+    return _sdk
+
+
+def estatisticas_http():
+    # Latência das chamadas à API do MP feitas por este processo
+    if _sdk is None or _sdk_pid != os.getpid():
+        return {}
+    return _sdk.http_client.estatisticas()
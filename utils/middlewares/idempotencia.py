@@ -0,0 +1,80 @@
+import hashlib
+from functools import wraps
+
+from flask import current_app, jsonify, make_response, request
+
+from services.public.IdempotenciaService import (
+    CONCLUIDA,
+    DIVERGENTE,
+    EM_ANDAMENTO,
+    IdempotenciaService,
+)
+
+IDEMPOTENCIA_CHAVE_MAX = 255
+
+
+# Use depois de @token_required. Sem o header Idempotency-Key a rota roda
+# normalmente; com ele, repetições devolvem a resposta da primeira requisição.
+# Só respostas 2xx ficam guardadas: em erro a chave é liberada para nova tentativa.
+def idempotente(f):
+    @wraps(f)
+    def wrapper(payload, *args, **kwargs):
+        chave = request.headers.get("Idempotency-Key")
+        if not chave:
+            return f(payload, *args, **kwargs)
+
+        if len(chave) > IDEMPOTENCIA_CHAVE_MAX:
+            return jsonify({"erro": "Idempotency-Key muito longa"}), 400
+
+        usuario_id = str(payload.get("sub"))
+        rota = f"{request.method} {request.path}"
+        id_chave = IdempotenciaService.gerar_id(usuario_id, rota, chave)
+        hash_requisicao = hashlib.sha256(request.get_data()).hexdigest()
+
+        estado, dados = IdempotenciaService.iniciar(
+            id_chave, usuario_id, rota, hash_requisicao
+        )
+
+        if estado == DIVERGENTE:
+            return (
+                jsonify({"erro": "Idempotency-Key já usada com outra requisição"}),
+                422,
+            )
+
+        if estado == EM_ANDAMENTO:
+            resposta = jsonify(
+                {"erro": "Requisição com esta Idempotency-Key ainda em processamento"}
+            )
+            resposta.status_code = 409
+            resposta.headers["Retry-After"] = "1"
+            return resposta
+
+        if estado == CONCLUIDA:
+            status_code, corpo = dados
+            resposta = current_app.response_class(
+                corpo, status=status_code, mimetype="application/json"
+            )
+            resposta.headers["Idempotent-Replayed"] = "true"
+            return resposta
+
+        dono = dados
+        try:
+            resposta = make_response(f(payload, *args, **kwargs))
+        except Exception:
+            IdempotenciaService.descartar(id_chave, dono)
+            raise
+
+        if 200 <= resposta.status_code < 300:
+            IdempotenciaService.concluir(
+                id_chave,
+                dono,
+                hash_requisicao,
+                resposta.status_code,
+                resposta.get_data(as_text=True),
+            )
+        else:
+            IdempotenciaService.descartar(id_chave, dono)
+
+        return resposta
+
+    return wrapper
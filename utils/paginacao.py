@@ -0,0 +1,50 @@
+import base64
+import json
+from datetime import datetime
+
+LIMITE_PADRAO = 20
+LIMITE_MAXIMO = 100
+
+
+def codificar_cursor(criado_em, registro_id):
+    # Gera um cursor opaco a partir da chave (criado_em, id) do último item da página
+    bruto = json.dumps([criado_em.isoformat(), registro_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(bruto.encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor):
+    # Converte o cursor recebido de volta para (criado_em, id)
+    if not cursor:
+        return None
+
+    try:
+        preenchimento = "=" * (-len(cursor) % 4)
+        bruto = base64.urlsafe_b64decode((cursor + preenchimento).encode()).decode()
+        criado_em, registro_id = json.loads(bruto)
+        return datetime.fromisoformat(criado_em), str(registro_id)
+    except Exception:
+        raise ValueError("Cursor de paginação inválido")
+
+
+def ler_limite(valor, padrao=LIMITE_PADRAO, maximo=LIMITE_MAXIMO):
+    # Valida o parâmetro ?limite= e aplica o teto
+    if valor in (None, ""):
+        return padrao
+
+    try:
+        limite = int(valor)
+    except (TypeError, ValueError):
+        raise ValueError("Limite inválido")
+
+    if limite < 1:
+        raise ValueError("Limite deve ser maior que zero")
+
+    return min(limite, maximo)
+
+
+def filtro_keyset_desc(coluna_data, coluna_id, cursor):
+    # Condição "depois do cursor" para ordenação (criado_em DESC, id DESC)
+    criado_em, registro_id = cursor
+    return (coluna_data < criado_em) | (
+        (coluna_data == criado_em) & (coluna_id < registro_id)
+    )
@@ -0,0 +1,88 @@
+import threading
+import time
+
+
+class _Chamada:
+    def __init__(self):
+        self.inicio = time.time()
+        self.pronta = threading.Event()
+        self.valor = None
+        self.erro = None
+        self.guardar = True  # False se a chave foi esquecida durante a chamada
+
+
+class SingleFlight:
+    """
+    Une chamadas simultâneas com a mesma chave: a primeira thread executa a
+    função e as demais esperam e recebem o mesmo resultado (ou a mesma
+    exceção). Com um CacheTTL, o resultado ainda é reaproveitado pelo TTL.
+
+    desde (time.time()) descarta resultados de chamadas iniciadas antes desse
+    instante, para quem precisa de um dado obtido depois de um evento (ex.:
+    a notificação de que o recurso mudou).
+    """
+
+    def __init__(self, cache=None):
+        self.cache = cache
+        self._chamadas = {}  # chave -> _Chamada em andamento
+        self._lock = threading.Lock()
+        self.executadas = 0
+        self.compartilhadas = 0
+
+    def executar(self, chave, funcao, desde=None):
+        if self.cache is not None:
+            item = self.cache.obter(chave)
+            if item is not None and (desde is None or item[0] >= desde):
+                return item[1]
+
+        with self._lock:
+            chamada = self._chamadas.get(chave)
+            if chamada is not None and (desde is None or chamada.inicio >= desde):
+                self.compartilhadas += 1
+                lider = False
+            else:
+                chamada = _Chamada()
+                self._chamadas[chave] = chamada
+                self.executadas += 1
+                lider = True
+
+        if not lider:
+            chamada.pronta.wait()
+            if chamada.erro is not None:
+                raise chamada.erro
+            return chamada.valor
+
+        try:
+            chamada.valor = funcao()
+        except Exception as e:
+            chamada.erro = e
+            raise
+        else:
+            if self.cache is not None and chamada.guardar:
+                self.cache.definir(chave, (chamada.inicio, chamada.valor))
+            return chamada.valor
+        finally:
+            with self._lock:
+                if self._chamadas.get(chave) is chamada:
+                    del self._chamadas[chave]
+            chamada.pronta.set()
+
+    def esquecer(self, chave):
+        # Próxima chamada com a chave vai à origem (ex.: depois de alterar o recurso)
+        with self._lock:
+            chamada = self._chamadas.pop(chave, None)
+            if chamada is not None:
+                chamada.guardar = False
+        if self.cache is not None:
+            self.cache.remover(chave)
+
+    def estatisticas(self):
+        with self._lock:
+            dados = {
+                "em_andamento": len(self._chamadas),
+                "executadas": self.executadas,
+                "compartilhadas": self.compartilhadas,
+            }
+        if self.cache is not None:
+            dados["cache"] = self.cache.estatisticas()
+        return dados
@@ -0,0 +1,64 @@
+import re
+import unicodedata
+
+STOPWORDS = {
+    "a",
+    "o",
+    "as",
+    "os",
+    "e",
+    "de",
+    "da",
+    "do",
+    "das",
+    "dos",
+    "em",
+    "na",
+    "no",
+    "nas",
+    "nos",
+    "um",
+    "uma",
+    "para",
+    "por",
+    "com",
+    "sem",
+}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def normalizar(texto):
+    # Minúsculas e sem acentos: "Açougueiro" -> "acougueiro"
+    if not texto:
+        return ""
+
+    decomposto = unicodedata.normalize("NFKD", texto)
+    sem_acentos = "".join(c for c in decomposto if not unicodedata.combining(c))
+    return sem_acentos.lower()
+
+
+def _radical(token):
+    # Reduz plurais comuns do português ao singular (facas -> faca, aventais -> avental)
+    if len(token) <= 3 or token.isdigit():
+        return token
+    if token.endswith(("oes", "aes")):
+        return token[:-3] + "ao"
+    if token.endswith("ais"):
+        return token[:-2] + "l"
+    if token.endswith("eis"):
+        return token[:-3] + "el"
+    if token.endswith("ns"):
+        return token[:-2] + "m"
+    if token.endswith(("res", "zes")):
+        return token[:-2]
+    if token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenizar(texto):
+    # Quebra o texto normalizado em termos, sem stopwords e com plurais reduzidos
+    return [
+        _radical(t) for t in _TOKEN_RE.findall(normalizar(texto)) if t not in STOPWORDS
+    ]